@@ -16,35 +16,60 @@ ROOT = Path(__file__).resolve().parent
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-from src.utils.env import load_env
+from src.utils.env import get_env, load_env
 
 load_env()
 
-from src.patient_sim.groq_patient_sim import GroqPatientSimulator
+from src.patient_sim.async_groq_patient_sim import AsyncGroqPatientSimulator, BlockingPatientSimulator
+from src.patient_sim.budget import BudgetedPatientSimulator
+from src.patient_sim.cached_patient_sim import CachingPatientSimulator, default_patient_cache
+from src.patient_sim.guardrails import GuardedPatientSimulator
+from src.patient_sim.hedging import shared_hedged_groq_simulator
 from src.evaluation.patient.deepeval_patient import DeepEvalPatientEvaluator
+from src.evaluation.speculative import SpeculativeEvaluator
 from src.evaluation.trainee.pipeline import TraineeEvalPipeline
 from src.evaluation.trainee.legacy_regex import evaluate_trainee as legacy_regex_evaluate_trainee
 from src.trainee_judge.trainee_judge_schema import load_rubric as load_examiner_rubric
-from src.trainee_judge.trainee_judge_groq import judge_trainee_with_groq
+from src.trainee_judge.judge_cache import shared_cached_judge
 from src.trainee_judge.trainee_score import score_from_judge_output
 from src.ui.app_shell import render_app
 
 
 def main() -> None:
-    patient_simulator = GroqPatientSimulator()
+    # Cheap per rerun: the underlying HTTP pool is process-wide (see src.patient_sim.http_pool).
+    # PATIENT_SIM_HEDGE=1 enables hedged requests against tail latency (src.patient_sim.hedging).
+    if (get_env("PATIENT_SIM_HEDGE", "") or "").lower() in ("1", "true", "yes"):
+        async_simulator = shared_hedged_groq_simulator()
+    else:
+        async_simulator = AsyncGroqPatientSimulator()
+    # Guardrails validate the final reply; budgeting sits inside them so the cache
+    # keys on the right-sized request (regenerations included).
+    patient_simulator = GuardedPatientSimulator(
+        BudgetedPatientSimulator(
+            CachingPatientSimulator(
+                BlockingPatientSimulator(async_simulator),
+                cache=default_patient_cache(),
+                mode=get_env("PATIENT_SIM_CACHE_MODE", "deterministic") or "deterministic",
+            )
+        )
+    )
     patient_evaluator = DeepEvalPatientEvaluator()
 
     trainee_pipeline = TraineeEvalPipeline(
         rubric_loader=load_examiner_rubric,
-        judge_fn=judge_trainee_with_groq,
+        judge_fn=shared_cached_judge(),
         scorer_fn=score_from_judge_output,
+        regex_fn=legacy_regex_evaluate_trainee,
     )
+    # Background pre-evaluation after each exchange (SPECULATIVE_EVAL / SPECULATIVE_PATIENT_EVAL).
+    speculative = SpeculativeEvaluator(trainee_pipeline, patient_evaluator=patient_evaluator)
 
     render_app(
         patient_simulator=patient_simulator,
         patient_evaluator=patient_evaluator,
         trainee_pipeline=trainee_pipeline,
         legacy_regex_evaluator=legacy_regex_evaluate_trainee,
+        speculative=speculative,
     )
 
 
@@ -14,6 +14,9 @@ from typing import Any, Dict, List
 
 from src.evaluation.patient.interfaces import Conversation, PatientEvalConfig
 from src.patient_sim.prompts import build_chatbot_role
+from src.state.conversation import ConversationLog
+from src.utils.rate_limit import get_rate_limiter
+from src.utils.tokens import estimate_messages_tokens
 
 
 class DeepEvalPatientEvaluator:
@@ -28,6 +31,8 @@ class DeepEvalPatientEvaluator:
     def _history_to_turns(self, conversation: Conversation):
         from deepeval.test_case import Turn
 
+        if isinstance(conversation, ConversationLog):
+            return [Turn(role=m.role, content=m.content) for m in conversation.dialogue()]
         turns = []
         for m in conversation or []:
             if m.get("role") in ("user", "assistant"):
@@ -79,9 +84,17 @@ class DeepEvalPatientEvaluator:
             threshold=config.convo_quality_threshold,
         )
 
+        # DeepEval calls the provider internally; admit each metric run through the shared limiter.
+        # A metric makes several judge calls over the transcript, hence the generous estimate.
+        est_tokens = 4 * estimate_messages_tokens(conversation or [])
         results = []
         for metric in (role_metric, sim_metric):
-            metric.measure(test_case)
+            model_name = getattr(getattr(metric, "model", None), "name", None) or getattr(metric, "evaluation_model", None)
+            get_rate_limiter("openai", model_name).call(
+                lambda: metric.measure(test_case),
+                estimated_tokens=est_tokens,
+                usage_tokens=None,
+            )
             results.append(
                 {
                     "name": getattr(metric, "name", metric.__class__.__name__),
@@ -8,8 +8,10 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import Any, Dict, List, Protocol
 
+from src.state.conversation import HistoryLike
 
-Conversation = List[Dict[str, str]]
+# A list of role/content dicts or a src.state.conversation.ConversationLog.
+Conversation = HistoryLike
 
 
 @dataclass(frozen=True)
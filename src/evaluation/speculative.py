@@ -0,0 +1,295 @@
+"""src.evaluation.speculative
+
+Speculative background pre-evaluation while the interview is still running.
+
+After each trainee/patient exchange the chat tab calls `SpeculativeEvaluator.schedule()`.
+The trainee judge (and, with SPECULATIVE_PATIENT_EVAL=1, the patient evaluator) then runs
+on that transcript in a worker thread:
+
+  - debounced per session: a run starts only after `debounce_s` without a newer exchange;
+  - cancelable: a newer exchange cancels the pending run of the same session. A run
+    already in flight cannot be interrupted; it finishes and is kept under its own key,
+    but it is counted as superseded;
+  - results are stored in memory, keyed by transcript hash + everything else that
+    changes the result (rubric, language, condition, judge/cascade/patient config).
+
+When the evaluation tab renders, `trainee_result()` / `patient_result()` return a
+matching result instantly (optionally waiting for an in-flight one); otherwise the tab
+falls back to a normal run. Speculative judge calls go through the same cached judge,
+so even a missed lookup usually becomes a judge cache hit.
+
+Env vars: SPECULATIVE_EVAL (default 1), SPECULATIVE_PATIENT_EVAL (default 0),
+SPECULATIVE_DEBOUNCE_S (default 1.5), SPECULATIVE_MAX_RESULTS (default 64).
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from src.evaluation.patient.interfaces import PatientEvalConfig
+from src.evaluation.trainee.interfaces import Conversation, TraineeEvalResult
+from src.state.conversation import ConversationLog
+from src.utils.cache import LRUTTLCache
+from src.utils.env import get_env
+from src.utils.hashing import canonical_hash
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return (get_env(name, default) or "").lower() in ("1", "true", "yes")
+
+
+@dataclass
+class SpeculativeResult:
+    value: Any
+    transcript: str
+    scheduled_at: float                  # wall-clock time of the exchange that triggered it
+    finished_at: float
+    run_s: float
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "transcript": self.transcript,
+            "run_s": round(self.run_s, 3),
+            "ready_after_exchange_s": round(self.finished_at - self.scheduled_at, 3),
+            "age_s": round(time.time() - self.finished_at, 1),
+        }
+
+
+@dataclass
+class _Slot:
+    timer: Optional[threading.Timer] = None
+    generation: int = 0
+    pending: Dict[str, Future] = field(default_factory=dict)
+
+
+class SpeculationRunner:
+    """Process-wide debounce slots, worker pool and result store (no evaluation logic)."""
+
+    def __init__(self, *, debounce_s: float = 1.5, max_results: int = 64, max_workers: int = 2) -> None:
+        self.debounce_s = debounce_s
+        self.results = LRUTTLCache(max_entries=max_results)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculative-eval")
+        self._lock = threading.Lock()
+        self._slots: Dict[str, _Slot] = {}
+        self._in_flight: Dict[str, Future] = {}
+        self.counts = {"scheduled": 0, "debounced": 0, "started": 0, "completed": 0, "failed": 0, "superseded": 0, "hits": 0, "misses": 0}
+
+    def schedule(self, slot_id: str, tasks: Dict[str, Tuple[str, Callable[[], Any]]]) -> None:
+        """Replace `slot_id`'s pending batch with `tasks` ({key: (transcript, fn)}), after the debounce delay."""
+        scheduled_at = time.time()
+        with self._lock:
+            slot = self._slots.setdefault(slot_id, _Slot())
+            if slot.timer is not None and slot.timer.is_alive():
+                slot.timer.cancel()
+                self.counts["debounced"] += 1
+            for key, fut in slot.pending.items():
+                if fut.cancel():  # queued behind other runs, not started yet
+                    self._in_flight.pop(key, None)
+                    self.counts["debounced"] += 1
+            slot.pending = {}
+            slot.generation += 1
+            generation = slot.generation
+            self.counts["scheduled"] += 1
+            timer = threading.Timer(self.debounce_s, self._launch, args=(slot_id, generation, tasks, scheduled_at))
+            timer.daemon = True
+            slot.timer = timer
+        timer.start()
+
+    def _launch(self, slot_id: str, generation: int, tasks: Dict[str, Tuple[str, Callable[[], Any]]], scheduled_at: float) -> None:
+        with self._lock:
+            slot = self._slots.get(slot_id)
+            if slot is None or slot.generation != generation:
+                return
+            for key, (transcript, fn) in tasks.items():
+                if self.results.get(key) is not None or key in self._in_flight:
+                    continue
+                fut = self._pool.submit(self._run, slot_id, generation, key, transcript, fn, scheduled_at)
+                slot.pending[key] = fut
+                self._in_flight[key] = fut
+
+    def _run(self, slot_id: str, generation: int, key: str, transcript: str, fn: Callable[[], Any], scheduled_at: float) -> Any:
+        with self._lock:
+            self.counts["started"] += 1
+        t0 = time.perf_counter()
+        value, error = None, None
+        try:
+            value = fn()
+        except Exception as e:
+            error = e
+        run_s = time.perf_counter() - t0
+        if error is None:
+            self.results.set(key, SpeculativeResult(value, transcript, scheduled_at, time.time(), run_s))
+        with self._lock:
+            self._in_flight.pop(key, None)
+            slot = self._slots.get(slot_id)
+            if slot is not None:
+                slot.pending.pop(key, None)
+                if slot.generation != generation:
+                    self.counts["superseded"] += 1
+            self.counts["failed" if error is not None else "completed"] += 1
+        if error is not None:
+            logger.warning("speculative evaluation failed key=%s: %s", key[:12], error)
+        else:
+            logger.info("speculative evaluation ready key=%s run_s=%.2f", key[:12], run_s)
+        return value
+
+    def get(self, key: str, *, wait_s: float = 0.0) -> Optional[SpeculativeResult]:
+        """A stored result, or (with `wait_s`) the result of a run in flight for `key`."""
+        hit = self.results.get(key)
+        if hit is None and wait_s > 0:
+            with self._lock:
+                fut = self._in_flight.get(key)
+            if fut is not None:
+                try:
+                    fut.result(timeout=wait_s)
+                except Exception:
+                    pass
+                hit = self.results.get(key)
+        with self._lock:
+            self.counts["hits" if hit is not None else "misses"] += 1
+        return hit
+
+    def running(self, key: str) -> bool:
+        with self._lock:
+            return key in self._in_flight
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.counts, "in_flight": len(self._in_flight), "stored": len(self.results)}
+
+
+_default_lock = threading.Lock()
+_default_runner: Optional[SpeculationRunner] = None
+
+
+def shared_speculation_runner() -> SpeculationRunner:
+    """Process-wide runner (SPECULATIVE_DEBOUNCE_S / SPECULATIVE_MAX_RESULTS env vars)."""
+    global _default_runner
+    with _default_lock:
+        if _default_runner is None:
+            _default_runner = SpeculationRunner(
+                debounce_s=float(get_env("SPECULATIVE_DEBOUNCE_S", "1.5") or 1.5),
+                max_results=int(get_env("SPECULATIVE_MAX_RESULTS", "64") or 64),
+            )
+        return _default_runner
+
+
+class SpeculativeEvaluator:
+    """Trainee/patient evaluation keys and tasks on top of a (shared) `SpeculationRunner`."""
+
+    def __init__(
+        self,
+        trainee_pipeline: Any,
+        *,
+        patient_evaluator: Optional[Any] = None,
+        runner: Optional[SpeculationRunner] = None,
+        enabled: Optional[bool] = None,
+        patient_enabled: Optional[bool] = None,
+    ) -> None:
+        self.trainee_pipeline = trainee_pipeline
+        self.patient_evaluator = patient_evaluator
+        self.runner = runner or shared_speculation_runner()
+        self.enabled = _env_flag("SPECULATIVE_EVAL", "1") if enabled is None else enabled
+        self.patient_enabled = _env_flag("SPECULATIVE_PATIENT_EVAL", "0") if patient_enabled is None else patient_enabled
+
+    # ---- keys ----
+    def trainee_key(
+        self,
+        conversation: Conversation,
+        *,
+        condition: str,
+        language: str,
+        rubric: Dict[str, Any],
+        judge_config: Any,
+        cascade: Optional[Any] = None,
+    ) -> str:
+        from src.trainee_judge.judge_cache import judge_cache_key
+
+        return canonical_hash(
+            {
+                "kind": "speculative/trainee/v1",
+                "judge": judge_cache_key(conversation, rubric=rubric, language=language, condition=condition, config=judge_config),
+                "cascade": asdict(cascade) if cascade is not None else None,
+            }
+        )
+
+    def patient_key(self, conversation: Conversation, *, condition: str, language: str, config: PatientEvalConfig) -> str:
+        return canonical_hash(
+            {
+                "kind": "speculative/patient/v1",
+                "transcript": ConversationLog.coerce(conversation).dialogue_fingerprint,
+                "condition": condition,
+                "language": language,
+                "config": asdict(config),
+            }
+        )
+
+    # ---- scheduling ----
+    def schedule(
+        self,
+        conversation: Conversation,
+        *,
+        session_id: str,
+        condition: str,
+        language: str,
+        rubric: Optional[Dict[str, Any]],
+        judge_config: Any,
+        cascade: Optional[Any] = None,
+        patient_config: Optional[PatientEvalConfig] = None,
+    ) -> None:
+        """Called after each exchange; supersedes whatever this session had pending."""
+        if not self.enabled:
+            return
+        log = ConversationLog.coerce(conversation)  # immutable: safe to hand to a worker thread
+        transcript = log.dialogue_fingerprint
+        tasks: Dict[str, Tuple[str, Callable[[], Any]]] = {}
+        if rubric is not None and judge_config is not None:
+            key = self.trainee_key(log, condition=condition, language=language, rubric=rubric, judge_config=judge_config, cascade=cascade)
+            tasks[key] = (
+                transcript,
+                lambda: self.trainee_pipeline.run(
+                    log, language=language, condition=condition, rubric=rubric, judge_config=judge_config, cascade=cascade
+                ),
+            )
+        if self.patient_enabled and self.patient_evaluator is not None and getattr(self.patient_evaluator, "available", True):
+            pcfg = patient_config or PatientEvalConfig()
+            key = self.patient_key(log, condition=condition, language=language, config=pcfg)
+            tasks[key] = (
+                transcript,
+                lambda: self.patient_evaluator.evaluate(log, condition=condition, language=language, config=pcfg),
+            )
+        if tasks:
+            self.runner.schedule(session_id, tasks)
+
+    # ---- lookups ----
+    def trainee_result(
+        self,
+        conversation: Conversation,
+        *,
+        condition: str,
+        language: str,
+        rubric: Dict[str, Any],
+        judge_config: Any,
+        cascade: Optional[Any] = None,
+        wait_s: float = 0.0,
+    ) -> Optional[Tuple[TraineeEvalResult, Dict[str, Any]]]:
+        key = self.trainee_key(conversation, condition=condition, language=language, rubric=rubric, judge_config=judge_config, cascade=cascade)
+        hit = self.runner.get(key, wait_s=wait_s)
+        return (hit.value, {**hit.info(), "key": key}) if hit is not None else None
+
+    def patient_result(
+        self, conversation: Conversation, *, condition: str, language: str, config: PatientEvalConfig, wait_s: float = 0.0
+    ) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        key = self.patient_key(conversation, condition=condition, language=language, config=config)
+        hit = self.runner.get(key, wait_s=wait_s)
+        return (hit.value, {**hit.info(), "key": key}) if hit is not None else None
+
+    def report(self) -> Dict[str, Any]:
+        return self.runner.report()
@@ -0,0 +1,326 @@
+"""src.evaluation.trainee.batch
+
+Cohort batch judging: run `TraineeEvalPipeline` over a JSONL of transcripts with
+bounded concurrency, streaming scored results to JSONL.
+
+Input lines need `conversation` (message dicts), `language`, `condition`; an `id` or
+`job_id` is used when present (self-play output from `src.selfplay.engine` works as-is),
+otherwise the id is a hash of the transcript. Output lines keep the self-play shape plus
+`scored` / `judge_grade` / `judge_meta`, so they feed `src.export.parquet_export ingest --selfplay`.
+
+Resumable: a manifest (`<out>.manifest.jsonl` by default) records every finished item
+with a run key (rubric fingerprint + judge config). Re-running the same command skips
+items already judged under that run key and retries the failed ones; changing the
+rubric or judge settings re-judges everything.
+
+    python -m src.evaluation.trainee.batch --in data/selfplay.jsonl --out data/judged.jsonl \\
+        --rubric rubrics/psychiatry_intake.json --concurrency 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+
+from src.evaluation.trainee.pipeline import TraineeEvalPipeline
+from src.trainee_judge.sharded_judge import is_partial
+from src.utils.hashing import canonical_hash
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+ProgressFn = Callable[[Dict[str, Any]], None]
+
+
+class PartialGradeError(RuntimeError):
+    """The judge returned a grade with failed shards (items not actually judged)."""
+
+
+@dataclass(frozen=True)
+class BatchItem:
+    item_id: str
+    conversation: List[Dict[str, str]]
+    language: str
+    condition: str
+    source: Dict[str, Any]      # remaining input fields, carried to the output line
+
+
+def read_items(path: Path) -> Iterator[BatchItem]:
+    """Judgeable input lines; failed self-play jobs and torn lines are skipped."""
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            conversation = rec.get("conversation")
+            if rec.get("status", "ok") != "ok" or not conversation:
+                continue
+            language = rec.get("language", "English")
+            condition = rec.get("condition", "") or ""
+            item_id = str(
+                rec.get("id")
+                or rec.get("job_id")
+                or canonical_hash({"conversation": conversation, "language": language, "condition": condition})[:16]
+            )
+            source = {k: v for k, v in rec.items() if k not in ("conversation", "scored", "judge_grade", "judge_meta", "status", "error")}
+            yield BatchItem(item_id, conversation, language, condition, source)
+
+
+def run_key(rubric: Dict[str, Any], judge_config: Optional[Any], cascade: Optional[Any] = None) -> str:
+    from src.trainee_judge.trainee_judge_schema import rubric_fingerprint
+
+    config = asdict(judge_config) if judge_config is not None else {}
+    config.pop("use_cache", None)  # cache use does not change what a result means
+    payload: Dict[str, Any] = {"rubric_fingerprint": rubric_fingerprint(rubric), "judge_config": config}
+    if cascade is not None:  # cascade results differ from single-model ones; plain runs keep their old keys
+        payload["cascade"] = asdict(cascade)
+    return canonical_hash(payload)[:16]
+
+
+def default_manifest_path(out_path: Path) -> Path:
+    return out_path.with_name(out_path.name + ".manifest.jsonl")
+
+
+def completed_items(manifest_path: Path, out_path: Path, key: str) -> Set[str]:
+    """Item ids finished under `key`. The output file is consulted too, since a crash can
+    land between writing a result and recording it in the manifest."""
+    done: Set[str] = set()
+    for path in (manifest_path, out_path):
+        if not path.exists():
+            continue
+        with path.open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if rec.get("status") == "ok" and rec.get("run_key") == key and rec.get("item_id"):
+                    done.add(rec["item_id"])
+    return done
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    s = sorted(values)
+    return round(s[min(len(s) - 1, int(q * len(s)))], 3)
+
+
+async def judge_many(
+    items: List[BatchItem],
+    out_path: Path,
+    *,
+    pipeline: TraineeEvalPipeline,
+    rubric: Dict[str, Any],
+    judge_config: Optional[Any] = None,
+    concurrency: int = 8,
+    max_attempts: int = 3,
+    manifest_path: Optional[Path] = None,
+    on_progress: Optional[ProgressFn] = None,
+) -> Dict[str, Any]:
+    """Judge + score every item not yet done under this run key; returns a run summary."""
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    manifest_path = manifest_path or default_manifest_path(out_path)
+    # Mirrors TraineeEvalPipeline.run: the cascade applies only with a regex stage and a judge config.
+    cascade = pipeline.cascade if pipeline.regex_fn is not None and judge_config is not None else None
+    key = run_key(rubric, judge_config, cascade)
+    done = completed_items(manifest_path, out_path, key)
+    pending = [it for it in items if it.item_id not in done]
+    logger.info("judge_many: %d items, %d already done, %d pending (run %s)", len(items), len(items) - len(pending), len(pending), key)
+
+    sem = asyncio.Semaphore(max(1, concurrency))
+    # pipeline.run is synchronous (the judge blocks on HTTP); one thread per concurrent item.
+    executor = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="judge-many")
+    loop = asyncio.get_running_loop()
+    counts = {"ok": 0, "error": 0, "retries": 0}
+    latencies: List[float] = []
+    failures: List[Dict[str, Any]] = []
+    t0 = time.perf_counter()
+
+    def run_one(item: BatchItem):
+        result = pipeline.run(
+            item.conversation, language=item.language, condition=item.condition, rubric=rubric, judge_config=judge_config
+        )
+        if is_partial(result.judge_meta):
+            # Failed judge shards: retry, and record an error (not "ok") so a resume re-runs it.
+            raise PartialGradeError(f"judge shards failed: {(result.judge_meta.get('sharded') or {}).get('failed_shards')}")
+        return result
+
+    with out_path.open("a", encoding="utf-8") as out, manifest_path.open("a", encoding="utf-8") as manifest:
+
+        def write(f, rec: Dict[str, Any]) -> None:
+            # Single event loop thread: each line is written and flushed whole.
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            f.flush()
+
+        async def worker(item: BatchItem) -> None:
+            async with sem:
+                started = time.perf_counter()
+                error: Optional[BaseException] = None
+                attempts = 0
+                result = None
+                for attempt in range(max(1, max_attempts)):
+                    attempts += 1
+                    try:
+                        result = await loop.run_in_executor(executor, run_one, item)
+                        break
+                    except Exception as e:  # rate-limit storms, transient API errors, bad JSON
+                        error = e
+                        if attempt + 1 < max_attempts:
+                            counts["retries"] += 1
+                            await asyncio.sleep(min(30.0, 2.0 * 2**attempt) * (0.5 + random.random()))
+                elapsed = time.perf_counter() - started
+
+                status = "ok" if result is not None else "error"
+                entry = {"item_id": item.item_id, "run_key": key, "status": status, "attempts": attempts, "elapsed_s": round(elapsed, 3)}
+                if result is not None:
+                    from src.trainee_judge.judge_cache import jsonable_meta
+
+                    write(
+                        out,
+                        {
+                            **item.source,
+                            "item_id": item.item_id,
+                            "run_key": key,
+                            "conversation": item.conversation,
+                            "language": item.language,
+                            "condition": item.condition,
+                            "scored": result.scored,
+                            "judge_grade": result.judge_grade,
+                            "judge_meta": jsonable_meta(result.judge_meta or {}),
+                            "status": "ok",
+                        },
+                    )
+                    latencies.append(elapsed)
+                else:
+                    entry["error"] = repr(error)
+                    failures.append({"item_id": item.item_id, "attempts": attempts, "error": repr(error)})
+                    logger.warning("judge_many: %s failed after %d attempts: %r", item.item_id, attempts, error)
+                write(manifest, {**entry, "finished_at": time.time()})
+                counts[status] += 1
+
+                finished = counts["ok"] + counts["error"]
+                wall = time.perf_counter() - t0
+                rate = counts["ok"] / wall * 60 if wall > 0 else 0.0
+                progress = {
+                    "finished": finished,
+                    "pending": len(pending),
+                    "ok": counts["ok"],
+                    "error": counts["error"],
+                    "items_per_min": round(rate, 2),
+                    "eta_s": round((len(pending) - finished) / (rate / 60), 1) if rate > 0 else None,
+                }
+                if on_progress is not None:
+                    on_progress(progress)
+                if finished % 10 == 0 or finished == len(pending):
+                    logger.info(
+                        "judge_many: %d/%d done (%d errors), %.1f items/min, eta %ss",
+                        finished,
+                        len(pending),
+                        counts["error"],
+                        rate,
+                        progress["eta_s"],
+                    )
+
+        try:
+            await asyncio.gather(*(worker(it) for it in pending))
+        finally:
+            executor.shutdown(wait=False)
+
+    elapsed = time.perf_counter() - t0
+    return {
+        "run_key": key,
+        "items": len(items),
+        "skipped_done": len(items) - len(pending),
+        "ok": counts["ok"],
+        "error": counts["error"],
+        "retries": counts["retries"],
+        "failures": failures,
+        "elapsed_s": round(elapsed, 3),
+        "items_per_min": round((counts["ok"] / elapsed) * 60, 2) if elapsed > 0 else None,
+        "item_latency_p50_s": _percentile(latencies, 0.5),
+        "item_latency_p95_s": _percentile(latencies, 0.95),
+        "out": str(out_path),
+        "manifest": str(manifest_path),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--in", dest="inp", required=True, help="JSONL of transcripts (e.g. self-play output).")
+    ap.add_argument("--out", required=True)
+    ap.add_argument("--manifest", default=None, help="Defaults to <out>.manifest.jsonl.")
+    ap.add_argument("--rubric", default=None, help="Rubric JSON (defaults to the app's rubric).")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--max-attempts", type=int, default=3, help="Per-item attempts before recording a failure.")
+    ap.add_argument("--model", default="openai/gpt-oss-120b")
+    ap.add_argument("--reasoning-effort", default="medium")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--no-strict", action="store_true", help="Use json_object mode instead of strict JSON Schema.")
+    ap.add_argument("--shard-size", type=int, default=0, help="Items per judge shard (0 = one call).")
+    ap.add_argument("--no-cache", action="store_true", help="Bypass judge cache reads.")
+    ap.add_argument("--ensemble", type=int, default=1, help="Max self-consistency samples per transcript (1 = off).")
+    ap.add_argument("--ensemble-temperature", type=float, default=None)
+    ap.add_argument("--cascade", action="store_true", help="Regex pre-screen -> 20b -> escalate uncertain items to 120b.")
+    ap.add_argument("--transcript-format", choices=["json", "compact"], default="json")
+    ap.add_argument("--max-patient-turn-chars", type=int, default=None, help="Truncate overlong patient turns.")
+    ap.add_argument("--base-url", default=None, help="Override the Groq base URL (e.g. a local stub server).")
+    args = ap.parse_args(argv)
+
+    from src.utils.env import load_env
+
+    load_env()
+
+    from src.evaluation.trainee.cascade import CascadeConfig
+    from src.evaluation.trainee.legacy_regex import evaluate_trainee
+    from src.trainee_judge.judge_cache import shared_cached_judge
+    from src.trainee_judge.trainee_judge_groq import GroqJudgeConfig
+    from src.trainee_judge.trainee_judge_schema import load_rubric
+    from src.trainee_judge.trainee_score import score_from_judge_output
+
+    pipeline = TraineeEvalPipeline(
+        rubric_loader=load_rubric,
+        judge_fn=shared_cached_judge(),
+        scorer_fn=score_from_judge_output,
+        regex_fn=evaluate_trainee,
+        cascade=CascadeConfig() if args.cascade else None,
+    )
+    config = GroqJudgeConfig(
+        model=args.model,
+        seed=args.seed,
+        reasoning_effort=args.reasoning_effort,
+        strict_schema=not args.no_strict,
+        base_url=args.base_url,
+        use_cache=not args.no_cache,
+        shard_size=args.shard_size or None,
+        transcript_format=args.transcript_format,
+        ensemble_size=args.ensemble,
+        ensemble_temperature=args.ensemble_temperature,
+        max_patient_turn_chars=args.max_patient_turn_chars,
+    )
+    out_path = Path(args.out)
+    summary = asyncio.run(
+        judge_many(
+            list(read_items(Path(args.inp))),
+            out_path,
+            pipeline=pipeline,
+            rubric=pipeline.load_rubric(args.rubric),
+            judge_config=config,
+            concurrency=args.concurrency,
+            max_attempts=args.max_attempts,
+            manifest_path=Path(args.manifest) if args.manifest else None,
+        )
+    )
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""src.evaluation.trainee.cascade
+
+Cost-aware judging cascade for `TraineeEvalPipeline`:
+
+  1. regex pre-screen (`legacy_regex.evaluate_trainee`): items whose rubric patterns
+     match a trainee turn are accepted as achieved (pattern hits are reliable; misses
+     are not, the patterns are narrow). Gated items whose gate is inactive are skipped:
+     the scorer excludes them anyway;
+  2. the remaining items are graded by the small model in one call;
+  3. items the small model is unsure about (confidence < `escalate_below_confidence`)
+     or that disagree with the regex stage without strong confidence (achieved although
+     no pattern matched, for items that have patterns in this language, confidence <
+     `disagreement_confidence`) are re-graded by the large model.
+
+Everything merges into one grade with the shape `score_from_judge_output` expects.
+meta["cascade"] reports per-stage item counts and hit rates, tokens and latency, plus an
+estimate of what always-large judging would have cost; `cascade_report()` aggregates
+runs in this process, including always-large latency observed on non-cascade runs.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.patient_sim.hedging import LatencyWindow
+from src.state.conversation import ConversationLog, HistoryLike
+from src.trainee_judge.compiled_rubric import CompiledRubric, compile_rubric
+from src.trainee_judge.sharded_judge import is_partial
+from src.utils.tokens import estimate_messages_tokens, sum_usage, usage_counts
+
+
+@dataclass(frozen=True)
+class CascadeConfig:
+    small_model: str = "openai/gpt-oss-20b"
+    large_model: str = "openai/gpt-oss-120b"
+    regex_confidence: float = 0.9            # confidence stamped on regex-accepted items
+    escalate_below_confidence: float = 0.75
+    escalate_on_disagreement: bool = True
+    disagreement_confidence: float = 0.9     # a disagreeing small-model verdict this sure is kept
+
+
+def _tokens(meta: Dict[str, Any]) -> Dict[str, int]:
+    if (meta.get("cache") or {}).get("hit"):
+        return {}  # served from cache: nothing spent
+    return usage_counts(meta.get("usage"))
+
+
+def _sub_rubric(rb: CompiledRubric, ids: List[str]) -> CompiledRubric:
+    keep = set(ids)
+    return compile_rubric({**rb, "items": [it for it in rb["items"] if str(it["id"]).strip() in keep]})
+
+
+class _Stats:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.runs = 0
+        self.items = {"regex": 0, "small": 0, "large": 0, "skipped": 0}
+        self.tokens = 0
+        self.baseline_tokens = 0
+        self.latency = LatencyWindow(500)
+        self.always_large_latency = LatencyWindow(500)
+
+
+_stats = _Stats()
+
+
+def record_always_large(latency_s: float) -> None:
+    """Called by the pipeline for non-cascade runs on the large model (latency baseline)."""
+    _stats.always_large_latency.add(latency_s)
+
+
+def run_cascade(
+    conversation: HistoryLike,
+    *,
+    rubric: Dict[str, Any],
+    language: str,
+    condition: str,
+    judge_fn: Callable[..., Tuple[Dict[str, Any], Dict[str, Any]]],
+    regex_fn: Callable[..., Dict[str, Any]],
+    judge_config: Any,
+    cascade: CascadeConfig = CascadeConfig(),
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    t0 = time.perf_counter()
+    rb = compile_rubric(rubric)
+    log = ConversationLog.coerce(conversation)
+    turns = log.numbered_turns()
+    results: Dict[str, Dict[str, Any]] = {}
+    stage_of: Dict[str, str] = {}
+
+    # ---- Stage 1: regex pre-screen ----
+    t_regex = time.perf_counter()
+    legacy = regex_fn(log, condition=condition, language=language, rubric=rb)
+    regex_latency = time.perf_counter() - t_regex
+    checked = {str(x.get("id")): x for x in legacy.get("checklist") or []}
+    trainee_turn = {}
+    for t in turns:
+        if t["role"] == "trainee":
+            trainee_turn.setdefault(t["content"], t["turn"])
+    for item_id in rb.item_ids:
+        row = checked.get(item_id)
+        if row is None:  # gated out (gate inactive): not applicable, scorer excludes it
+            results[item_id] = {
+                "achieved": False,
+                "confidence": 0.0,
+                "evidence_turns": [],
+                "rationale": "Not graded: item gate inactive for this conversation.",
+            }
+            stage_of[item_id] = "skipped"
+        elif row.get("evidence"):
+            results[item_id] = {
+                "achieved": True,
+                "confidence": cascade.regex_confidence,
+                "evidence_turns": [trainee_turn[row["evidence"]]] if row["evidence"] in trainee_turn else [],
+                "rationale": "Matched rubric pattern (regex pre-screen).",
+            }
+            stage_of[item_id] = "regex"
+    remaining = [i for i in rb.item_ids if i not in results]
+
+    stages: Dict[str, Dict[str, Any]] = {
+        "regex": {"items": len(rb.item_ids), "resolved": sum(1 for s in stage_of.values() if s == "regex"), "latency_s": round(regex_latency, 4)},
+        "small": {"items": len(remaining), "resolved": 0, "calls": 0, "tokens": {}, "latency_s": 0.0},
+        "large": {"items": 0, "resolved": 0, "calls": 0, "tokens": {}, "latency_s": 0.0},
+    }
+    flags: List[Dict[str, Any]] = []
+    feedback: List[str] = []
+    metas: Dict[str, Dict[str, Any]] = {}
+
+    def judge(stage: str, model: str, ids: List[str]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        grade, meta = judge_fn(
+            log, language=language, condition=condition, rubric=_sub_rubric(rb, ids), config=replace(judge_config, model=model)
+        )
+        s = stages[stage]
+        s["calls"] += 1
+        s["latency_s"] = round(time.perf_counter() - started, 3)
+        s["tokens"] = _tokens(meta)
+        metas[stage] = meta
+        return grade
+
+    # ---- Stage 2: small model on the rest ----
+    escalate: List[str] = []
+    small_flags: List[Dict[str, Any]] = []
+    if remaining:
+        small = judge("small", cascade.small_model, remaining)
+        small_results = small.get("item_results") or {}
+        for item_id in remaining:
+            r = small_results.get(item_id)
+            confidence = float((r or {}).get("confidence", 0.0) or 0.0)
+            disagrees = (
+                cascade.escalate_on_disagreement
+                and bool((r or {}).get("achieved"))
+                and confidence < cascade.disagreement_confidence
+                and bool(rb.item_patterns(item_id, language))
+            )
+            if r is None or confidence < cascade.escalate_below_confidence or disagrees:
+                escalate.append(item_id)
+            else:
+                results[item_id] = r
+                stage_of[item_id] = "small"
+        stages["small"]["resolved"] = len(remaining) - len(escalate)
+        small_flags = [f for f in small.get("flags") or [] if f.get("item_id") not in escalate]
+        feedback = list(small.get("summary_feedback") or [])
+
+    # ---- Stage 3: large model on uncertain / disputed items ----
+    if escalate:
+        stages["large"]["items"] = len(escalate)
+        large = judge("large", cascade.large_model, escalate)
+        large_results = large.get("item_results") or {}
+        for item_id in escalate:
+            results[item_id] = large_results.get(item_id) or {
+                "achieved": False,
+                "confidence": 0.0,
+                "evidence_turns": [],
+                "rationale": "Missing from judge output; defaulted to achieved=false.",
+            }
+            stage_of[item_id] = "large"
+        stages["large"]["resolved"] = len(escalate)
+        flags.extend(large.get("flags") or [])
+        feedback = list(large.get("summary_feedback") or []) or feedback
+    flags = small_flags + flags
+
+    grade = {
+        "rubric_id": rb.get("rubric_id", ""),
+        "rubric_version": rb.get("version", ""),
+        "rubric_fingerprint": rb.fingerprint,
+        "item_results": {i: results[i] for i in rb.item_ids},
+        "flags": flags,
+        "summary_feedback": feedback,
+    }
+
+    # ---- Reporting ----
+    latency = time.perf_counter() - t0
+    total_tokens = sum_usage([stages["small"]["tokens"], stages["large"]["tokens"]])
+    baseline = _always_large_estimate(rb, turns, language, condition, stages, len(remaining), len(escalate))
+    n = len(rb.item_ids)
+    for s in stages.values():
+        s["hit_rate"] = round(s["resolved"] / s["items"], 3) if s.get("items") else None
+    with _stats.lock:
+        _stats.runs += 1
+        for i_stage in stage_of.values():
+            _stats.items[i_stage] += 1
+        _stats.tokens += total_tokens.get("total_tokens", 0)
+        _stats.baseline_tokens += baseline or 0
+    _stats.latency.add(latency)
+
+    base_meta = metas.get("large") or metas.get("small") or {}
+    meta = {
+        "model": [m for m, st in ((cascade.small_model, "small"), (cascade.large_model, "large")) if st in metas] or ["regex"],
+        "system_fingerprint": base_meta.get("system_fingerprint"),
+        "usage": total_tokens,
+        "seed": getattr(judge_config, "seed", None),
+        "temperature": getattr(judge_config, "temperature", None),
+        "strict_schema": getattr(judge_config, "strict_schema", None),
+        "partial": any(is_partial(m) for m in metas.values()),
+        "cascade": {
+            "stages": stages,
+            "item_stage": stage_of,
+            "resolved_share": {k: round(sum(1 for v in stage_of.values() if v == k) / n, 3) for k in ("regex", "small", "large", "skipped")},
+            "latency_s": round(latency, 3),
+            "total_tokens": total_tokens.get("total_tokens"),
+            "always_large_tokens_estimate": baseline,
+            "always_large_latency_p50_s": _stats.always_large_latency.percentile(0.5),
+        },
+    }
+    return grade, meta
+
+
+def _always_large_estimate(
+    rb: CompiledRubric,
+    turns: List[Dict[str, Any]],
+    language: str,
+    condition: str,
+    stages: Dict[str, Dict[str, Any]],
+    n_small: int,
+    n_large: int,
+) -> Optional[int]:
+    """Prompt tokens of one full-rubric call + completion tokens scaled per item from the observed stages."""
+    from src.trainee_judge.trainee_judge_groq import build_messages
+
+    prompt = estimate_messages_tokens(build_messages(rb, turns, language=language, condition=condition))
+    per_item = [
+        stages[s]["tokens"]["completion_tokens"] / k
+        for s, k in (("small", n_small), ("large", n_large))
+        if k and stages[s]["tokens"].get("completion_tokens")
+    ]
+    if not per_item:
+        return None
+    return int(prompt + len(rb.item_ids) * (sum(per_item) / len(per_item)))
+
+
+def cascade_report() -> Dict[str, Any]:
+    """Per-stage item resolution, tokens and latency across cascade runs in this process."""
+    with _stats.lock:
+        items = dict(_stats.items)
+        total = sum(items.values())
+        return {
+            "runs": _stats.runs,
+            "resolved_share": {k: round(v / total, 3) if total else None for k, v in items.items()},
+            "total_tokens": _stats.tokens,
+            "always_large_tokens_estimate": _stats.baseline_tokens,
+            "token_savings_pct": round(100 * (1 - _stats.tokens / _stats.baseline_tokens), 1) if _stats.baseline_tokens else None,
+            "latency": _stats.latency.summary(),
+            "always_large_latency": _stats.always_large_latency.summary(),
+        }
@@ -9,11 +9,18 @@ This file is adapted from your original `evaluation_engine.py`.
 
 from __future__ import annotations
 
-import json
 import re
 from pathlib import Path
-from typing import Any, Dict, List, Optional
-
+from typing import Any, Dict, List, Optional, Pattern, Sequence, Union
+
+from src.state.conversation import ConversationLog, HistoryLike
+from src.trainee_judge.compiled_rubric import (
+    CompiledRubric,
+    compile_rubric,
+    load_compiled_rubric,
+    risk_patterns_for,
+)
+from src.trainee_judge.gates import evaluate_gates
 from src.utils.paths import resolve_rubric_path
 
 
@@ -35,16 +42,22 @@ def normalize(text: str) -> str:
     return t
 
 
-def any_match(patterns: List[str], text: str) -> bool:
+def any_match(patterns: Sequence[Union[str, Pattern[str]]], text: str) -> bool:
+    """Patterns may be strings or precompiled (CompiledRubric) regexes."""
     for p in patterns or []:
-        if re.search(p, text, flags=re.IGNORECASE):
+        if (p.search(text) if isinstance(p, re.Pattern) else re.search(p, text, flags=re.IGNORECASE)):
             return True
     return False
 
 
-def find_evidence(patterns: List[str], messages: List[str]) -> Optional[str]:
-    for m in messages or []:
-        nm = normalize(m)
+def find_evidence(
+    patterns: Sequence[Union[str, Pattern[str]]],
+    messages: List[str],
+    normalized: Optional[List[str]] = None,
+) -> Optional[str]:
+    """First message matching any pattern; pass `normalized` to reuse normalization across items."""
+    for i, m in enumerate(messages or []):
+        nm = normalized[i] if normalized is not None else normalize(m)
         if any_match(patterns, nm):
             return m
     return None
@@ -54,12 +67,11 @@ def find_evidence(patterns: List[str], messages: List[str]) -> Optional[str]:
 # Rubric loading (JSON)
 # ----------------------------
 
-def load_rubric(rubric_path: str | Path) -> Dict[str, Any]:
+def load_rubric(rubric_path: str | Path) -> CompiledRubric:
     path = Path(rubric_path)
     if not path.exists():
         raise FileNotFoundError(f"Rubric JSON not found: {path}")
-    with path.open("r", encoding="utf-8") as f:
-        rubric = json.load(f)
+    rubric = load_compiled_rubric(path)
     _validate_rubric_minimal(rubric)
     return rubric
 
@@ -89,24 +101,11 @@ def _validate_rubric_minimal(rubric: Dict[str, Any]) -> None:
             raise ValueError(f"Rubric item '{item.get('id')}' must include patterns_en and/or patterns_ar.")
 
 
-def _patterns_for_language(obj: Dict[str, Any], language: str) -> List[str]:
-    if language == "Arabic":
-        return (obj.get("patterns_ar") or []) or (obj.get("patterns_en") or [])
-    return (obj.get("patterns_en") or []) or (obj.get("patterns_ar") or [])
-
-
 # ----------------------------
 # Patient cue detection (risk)
 # ----------------------------
-_DEFAULT_PATIENT_RISK_CUES = {
-    "patterns_en": [r"\b(suicid|kill myself|end my life|self[- ]harm|hurt myself)\b"],
-    "patterns_ar": [r"(انتحار|اقتل نفسي|انهي حياتي|ايذاء النفس|اؤذي نفسي)"],
-}
-
-
 def patient_risk_positive(patient_msgs: List[str], rubric: Dict[str, Any], language: str) -> bool:
-    cue = (rubric or {}).get("patient_cues", {}).get("risk_positive", _DEFAULT_PATIENT_RISK_CUES)
-    patterns = _patterns_for_language(cue, language)
+    patterns = risk_patterns_for(rubric, language)
     joined = " ".join(normalize(m) for m in (patient_msgs or []))
     return any_match(patterns, joined)
 
@@ -116,7 +115,7 @@ def patient_risk_positive(patient_msgs: List[str], rubric: Dict[str, Any], langu
 # ----------------------------
 
 def evaluate_trainee(
-    conversation_history: List[Dict[str, str]],
+    conversation_history: HistoryLike,
     condition: str,
     language: str,
     rubric: Optional[Dict[str, Any]] = None,
@@ -127,11 +126,15 @@ def evaluate_trainee(
     if rubric is None:
         p = resolve_rubric_path(rubric_path)
         rubric = load_rubric(p)
+    rubric = compile_rubric(rubric)
 
-    trainee_msgs = [m.get("content", "") for m in conversation_history if m.get("role") == "user"]
-    patient_msgs = [m.get("content", "") for m in conversation_history if m.get("role") == "assistant"]
+    log = ConversationLog.coerce(conversation_history)
+    trainee_view = log.by_role("user")
+    trainee_msgs = trainee_view.contents()
+    trainee_norm = [t.normalized for t in trainee_view]
 
-    risk_positive = patient_risk_positive(patient_msgs, rubric, language)
+    gates = evaluate_gates(log, rubric, language)  # shared with the scorer's memoized gate results
+    risk_positive = gates.active("patient_risk_positive")
 
     checklist_results = []
     total = 0.0
@@ -142,12 +145,12 @@ def evaluate_trainee(
         weight = float(item.get("weight", 0))
         total_possible += weight
 
-        if item.get("gate") == "patient_risk_positive" and not risk_positive:
+        if not gates.active(item.get("gate")):
             total_possible -= weight
             continue
 
-        patterns = _patterns_for_language(item, language)
-        ev = find_evidence(patterns, trainee_msgs)
+        patterns = rubric.item_patterns(str(item["id"]).strip(), language)
+        ev = find_evidence(patterns, trainee_msgs, trainee_norm)
         score = weight if ev else 0.0
 
         checklist_results.append(
@@ -8,24 +8,38 @@ Swap judge/scorer implementations here to enable drop-in changes.
 
 from __future__ import annotations
 
+import time
 from dataclasses import dataclass
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, Optional
 
+from src.evaluation.trainee.cascade import CascadeConfig, record_always_large, run_cascade
 from src.evaluation.trainee.interfaces import Conversation, TraineeEvalResult
+from src.trainee_judge.compiled_rubric import CompiledRubric, compile_rubric
 from src.utils.paths import resolve_rubric_path
 
 
 @dataclass(frozen=True)
 class TraineeEvalPipeline:
-    """Orchestrates: load rubric -> judge -> deterministic score."""
+    """Orchestrates: load rubric -> judge -> deterministic score.
+
+    With a `cascade` config (and `regex_fn`, the legacy regex evaluator) the judge step
+    becomes regex pre-screen -> small model -> large model for uncertain items.
+
+    `on_item(item_id, item_result)` is called for every rubric item before scoring: as each
+    one streams in when the judge supports it, otherwise for all of them once judging ends.
+    """
 
     rubric_loader: Any
     judge_fn: Any
     scorer_fn: Any
+    regex_fn: Any = None
+    cascade: Optional[CascadeConfig] = None
 
-    def load_rubric(self, rubric_path: Optional[str]) -> Dict[str, Any]:
+    def load_rubric(self, rubric_path: Optional[str]) -> CompiledRubric:
         p = resolve_rubric_path(rubric_path)
-        return self.rubric_loader(p)
+        rb = compile_rubric(self.rubric_loader(p))
+        rb.gate_engine  # surface invalid "gates" definitions at load time
+        return rb
 
     def run(
         self,
@@ -36,8 +50,11 @@ class TraineeEvalPipeline:
         rubric: Optional[Dict[str, Any]] = None,
         rubric_path: Optional[str] = None,
         judge_config: Optional[Any] = None,
+        cascade: Optional[CascadeConfig] = None,
+        on_item: Optional[Callable[[str, Dict[str, Any]], None]] = None,
     ) -> TraineeEvalResult:
-        rb = rubric or self.load_rubric(rubric_path)
+        # Compiled once per rubric version; judge and scorer share the precomputed data.
+        rb = compile_rubric(rubric) if rubric is not None else self.load_rubric(rubric_path)
 
         judge_kwargs = {
             "language": language,
@@ -47,7 +64,37 @@ class TraineeEvalPipeline:
         if judge_config is not None:
             judge_kwargs["config"] = judge_config
 
-        grade, meta = self.judge_fn(conversation, **judge_kwargs)
+        seen = set()
+        if on_item is not None:
+            def _on_item(item_id: str, result: Dict[str, Any]) -> None:
+                seen.add(item_id)
+                on_item(item_id, result)
+
+            judge_kwargs["on_item"] = _on_item
+
+        cascade = cascade or self.cascade
+        if cascade is not None and self.regex_fn is not None and judge_config is not None:
+            grade, meta = run_cascade(
+                conversation,
+                rubric=rb,
+                language=language,
+                condition=condition,
+                judge_fn=self.judge_fn,
+                regex_fn=self.regex_fn,
+                judge_config=judge_config,
+                cascade=cascade,
+            )
+        else:
+            t0 = time.perf_counter()
+            grade, meta = self.judge_fn(conversation, **judge_kwargs)
+            if judge_config is not None and getattr(judge_config, "model", None) == CascadeConfig.large_model:
+                if not ((meta or {}).get("cache") or {}).get("hit"):
+                    record_always_large(time.perf_counter() - t0)  # latency baseline for cascade reports
+
+        if on_item is not None:  # cache hits, shards, ensembles, cascades: hand over the rest now
+            for item_id, result in (grade.get("item_results") or {}).items():
+                if item_id not in seen:
+                    on_item(item_id, result)
 
         scored = self.scorer_fn(
             conversation,
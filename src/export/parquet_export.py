@@ -0,0 +1,401 @@
+"""src.export.parquet_export
+
+Columnar export/import of transcripts and scored results (Parquet via pyarrow).
+
+Three hive-partitioned datasets under one root:
+
+    <root>/conversations/date=YYYY-MM-DD/language=.../*.parquet   one row per message
+    <root>/evaluations/rubric_id=.../date=.../*.parquet           one row per scored evaluation
+    <root>/item_results/rubric_id=.../date=.../*.parquet          one row per rubric item result
+
+`item_results` flattens `score_from_judge_output(...)["items"]` (achieved,
+confidence, evidence_turns, ...) so a term's worth of results can be scanned with
+column projection and partition pruning instead of parsing nested JSON:
+
+    from src.export.parquet_export import read_results
+    t = read_results(root, "item_results", columns=["item_id", "achieved"], where={"language": "Arabic"})
+
+CLI:
+    python -m src.export.parquet_export ingest --root data/results --selfplay data/selfplay.jsonl
+    python -m src.export.parquet_export ingest --root data/results --scored a.json b.json
+    python -m src.export.parquet_export scan --root data/results
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from src.state.conversation import ConversationLog, HistoryLike
+from src.utils.hashing import canonical_hash
+from src.utils.paths import project_root
+
+TABLES = ("conversations", "evaluations", "item_results")
+
+CONVERSATION_SCHEMA = pa.schema(
+    [
+        ("record_id", pa.string()),
+        ("conversation_key", pa.string()),
+        ("session_id", pa.string()),
+        ("seq", pa.int32()),
+        ("turn", pa.int32()),            # judge numbering (user/assistant only); null for system messages
+        ("role", pa.string()),
+        ("content", pa.string()),
+        ("condition", pa.string()),
+        ("created_at", pa.timestamp("s", tz="UTC")),
+        ("date", pa.string()),
+        ("language", pa.string()),
+    ]
+)
+
+EVALUATION_SCHEMA = pa.schema(
+    [
+        ("record_id", pa.string()),
+        ("conversation_key", pa.string()),
+        ("session_id", pa.string()),
+        ("condition", pa.string()),
+        ("language", pa.string()),
+        ("rubric_version", pa.string()),
+        ("rubric_fingerprint", pa.string()),
+        ("total_score", pa.float64()),
+        ("total_possible", pa.float64()),
+        ("percent", pa.float64()),
+        ("passed", pa.bool_()),
+        ("n_flags", pa.int32()),
+        ("flags_json", pa.string()),
+        ("summary_feedback", pa.list_(pa.string())),
+        ("judge_model", pa.string()),
+        ("system_fingerprint", pa.string()),
+        ("prompt_tokens", pa.int64()),
+        ("completion_tokens", pa.int64()),
+        ("meta_json", pa.string()),
+        ("created_at", pa.timestamp("s", tz="UTC")),
+        ("rubric_id", pa.string()),
+        ("date", pa.string()),
+    ]
+)
+
+ITEM_RESULT_SCHEMA = pa.schema(
+    [
+        ("record_id", pa.string()),
+        ("conversation_key", pa.string()),
+        ("condition", pa.string()),
+        ("language", pa.string()),
+        ("rubric_version", pa.string()),
+        ("item_id", pa.string()),
+        ("gate", pa.string()),
+        ("included", pa.bool_()),
+        ("achieved", pa.bool_()),
+        ("weight", pa.float64()),
+        ("points_awarded", pa.float64()),
+        ("confidence", pa.float64()),
+        ("evidence_turns", pa.list_(pa.int32())),
+        ("rationale", pa.string()),
+        ("created_at", pa.timestamp("s", tz="UTC")),
+        ("rubric_id", pa.string()),
+        ("date", pa.string()),
+    ]
+)
+
+_SCHEMAS = {"conversations": CONVERSATION_SCHEMA, "evaluations": EVALUATION_SCHEMA, "item_results": ITEM_RESULT_SCHEMA}
+_PARTITIONS = {
+    "conversations": ("date", "language"),
+    "evaluations": ("rubric_id", "date"),
+    "item_results": ("rubric_id", "date"),
+}
+
+
+def default_results_root() -> Path:
+    return project_root() / ".data" / "results"
+
+
+def _partitioning(table: str) -> ds.Partitioning:
+    return ds.partitioning(pa.schema([(c, pa.string()) for c in _PARTITIONS[table]]), flavor="hive")
+
+
+# -----------------------------
+# Records -> rows
+# -----------------------------
+
+
+@dataclass
+class EvaluationRecord:
+    """One conversation and (optionally) its scored evaluation."""
+
+    conversation: HistoryLike
+    condition: str = ""
+    language: str = "English"
+    session_id: str = ""
+    scored: Optional[Dict[str, Any]] = None
+    judge_grade: Optional[Dict[str, Any]] = None
+    judge_meta: Optional[Dict[str, Any]] = None
+    created_at: float = field(default_factory=time.time)
+
+
+def _usage_value(usage: Any, name: str) -> Optional[int]:
+    if usage is None:
+        return None
+    v = usage.get(name) if isinstance(usage, Mapping) else getattr(usage, name, None)
+    return int(v) if isinstance(v, (int, float)) else None
+
+
+def _to_rows(rec: EvaluationRecord) -> Dict[str, List[Dict[str, Any]]]:
+    log = ConversationLog.coerce(rec.conversation)
+    created = datetime.fromtimestamp(rec.created_at, tz=timezone.utc)
+    date = created.strftime("%Y-%m-%d")
+    key = log.fingerprint  # content hash: identical transcripts share it
+    record_id = canonical_hash({"conversation": key, "session_id": rec.session_id, "created_at": rec.created_at})[:32]
+    rows: Dict[str, List[Dict[str, Any]]] = {t: [] for t in TABLES}
+
+    turn = 0
+    for seq, m in enumerate(log):
+        is_dialogue = m.role in ("user", "assistant")
+        turn += 1 if is_dialogue else 0
+        rows["conversations"].append(
+            {
+                "record_id": record_id,
+                "conversation_key": key,
+                "session_id": rec.session_id,
+                "seq": seq,
+                "turn": turn if is_dialogue else None,
+                "role": m.role,
+                "content": m.content,
+                "condition": rec.condition,
+                "created_at": created,
+                "date": date,
+                "language": rec.language,
+            }
+        )
+
+    scored = rec.scored
+    if not scored:
+        return rows
+
+    meta = rec.judge_meta or {}
+    grade = rec.judge_grade or {}
+    rubric_id = str(scored.get("rubric_id", "") or "")
+    common = {
+        "record_id": record_id,
+        "conversation_key": key,
+        "condition": rec.condition,
+        "language": rec.language,
+        "rubric_version": str(scored.get("rubric_version", "") or ""),
+        "created_at": created,
+        "rubric_id": rubric_id,
+        "date": date,
+    }
+    rows["evaluations"].append(
+        {
+            **common,
+            "session_id": rec.session_id,
+            "rubric_fingerprint": grade.get("rubric_fingerprint"),
+            "total_score": scored.get("total_score"),
+            "total_possible": scored.get("total_possible"),
+            "percent": scored.get("percent"),
+            "passed": scored.get("pass"),
+            "n_flags": len(scored.get("flags") or []),
+            "flags_json": json.dumps(scored.get("flags") or [], ensure_ascii=False),
+            "summary_feedback": [str(x) for x in scored.get("summary_feedback") or []],
+            "judge_model": meta.get("model"),
+            "system_fingerprint": meta.get("system_fingerprint"),
+            "prompt_tokens": _usage_value(meta.get("usage"), "prompt_tokens"),
+            "completion_tokens": _usage_value(meta.get("usage"), "completion_tokens"),
+            "meta_json": json.dumps(meta, ensure_ascii=False, default=str),
+        }
+    )
+    for it in scored.get("items") or []:
+        rows["item_results"].append(
+            {
+                **common,
+                "item_id": it.get("id"),
+                "gate": it.get("gate"),
+                "included": it.get("included"),
+                "achieved": it.get("achieved"),
+                "weight": it.get("weight"),
+                "points_awarded": it.get("points_awarded"),
+                "confidence": it.get("confidence"),
+                "evidence_turns": [int(x) for x in it.get("evidence_turns") or []],
+                "rationale": it.get("rationale"),
+            }
+        )
+    return rows
+
+
+# -----------------------------
+# Export
+# -----------------------------
+
+
+def export_records(records: Iterable[EvaluationRecord], root: str | Path) -> Dict[str, int]:
+    """Append records to the datasets under `root`. Returns rows written per table."""
+    root = Path(root)
+    buffers: Dict[str, List[Dict[str, Any]]] = {t: [] for t in TABLES}
+    for rec in records:
+        for table, rows in _to_rows(rec).items():
+            buffers[table].extend(rows)
+
+    written: Dict[str, int] = {}
+    batch = uuid.uuid4().hex
+    for table, rows in buffers.items():
+        written[table] = len(rows)
+        if not rows:
+            continue
+        ds.write_dataset(
+            pa.Table.from_pylist(rows, schema=_SCHEMAS[table]),
+            root / table,
+            format="parquet",
+            partitioning=_partitioning(table),
+            basename_template=f"part-{batch}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",  # new uniquely named files; never rewrites old ones
+        )
+    return written
+
+
+# -----------------------------
+# Import (lazy reads)
+# -----------------------------
+
+
+def open_results(root: str | Path, table: str) -> ds.Dataset:
+    """Lazy dataset handle; nothing is read until scanned."""
+    if table not in _SCHEMAS:
+        raise ValueError(f"Unknown table {table!r}; expected one of {TABLES}")
+    return ds.dataset(Path(root) / table, format="parquet", partitioning=_partitioning(table), schema=_SCHEMAS[table])
+
+
+def _filter(where: Optional[Mapping[str, Any]]) -> Optional[pc.Expression]:
+    expr: Optional[pc.Expression] = None
+    for col, value in (where or {}).items():
+        term = ds.field(col).isin(list(value)) if isinstance(value, (list, tuple, set)) else ds.field(col) == value
+        expr = term if expr is None else expr & term
+    return expr
+
+
+def scan_results(
+    root: str | Path,
+    table: str,
+    *,
+    columns: Optional[Sequence[str]] = None,
+    where: Optional[Mapping[str, Any]] = None,
+    batch_size: int = 65_536,
+) -> Iterator[pa.RecordBatch]:
+    """Stream record batches with column projection and partition/row-group pruning."""
+    dataset = open_results(root, table)
+    yield from dataset.to_batches(columns=list(columns) if columns else None, filter=_filter(where), batch_size=batch_size)
+
+
+def read_results(
+    root: str | Path,
+    table: str,
+    *,
+    columns: Optional[Sequence[str]] = None,
+    where: Optional[Mapping[str, Any]] = None,
+) -> pa.Table:
+    return open_results(root, table).to_table(columns=list(columns) if columns else None, filter=_filter(where))
+
+
+def read_conversation(root: str | Path, record_id: str) -> ConversationLog:
+    """Rebuild one exported transcript (`record_id` links it to its evaluation rows)."""
+    t = read_results(root, "conversations", columns=["seq", "role", "content"], where={"record_id": record_id})
+    t = t.sort_by("seq")
+    return ConversationLog({"role": r, "content": c} for r, c in zip(t["role"].to_pylist(), t["content"].to_pylist()))
+
+
+def item_pass_rates(root: str | Path, *, where: Optional[Mapping[str, Any]] = None) -> pa.Table:
+    """Per-item achieved rate over applicable (included) results."""
+    t = read_results(root, "item_results", columns=["item_id", "included", "achieved"], where=where)
+    t = t.filter(pc.field("included"))
+    return (
+        t.group_by("item_id")
+        .aggregate([("achieved", "mean"), ("achieved", "count")])
+        .rename_columns(["item_id", "achieved_rate", "n"])
+        .sort_by("item_id")
+    )
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+
+
+def _records_from_selfplay(path: Path) -> Iterator[EvaluationRecord]:
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if rec.get("status") != "ok":
+                continue
+            yield EvaluationRecord(
+                conversation=rec.get("conversation") or [],
+                condition=rec.get("condition", ""),
+                language=rec.get("language", "English"),
+                session_id=rec.get("job_id", ""),
+                scored=rec.get("scored"),
+                judge_grade=rec.get("judge_grade"),
+                judge_meta=rec.get("judge_meta"),
+            )
+
+
+def _records_from_scored(paths: Sequence[Path], *, language: str, condition: str) -> Iterator[EvaluationRecord]:
+    # "Download scored JSON" files carry no transcript; only evaluations/item_results are written.
+    for p in paths:
+        yield EvaluationRecord(
+            conversation=[],
+            condition=condition,
+            language=language,
+            session_id=p.stem,
+            scored=json.loads(p.read_text(encoding="utf-8")),
+            created_at=p.stat().st_mtime,
+        )
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Export/scan transcripts and scored results as Parquet.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    ing = sub.add_parser("ingest", help="Append self-play JSONL and/or scored JSON files to the datasets.")
+    ing.add_argument("--root", default=str(default_results_root()))
+    ing.add_argument("--selfplay", nargs="*", default=[], help="src.selfplay.engine JSONL output files.")
+    ing.add_argument("--scored", nargs="*", default=[], help="Downloaded trainee_scored.json files.")
+    ing.add_argument("--language", default="English", help="Language stamped on --scored files.")
+    ing.add_argument("--condition", default="", help="Condition stamped on --scored files.")
+
+    sc = sub.add_parser("scan", help="Per-item achieved rates (projection + partition pruning).")
+    sc.add_argument("--root", default=str(default_results_root()))
+    sc.add_argument("--rubric-id", default=None)
+    sc.add_argument("--language", default=None)
+
+    args = ap.parse_args()
+    if args.cmd == "ingest":
+        totals = {t: 0 for t in TABLES}
+        for p in args.selfplay:
+            for t, n in export_records(_records_from_selfplay(Path(p)), args.root).items():
+                totals[t] += n
+        if args.scored:
+            recs = _records_from_scored([Path(p) for p in args.scored], language=args.language, condition=args.condition)
+            for t, n in export_records(recs, args.root).items():
+                totals[t] += n
+        print(json.dumps({"root": args.root, "rows_written": totals}, indent=2))
+        return
+
+    where = {k: v for k, v in (("rubric_id", args.rubric_id), ("language", args.language)) if v}
+    t0 = time.perf_counter()
+    rates = item_pass_rates(args.root, where=where or None)
+    elapsed = time.perf_counter() - t0
+    print(json.dumps({"elapsed_s": round(elapsed, 3), "items": rates.to_pylist()}, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
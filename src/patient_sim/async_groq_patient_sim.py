@@ -0,0 +1,92 @@
+"""src.patient_sim.async_groq_patient_sim
+
+Async Groq-backed patient simulator on a shared, pooled HTTP client.
+
+All requests run on the process-wide background loop so that every session reuses
+the same keep-alive connections. Callers may await from any event loop; Streamlit
+(sync) code should wrap it in `BlockingPatientSimulator`.
+"""
+
+from __future__ import annotations
+
+from typing import AsyncIterator, Iterator, Optional
+
+from src.patient_sim.groq_patient_sim import build_request_kwargs, fill_info_from_chunk, fill_info_from_response
+from src.patient_sim.http_pool import HttpPoolConfig, get_async_groq_client
+from src.patient_sim.interfaces import AsyncPatientSimulator, Conversation, PatientSimConfig, ReplyInfo
+from src.utils.async_runtime import iterate_on_shared_loop, iterate_sync, run_on_shared_loop, run_sync
+from src.utils.rate_limit import get_rate_limiter
+from src.utils.tokens import estimate_request_tokens
+
+
+class AsyncGroqPatientSimulator:
+    def __init__(
+        self,
+        *,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        pool: Optional[HttpPoolConfig] = None,
+    ) -> None:
+        self._api_key = api_key
+        self._base_url = base_url
+        self._pool = pool
+
+    def _client(self):
+        return get_async_groq_client(api_key=self._api_key, base_url=self._base_url, pool=self._pool)
+
+    async def _generate(self, conversation: Conversation, config: PatientSimConfig, info: Optional[ReplyInfo]) -> str:
+        client = self._client()
+        resp = await get_rate_limiter("groq", config.model).acall(
+            lambda: client.chat.completions.create(**build_request_kwargs(conversation, config), stream=False),
+            estimated_tokens=estimate_request_tokens(conversation, config.max_completion_tokens),
+        )
+        fill_info_from_response(info, resp)
+        return resp.choices[0].message.content
+
+    async def _stream(self, conversation: Conversation, config: PatientSimConfig, info: Optional[ReplyInfo]) -> AsyncIterator[str]:
+        client = self._client()
+        # The concurrency slot is held until the stream is exhausted or closed.
+        stream = await get_rate_limiter("groq", config.model).acall_stream(
+            lambda: client.chat.completions.create(**build_request_kwargs(conversation, config), stream=True),
+            estimated_tokens=estimate_request_tokens(conversation, config.max_completion_tokens),
+        )
+        if info is not None:
+            info.attempts += 1
+            info.model = config.model
+        try:
+            async for chunk in stream:
+                fill_info_from_chunk(info, chunk)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+        finally:
+            await stream.aclose()
+
+    async def generate(
+        self, conversation: Conversation, *, config: PatientSimConfig, info: Optional[ReplyInfo] = None
+    ) -> str:
+        return await run_on_shared_loop(self._generate(conversation, config, info))
+
+    async def generate_stream(
+        self, conversation: Conversation, *, config: PatientSimConfig, info: Optional[ReplyInfo] = None
+    ) -> AsyncIterator[str]:
+        async for delta in iterate_on_shared_loop(self._stream(conversation, config, info)):
+            yield delta
+
+
+class BlockingPatientSimulator:
+    """Expose any `AsyncPatientSimulator` through the sync `PatientSimulator` protocol."""
+
+    def __init__(self, inner: AsyncPatientSimulator, *, timeout_s: Optional[float] = None) -> None:
+        self._inner = inner
+        self._timeout_s = timeout_s
+
+    def generate(self, conversation: Conversation, *, config: PatientSimConfig, info: Optional[ReplyInfo] = None) -> str:
+        return run_sync(self._inner.generate(conversation, config=config, info=info), timeout=self._timeout_s)
+
+    def generate_stream(
+        self, conversation: Conversation, *, config: PatientSimConfig, info: Optional[ReplyInfo] = None
+    ) -> Iterator[str]:
+        return iterate_sync(self._inner.generate_stream(conversation, config=config, info=info))
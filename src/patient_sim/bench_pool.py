@@ -0,0 +1,121 @@
+"""src.patient_sim.bench_pool
+
+Benchmark: sync client-per-rerun vs pooled async patient simulator.
+
+Runs N concurrent simulated sessions x T turns against the local stub server
+(`src.stub_server`), so no credentials or network are needed:
+
+    python -m src.patient_sim.bench_pool --sessions 50 --turns 5 --latency-ms 200
+
+"sync-per-rerun" mirrors the old app.py behavior (a new `Groq` client per call,
+one thread per in-flight request); "pooled-async" uses `AsyncGroqPatientSimulator`
+with the process-wide keep-alive pool.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from src.patient_sim.interfaces import PatientSimConfig
+from src.stub_server.server import StubConfig, start_stub_server
+
+
+_CONVO = [
+    {"role": "system", "content": "You are a patient."},
+    {"role": "user", "content": "What brings you here today?"},
+]
+
+
+def _summarize(name: str, latencies: List[float], wall_s: float) -> Dict[str, Any]:
+    lat = sorted(latencies)
+    return {
+        "mode": name,
+        "calls": len(lat),
+        "wall_s": round(wall_s, 3),
+        "calls_per_s": round(len(lat) / wall_s, 2) if wall_s > 0 else None,
+        "p50_ms": round(statistics.median(lat) * 1000, 1),
+        "p95_ms": round(lat[int(0.95 * (len(lat) - 1))] * 1000, 1),
+    }
+
+
+def bench_sync_per_rerun(base_url: str, sessions: int, turns: int) -> Dict[str, Any]:
+    from groq import Groq
+
+    cfg = PatientSimConfig()
+
+    def session() -> List[float]:
+        out = []
+        for _ in range(turns):
+            t0 = time.perf_counter()
+            client = Groq(api_key="stub", base_url=base_url)  # what each Streamlit rerun used to do
+            client.chat.completions.create(model=cfg.model, messages=_CONVO, stream=False)
+            client.close()
+            out.append(time.perf_counter() - t0)
+        return out
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as ex:
+        results = list(ex.map(lambda _: session(), range(sessions)))
+    return _summarize("sync-per-rerun", [x for r in results for x in r], time.perf_counter() - t0)
+
+
+def bench_pooled_async(base_url: str, sessions: int, turns: int, max_connections: int) -> Dict[str, Any]:
+    from src.patient_sim.async_groq_patient_sim import AsyncGroqPatientSimulator
+    from src.patient_sim.http_pool import HttpPoolConfig
+
+    sim = AsyncGroqPatientSimulator(
+        api_key="stub",
+        base_url=base_url,
+        pool=HttpPoolConfig(max_connections=max_connections, max_keepalive_connections=max_connections),
+    )
+    cfg = PatientSimConfig()
+
+    async def session() -> List[float]:
+        out = []
+        for _ in range(turns):
+            t0 = time.perf_counter()
+            await sim.generate(_CONVO, config=cfg)
+            out.append(time.perf_counter() - t0)
+        return out
+
+    async def main() -> List[List[float]]:
+        return await asyncio.gather(*(session() for _ in range(sessions)))
+
+    t0 = time.perf_counter()
+    results = asyncio.run(main())
+    return _summarize("pooled-async", [x for r in results for x in r], time.perf_counter() - t0)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sessions", type=int, default=50)
+    ap.add_argument("--turns", type=int, default=5)
+    ap.add_argument("--latency-ms", type=float, default=200.0)
+    ap.add_argument("--max-connections", type=int, default=100)
+    ap.add_argument("--base-url", default=None, help="Use an existing stub server instead of the built-in one.")
+    args = ap.parse_args()
+
+    server = None
+    base_url = args.base_url
+    if not base_url:
+        server = start_stub_server(StubConfig(latency=f"fixed:{args.latency_ms / 1000.0}"))
+        base_url = server.base_url
+    try:
+        rows = [
+            bench_sync_per_rerun(base_url, args.sessions, args.turns),
+            bench_pooled_async(base_url, args.sessions, args.turns, args.max_connections),
+        ]
+    finally:
+        if server is not None:
+            server.shutdown()
+    print(json.dumps(rows, indent=2))
+
+
+if __name__ == "__main__":
+    main()
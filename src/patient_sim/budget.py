@@ -0,0 +1,147 @@
+"""src.patient_sim.budget
+
+Right-sized token budgets for patient replies.
+
+The patient prompt asks for at most 2 sentences, yet the default config allows 8192
+completion tokens with medium reasoning. `plan_patient_request` sizes the request
+from the expected reply instead:
+
+    max_completion_tokens = expected reply tokens + reasoning headroom(effort)
+
+clamped to the model context window after estimating the prompt, and adds stop
+sequences that end the reply if the model starts writing the doctor's next line.
+
+`BudgetedPatientSimulator` applies the plan and handles truncation
+(`finish_reason == "length"`): when nothing usable was produced (typically reasoning
+ate the budget), it retries once on a cheap path — low reasoning effort and a larger
+budget. Per-call token accounting is returned through `ReplyInfo`.
+"""
+
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass, field, replace
+from typing import Any, Dict, Iterator, Mapping, Optional, Tuple
+
+from src.patient_sim.interfaces import Conversation, PatientSimConfig, PatientSimulator, ReplyInfo
+from src.utils.tokens import estimate_messages_tokens
+
+_DEFAULT_HEADROOM = {"none": 0, "low": 384, "medium": 1536, "high": 6144}
+
+
+@dataclass(frozen=True)
+class BudgetPolicy:
+    max_sentences: int = 2
+    tokens_per_sentence: int = 40
+    non_latin_multiplier: float = 2.0          # Arabic tokenizes ~2x denser than English
+    reasoning_effort: str = "low"
+    reasoning_headroom: Mapping[str, int] = field(default_factory=lambda: dict(_DEFAULT_HEADROOM))
+    min_completion_tokens: int = 128
+    context_window_tokens: int = 131_072
+    stop: Tuple[str, ...] = ("\nDoctor:", "\nPsychiatrist:", "\nTrainee:", "\nUser:")
+    retry_on_truncation: int = 1
+    retry_budget_multiplier: float = 2.0
+
+
+@dataclass(frozen=True)
+class BudgetPlan:
+    prompt_tokens_est: int
+    reply_tokens_est: int
+    reasoning_headroom: int
+    max_completion_tokens: int
+    reasoning_effort: str
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _conversation_language(conversation: Conversation) -> str:
+    system = " ".join(m.get("content", "") or "" for m in conversation if m.get("role") == "system")
+    return "Arabic" if "respond in Arabic" in system else "English"
+
+
+def plan_patient_request(
+    conversation: Conversation,
+    base: PatientSimConfig,
+    policy: BudgetPolicy = BudgetPolicy(),
+) -> Tuple[PatientSimConfig, BudgetPlan]:
+    prompt_est = estimate_messages_tokens(conversation)
+    reply_est = policy.max_sentences * policy.tokens_per_sentence
+    if _conversation_language(conversation) != "English":
+        reply_est = int(reply_est * policy.non_latin_multiplier)
+
+    effort = policy.reasoning_effort
+    headroom = int(policy.reasoning_headroom.get(effort, _DEFAULT_HEADROOM["medium"]))
+    max_tokens = max(policy.min_completion_tokens, reply_est + headroom)
+    max_tokens = max(1, min(max_tokens, policy.context_window_tokens - prompt_est))
+
+    cfg = replace(
+        base,
+        max_completion_tokens=max_tokens,
+        reasoning_effort=effort,
+        stop=base.stop or policy.stop or None,  # an explicit config stop list wins (providers cap at 4)
+    )
+    return cfg, BudgetPlan(prompt_est, reply_est, headroom, max_tokens, effort)
+
+
+def cheap_retry_config(config: PatientSimConfig, policy: BudgetPolicy) -> PatientSimConfig:
+    """Lowest reasoning effort with more room: the fastest way to get a complete short reply."""
+    return replace(
+        config,
+        reasoning_effort="low",
+        max_completion_tokens=int(config.max_completion_tokens * policy.retry_budget_multiplier),
+    )
+
+
+class BudgetedPatientSimulator:
+    """Wrap a sync `PatientSimulator` with right-sized budgets and a truncation retry."""
+
+    def __init__(self, inner: PatientSimulator, *, policy: BudgetPolicy = BudgetPolicy()) -> None:
+        self._inner = inner
+        self.policy = policy
+
+    def _merge(self, total: ReplyInfo, attempt: ReplyInfo) -> None:
+        for name in ("prompt_tokens", "completion_tokens", "reasoning_tokens"):
+            v = getattr(attempt, name)
+            if v is not None:
+                setattr(total, name, (getattr(total, name) or 0) + v)
+        total.finish_reason = attempt.finish_reason
+        total.model = attempt.model or total.model
+        total.cached = attempt.cached
+        total.attempts += max(1, attempt.attempts)
+
+    def _start(self, conversation: Conversation, config: PatientSimConfig, info: Optional[ReplyInfo]) -> Tuple[PatientSimConfig, ReplyInfo]:
+        cfg, plan = plan_patient_request(conversation, config, self.policy)
+        total = info if info is not None else ReplyInfo()
+        total.max_completion_tokens = plan.max_completion_tokens
+        total.reasoning_effort = plan.reasoning_effort
+        return cfg, total
+
+    def generate(self, conversation: Conversation, *, config: PatientSimConfig, info: Optional[ReplyInfo] = None) -> str:
+        cfg, total = self._start(conversation, config, info)
+        text = ""
+        for attempt in range(self.policy.retry_on_truncation + 1):
+            attempt_info = ReplyInfo()
+            text = self._inner.generate(conversation, config=cfg, info=attempt_info)
+            self._merge(total, attempt_info)
+            if attempt_info.finish_reason != "length":
+                break
+            cfg = cheap_retry_config(cfg, self.policy)
+            total.max_completion_tokens, total.reasoning_effort = cfg.max_completion_tokens, cfg.reasoning_effort
+        return text
+
+    def generate_stream(
+        self, conversation: Conversation, *, config: PatientSimConfig, info: Optional[ReplyInfo] = None
+    ) -> Iterator[str]:
+        cfg, total = self._start(conversation, config, info)
+        for attempt in range(self.policy.retry_on_truncation + 1):
+            attempt_info = ReplyInfo()
+            produced = False
+            for delta in self._inner.generate_stream(conversation, config=cfg, info=attempt_info):
+                produced = produced or bool(delta.strip())
+                yield delta
+            self._merge(total, attempt_info)
+            # Text already shown cannot be retracted: only retry when the budget produced nothing visible.
+            if attempt_info.finish_reason != "length" or produced:
+                return
+            cfg = cheap_retry_config(cfg, self.policy)
+            total.max_completion_tokens, total.reasoning_effort = cfg.max_completion_tokens, cfg.reasoning_effort
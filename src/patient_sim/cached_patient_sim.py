@@ -0,0 +1,136 @@
+"""src.patient_sim.cached_patient_sim
+
+Content-addressed response cache in front of any `PatientSimulator`.
+
+Key = SHA-256 of the canonical request (model, messages, sampling and reasoning
+settings). Policy (`mode`):
+
+- "deterministic" (default): only serve/store when the config is deterministic
+  (temperature == 0), so a hit is exactly what the provider would return.
+- "replay": serve/store for any config. Explicit opt-in for demos, scripted stations
+  and regression tests where replaying a previous stochastic reply is intended.
+- "off": pass-through.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, Iterator, Optional
+
+from src.patient_sim.interfaces import Conversation, PatientSimConfig, PatientSimulator, ReplyInfo
+from src.utils.cache import Cache, LRUTTLCache, SQLiteCache, TieredCache
+from src.utils.env import get_env
+from src.utils.hashing import canonical_hash
+from src.utils.paths import cache_dir
+
+CACHE_MODES = ("deterministic", "replay", "off")
+
+
+def request_cache_key(conversation: Conversation, config: PatientSimConfig) -> str:
+    return canonical_hash(
+        {
+            "kind": "patient_sim/v1",
+            "model": config.model,
+            "messages": [{"role": m.get("role"), "content": m.get("content", "")} for m in conversation or []],
+            "temperature": config.temperature,
+            "top_p": config.top_p,
+            "max_completion_tokens": config.max_completion_tokens,
+            "reasoning_effort": config.reasoning_effort,
+            "reasoning_format": config.reasoning_format,
+            "stop": list(config.stop) if config.stop else None,
+        }
+    )
+
+
+def is_deterministic(config: PatientSimConfig) -> bool:
+    return float(config.temperature) == 0.0
+
+
+def _mark_cached(info: Optional[ReplyInfo], config: PatientSimConfig) -> None:
+    if info is not None:
+        info.cached = True
+        info.finish_reason = "stop"
+        info.model = config.model
+        info.prompt_tokens = info.completion_tokens = info.reasoning_tokens = 0
+
+
+class CachingPatientSimulator:
+    def __init__(self, inner: PatientSimulator, *, cache: Cache, mode: str = "deterministic") -> None:
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode: {mode!r} (expected one of {CACHE_MODES})")
+        self._inner = inner
+        self.cache = cache
+        self.mode = mode
+        self.bypassed = 0
+
+    def _cacheable(self, config: PatientSimConfig) -> bool:
+        if self.mode == "off":
+            return False
+        return self.mode == "replay" or is_deterministic(config)
+
+    def generate(self, conversation: Conversation, *, config: PatientSimConfig, info: Optional[ReplyInfo] = None) -> str:
+        if not self._cacheable(config):
+            self.bypassed += 1
+            return self._inner.generate(conversation, config=config, info=info)
+        key = request_cache_key(conversation, config)
+        hit = self.cache.get(key)
+        if hit is not None:
+            _mark_cached(info, config)
+            return hit
+        reply = self._inner.generate(conversation, config=config, info=info)
+        # Truncated replies are not worth replaying.
+        if reply and (info is None or info.finish_reason != "length"):
+            self.cache.set(key, reply)
+        return reply
+
+    def generate_stream(
+        self, conversation: Conversation, *, config: PatientSimConfig, info: Optional[ReplyInfo] = None
+    ) -> Iterator[str]:
+        if not self._cacheable(config):
+            self.bypassed += 1
+            yield from self._inner.generate_stream(conversation, config=config, info=info)
+            return
+        key = request_cache_key(conversation, config)
+        hit = self.cache.get(key)
+        if hit is not None:
+            _mark_cached(info, config)
+            yield hit
+            return
+        parts = []
+        for delta in self._inner.generate_stream(conversation, config=config, info=info):
+            parts.append(delta)
+            yield delta
+        # Only complete streams are stored (an abandoned generator never reaches here).
+        reply = "".join(parts)
+        if reply and (info is None or info.finish_reason != "length"):
+            self.cache.set(key, reply)
+
+    def stats(self) -> Dict[str, Any]:
+        tier = getattr(self.cache, "tier_stats", None)
+        out: Dict[str, Any] = tier() if callable(tier) else {"total": self.cache.stats.as_dict()}
+        out["mode"] = self.mode
+        out["bypassed"] = self.bypassed
+        return out
+
+
+_default_lock = threading.Lock()
+_default_cache: Optional[TieredCache] = None
+
+
+def default_patient_cache() -> TieredCache:
+    """Process-wide memory+SQLite cache (sizes/TTL via PATIENT_SIM_CACHE_* env vars)."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            ttl = get_env("PATIENT_SIM_CACHE_TTL_S")
+            ttl_s = float(ttl) if ttl else 7 * 24 * 3600.0
+            _default_cache = TieredCache(
+                LRUTTLCache(max_entries=int(get_env("PATIENT_SIM_CACHE_MEMORY_ENTRIES", "2048")), ttl_s=ttl_s),
+                SQLiteCache(
+                    cache_dir() / "patient_sim.sqlite",
+                    max_entries=int(get_env("PATIENT_SIM_CACHE_DISK_ENTRIES", "50000")),
+                    ttl_s=ttl_s,
+                    table="patient_replies",
+                ),
+            )
+        return _default_cache
@@ -0,0 +1,121 @@
+"""src.patient_sim.context_window
+
+Bounded-context conversation window for the patient simulator.
+
+Sits between `session_store.get_history()` and `PatientSimulator.generate`:
+
+    [system prompt]                     (always, verbatim)
+    [fact ledger of older turns]        (system message, <= context_summary_max_tokens)
+    [last K user/assistant messages]    (verbatim)
+
+The ledger is deterministic (no LLM call): for every older exchange it keeps what the
+patient said, with the doctor's question shortened for context. "I don't know"
+answers carry no facts and are dropped first; when the ledger still exceeds its
+budget the oldest entries go. Prompt size is therefore bounded by
+system + ledger budget + K messages, regardless of interview length.
+"""
+
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Tuple
+
+from src.patient_sim.interfaces import Conversation, PatientSimConfig
+from src.utils.tokens import MESSAGE_OVERHEAD_TOKENS, estimate_messages_tokens, estimate_tokens
+
+_QUESTION_MAX_CHARS = 80
+_NO_INFO_ANSWERS = {"i don't know", "i don't know.", "i dont know", "لا اعرف", "لا أعرف", "لا أعرف.", "لا اعرف."}
+
+LEDGER_HEADER = (
+    "Summary of earlier parts of this interview (stay consistent with it; do not repeat it verbatim):"
+)
+
+
+@dataclass(frozen=True)
+class ContextReport:
+    total_messages: int
+    kept_messages: int
+    summarized_messages: int
+    ledger_entries: int
+    full_tokens: int
+    window_tokens: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.full_tokens - self.window_tokens)
+
+    def as_dict(self) -> Dict[str, Any]:
+        d = asdict(self)
+        d["tokens_saved"] = self.tokens_saved
+        return d
+
+
+def _shorten(text: str, limit: int) -> str:
+    t = " ".join((text or "").split())
+    return t if len(t) <= limit else t[: limit - 1].rstrip() + "…"
+
+
+def _ledger_entries(older: Conversation) -> List[str]:
+    """One entry per patient answer, paired with the question that prompted it."""
+    entries: List[str] = []
+    last_question = ""
+    for m in older:
+        role = m.get("role")
+        content = m.get("content", "") or ""
+        if role == "user":
+            last_question = content
+        elif role == "assistant":
+            answer = " ".join(content.split())
+            if not answer or answer.lower() in _NO_INFO_ANSWERS:
+                continue
+            q = _shorten(last_question, _QUESTION_MAX_CHARS)
+            entries.append(f"- Doctor: {q} | You: {answer}" if q else f"- You: {answer}")
+    return entries
+
+
+def _fit_ledger(entries: List[str], max_tokens: int) -> List[str]:
+    """Keep the most recent entries that fit in `max_tokens` (header included)."""
+    budget = max_tokens - estimate_tokens(LEDGER_HEADER) - MESSAGE_OVERHEAD_TOKENS
+    kept: List[str] = []
+    for e in reversed(entries):
+        cost = estimate_tokens(e) + 1
+        if cost > budget:
+            break
+        kept.append(e)
+        budget -= cost
+    kept.reverse()
+    return kept
+
+
+def build_context_window(history: Conversation, *, config: PatientSimConfig) -> Tuple[Conversation, ContextReport]:
+    """Return (messages to send, report). Never mutates `history`."""
+    history = list(history or [])
+    full_tokens = estimate_messages_tokens(history)
+    system = [m for m in history if m.get("role") == "system"]
+    dialog = [m for m in history if m.get("role") in ("user", "assistant")]
+
+    k = config.context_window_messages
+    if k is None or len(dialog) <= k:
+        return history, ContextReport(len(dialog), len(dialog), 0, 0, full_tokens, full_tokens)
+
+    cut = len(dialog) - max(0, k)
+    # Start the verbatim window on a trainee message so it never opens mid-exchange.
+    while cut < len(dialog) and dialog[cut].get("role") != "user":
+        cut += 1
+    older, recent = dialog[:cut], dialog[cut:]
+
+    ledger = _fit_ledger(_ledger_entries(older), config.context_summary_max_tokens)
+    window: Conversation = list(system)
+    if ledger:
+        window.append({"role": "system", "content": LEDGER_HEADER + "\n" + "\n".join(ledger)})
+    window.extend(recent)
+
+    report = ContextReport(
+        total_messages=len(dialog),
+        kept_messages=len(recent),
+        summarized_messages=len(older),
+        ledger_entries=len(ledger),
+        full_tokens=full_tokens,
+        window_tokens=estimate_messages_tokens(window),
+    )
+    return window, report
@@ -8,27 +8,88 @@ This is a thin wrapper around Groq Chat Completions.
 from __future__ import annotations
 
 import os
-from typing import Optional
+from typing import Any, Dict, Iterator, Optional
 
 from groq import Groq
 
-from src.patient_sim.interfaces import Conversation, PatientSimConfig
+from src.patient_sim.interfaces import Conversation, PatientSimConfig, ReplyInfo
+from src.state.conversation import as_message_dicts
+from src.utils.rate_limit import get_rate_limiter
+from src.utils.tokens import estimate_request_tokens
+
+
+def build_request_kwargs(conversation: Conversation, config: PatientSimConfig) -> Dict[str, Any]:
+    return {
+        "model": config.model,
+        "messages": as_message_dicts(conversation),
+        "temperature": config.temperature,
+        "max_completion_tokens": config.max_completion_tokens,
+        "top_p": config.top_p,
+        "reasoning_effort": config.reasoning_effort,
+        "reasoning_format": config.reasoning_format,
+        "stop": list(config.stop) if config.stop else None,
+    }
+
+
+def fill_info_from_response(info: Optional[ReplyInfo], resp: Any) -> None:
+    if info is None:
+        return
+    info.attempts += 1
+    info.model = getattr(resp, "model", None) or info.model
+    choices = getattr(resp, "choices", None) or []
+    if choices:
+        info.finish_reason = getattr(choices[0], "finish_reason", None)
+    info.update_from_usage(getattr(resp, "usage", None))
+
+
+def fill_info_from_chunk(info: Optional[ReplyInfo], chunk: Any) -> None:
+    """Streaming: finish_reason arrives on the last content chunk, usage on `x_groq` (Groq) or `usage`."""
+    if info is None:
+        return
+    if chunk.choices and getattr(chunk.choices[0], "finish_reason", None):
+        info.finish_reason = chunk.choices[0].finish_reason
+    x_groq = getattr(chunk, "x_groq", None)
+    info.update_from_usage(getattr(x_groq, "usage", None) if x_groq is not None else None)
+    info.update_from_usage(getattr(chunk, "usage", None))
 
 
 class GroqPatientSimulator:
-    def __init__(self, *, api_key: Optional[str] = None) -> None:
-        self._client = Groq(api_key=api_key or os.getenv("GROQ_API_KEY"))
-
-    def generate(self, conversation: Conversation, *, config: PatientSimConfig) -> str:
-        resp = self._client.chat.completions.create(
-            model=config.model,
-            messages=conversation,
-            temperature=config.temperature,
-            max_completion_tokens=config.max_completion_tokens,
-            top_p=config.top_p,
-            reasoning_effort=config.reasoning_effort,
-            reasoning_format=config.reasoning_format,
-            stream=False,
-            stop=None,
+    def __init__(self, *, api_key: Optional[str] = None, base_url: Optional[str] = None) -> None:
+        self._client = Groq(
+            api_key=api_key or os.getenv("GROQ_API_KEY"),
+            base_url=base_url or os.getenv("GROQ_BASE_URL"),
+            max_retries=0,  # the rate limiter retries 429s
+        )
+
+    def generate(self, conversation: Conversation, *, config: PatientSimConfig, info: Optional[ReplyInfo] = None) -> str:
+        limiter = get_rate_limiter("groq", config.model)
+        resp = limiter.call(
+            lambda: self._client.chat.completions.create(**build_request_kwargs(conversation, config), stream=False),
+            estimated_tokens=estimate_request_tokens(conversation, config.max_completion_tokens),
         )
+        fill_info_from_response(info, resp)
         return resp.choices[0].message.content
+
+    def generate_stream(
+        self, conversation: Conversation, *, config: PatientSimConfig, info: Optional[ReplyInfo] = None
+    ) -> Iterator[str]:
+        # The limiter admits (and retries on 429) the request and holds its slot until the stream ends.
+        limiter = get_rate_limiter("groq", config.model)
+        stream = limiter.call_stream(
+            lambda: self._client.chat.completions.create(**build_request_kwargs(conversation, config), stream=True),
+            estimated_tokens=estimate_request_tokens(conversation, config.max_completion_tokens),
+        )
+        if info is not None:
+            info.attempts += 1
+            info.model = config.model
+        try:
+            for chunk in stream:
+                fill_info_from_chunk(info, chunk)
+                # The final chunk may carry only usage (no choices).
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+        finally:
+            stream.close()  # no-op once exhausted; frees the slot if the consumer stops early
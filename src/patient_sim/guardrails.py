@@ -0,0 +1,272 @@
+"""src.patient_sim.guardrails
+
+Fast deterministic checks on each patient reply, with targeted repair.
+
+Rules (mirroring the patient prompt and the DeepEval criteria in
+`src.evaluation.patient.deepeval_patient`):
+
+- max_sentences:  at most N sentences                      -> trim (local fix)
+- idk_exact:      "I don't know" variants (either script) must be the exact
+                  canonical form for the language          -> canonicalize (local fix)
+- language:       script must match the selected language  -> regenerate
+- ai_disclosure:  never mention being an AI / a model      -> regenerate (or drop the sentence)
+
+Checks are plain precompiled regexes and character counts (microseconds per reply).
+Only failing replies trigger a regeneration, within `max_regenerations`.
+
+Streaming is gated per sentence: each sentence is validated before it is shown, so
+a violation in the first sentence is regenerated invisibly and a later violating
+sentence is dropped. Time-to-first-token becomes time-to-first-sentence.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterator, List, Optional
+
+from src.evaluation.trainee.legacy_regex import normalize
+from src.patient_sim.interfaces import Conversation, PatientSimConfig, PatientSimulator, ReplyInfo
+
+IDK_CANONICAL = {"English": "I don't know.", "Arabic": "لا أعرف."}
+
+_SENTENCE_END = re.compile(r"[.!?؟…]+[\"'”’)\]]*(?:\s+|$)")
+# A lone "." after these (or after a single capital initial, "J. Smith") is not a sentence end.
+_ABBREVIATIONS = frozenset(
+    "dr mr mrs ms mx prof st sr jr vs e.g i.e a.m p.m approx dept appt min mins hr hrs wk wks mg ml".split()
+)
+_WORD_BEFORE = re.compile(r"([A-Za-z][A-Za-z.]*)$")
+_ARABIC_LETTER = re.compile(r"[ء-يٱ-ۓ]")
+_LATIN_LETTER = re.compile(r"[A-Za-z]")
+# First-person self-identification only: a patient may mention AI or chatbots in character
+# ("my son works in artificial intelligence", "I asked a chatbot about my symptoms").
+_AI_SELF = (
+    r"(?:an? )?(?:ai|a\.i\.|artificial intelligence|chat ?bot|bot|(?:ai |large )?language model|virtual assistant|computer program)"
+    r"(?! (?:engineer|researcher|developer|scientist|specialist|expert|student|manager|company|startup|enthusiast)s?\b)"
+)
+_AI_SELF_AR = r"(?:ذكاء اصطناعي|نموذج لغوي|برنامج حاسوب|روبوت محادث[ةه]|مساعد افتراضي)"
+_AI_DISCLOSURE = re.compile(
+    rf"\b(?:i am|i['’]m|im)\s+(?:just |only |really |actually )?{_AI_SELF}\b"
+    rf"|\bas an? (?:ai|a\.i\.|artificial intelligence|(?:ai |large )?language model|virtual assistant)\b"
+    rf"|[أا]نا (?:مجرد |فقط )?{_AI_SELF_AR}|(?:بصفتي|كوني) {_AI_SELF_AR}",
+    re.IGNORECASE,
+)
+# Whole-reply "I don't know" variants (matched on `normalize`d text).
+_IDK_VARIANT = re.compile(
+    r"^(?:(?:sorry|um+|uh+|well|honestly),? )?"
+    r"(?:i (?:really |honestly )?(?:don't|dont|do not) (?:really )?know|i'm not sure|i am not sure|no idea|not sure)"
+    r"(?: really)?[.!…]*$"
+    r"|^(?:لا|ما) ?(?:اعرف|ادري|بعرف)[.!…]*$"
+)
+_MIN_SCRIPT_LETTERS = 4
+
+
+@dataclass(frozen=True)
+class Violation:
+    rule: str
+    message: str
+    fixable: bool  # True: repaired locally (trim/canonicalize); False: needs regeneration
+
+
+@dataclass(frozen=True)
+class GuardrailPolicy:
+    max_sentences: int = 2
+    max_regenerations: int = 1
+
+
+@dataclass
+class GuardrailStats:
+    replies: int = 0
+    clean: int = 0
+    regenerations: int = 0
+    local_fixes: int = 0
+    unresolved: int = 0
+    by_rule: Dict[str, int] = field(default_factory=dict)
+
+    def as_dict(self) -> Dict[str, object]:
+        return asdict(self)
+
+
+def _is_abbreviation(text: str, m: "re.Match[str]") -> bool:
+    if m.group().rstrip().rstrip("\"'”’)]") != ".":
+        return False
+    w = _WORD_BEFORE.search(text, 0, m.start())
+    if not w:
+        return False
+    word = w.group(1)
+    return word.lower() in _ABBREVIATIONS or (len(word) == 1 and word.isupper() and word != "I")
+
+
+def sentence_ends(text: str) -> Iterator["re.Match[str]"]:
+    """Sentence-end matches in `text`, skipping periods of abbreviations ("Dr.", "e.g.", "a.m.")."""
+    for m in _SENTENCE_END.finditer(text or ""):
+        if not _is_abbreviation(text, m):
+            yield m
+
+
+def split_sentences(text: str) -> List[str]:
+    out: List[str] = []
+    pos = 0
+    for m in sentence_ends(text or ""):
+        s = text[pos : m.end()].strip()
+        if s:
+            out.append(s)
+        pos = m.end()
+    tail = (text or "")[pos:].strip()
+    if tail:
+        out.append(tail)
+    return out
+
+
+def language_of(conversation: Conversation) -> str:
+    system = " ".join(m.get("content", "") or "" for m in conversation if m.get("role") == "system")
+    return "Arabic" if "respond in Arabic" in system else "English"
+
+
+def is_idk_variant(text: str) -> bool:
+    return bool(_IDK_VARIANT.match(normalize(text)))
+
+
+def script_mismatch(text: str, language: str) -> bool:
+    arabic = len(_ARABIC_LETTER.findall(text or ""))
+    latin = len(_LATIN_LETTER.findall(text or ""))
+    if language == "Arabic":
+        return latin >= _MIN_SCRIPT_LETTERS and latin > arabic
+    return arabic >= _MIN_SCRIPT_LETTERS and arabic > latin
+
+
+def check_reply(text: str, language: str, policy: GuardrailPolicy = GuardrailPolicy()) -> List[Violation]:
+    out: List[Violation] = []
+    stripped = (text or "").strip()
+    idk = is_idk_variant(stripped)
+    if _AI_DISCLOSURE.search(text or ""):
+        out.append(Violation("ai_disclosure", "Mentions being an AI/model.", fixable=False))
+    # An "I don't know" in either script is canonicalized locally, never regenerated.
+    if not idk and script_mismatch(text, language):
+        out.append(Violation("language", f"Reply is not in {language}.", fixable=False))
+    if idk and stripped != IDK_CANONICAL.get(language, IDK_CANONICAL["English"]):
+        out.append(Violation("idk_exact", "Uncertain reply must be exactly \"I don't know\".", fixable=True))
+    if len(split_sentences(stripped)) > policy.max_sentences:
+        out.append(Violation("max_sentences", f"More than {policy.max_sentences} sentences.", fixable=True))
+    return out
+
+
+def apply_local_fixes(text: str, language: str, policy: GuardrailPolicy = GuardrailPolicy()) -> str:
+    stripped = (text or "").strip()
+    if is_idk_variant(stripped):
+        return IDK_CANONICAL.get(language, IDK_CANONICAL["English"])
+    sentences = split_sentences(stripped)
+    if len(sentences) > policy.max_sentences:
+        return " ".join(sentences[: policy.max_sentences])
+    return stripped
+
+
+def _nudge(conversation: Conversation, violations: List[Violation], language: str) -> Conversation:
+    rules = "; ".join(v.message for v in violations)
+    return list(conversation) + [
+        {
+            "role": "system",
+            "content": (
+                f"Your previous reply broke the rules ({rules}). Reply again in {language}, in character, "
+                "in at most 2 sentences, never mentioning AI. If unknown or irrelevant, say exactly: I don't know."
+            ),
+        }
+    ]
+
+
+class GuardedPatientSimulator:
+    """Wrap a sync `PatientSimulator`; validate every reply and repair only on failure."""
+
+    def __init__(self, inner: PatientSimulator, *, policy: GuardrailPolicy = GuardrailPolicy()) -> None:
+        self._inner = inner
+        self.policy = policy
+        self.stats = GuardrailStats()
+
+    def _count(self, violations: List[Violation]) -> None:
+        for v in violations:
+            self.stats.by_rule[v.rule] = self.stats.by_rule.get(v.rule, 0) + 1
+
+    def _fallback(self, language: str) -> str:
+        # Out of regenerations with a reply that would break character: stay safe.
+        self.stats.unresolved += 1
+        return IDK_CANONICAL.get(language, IDK_CANONICAL["English"])
+
+    def generate(self, conversation: Conversation, *, config: PatientSimConfig, info: Optional[ReplyInfo] = None) -> str:
+        language = language_of(conversation)
+        self.stats.replies += 1
+        messages = conversation
+        for attempt in range(self.policy.max_regenerations + 1):
+            text = self._inner.generate(messages, config=config, info=info)
+            violations = check_reply(text, language, self.policy)
+            if not violations:
+                if attempt == 0:
+                    self.stats.clean += 1
+                return text
+            self._count(violations)
+            if all(v.fixable for v in violations):
+                self.stats.local_fixes += 1
+                return apply_local_fixes(text, language, self.policy)
+            if attempt < self.policy.max_regenerations:
+                self.stats.regenerations += 1
+                messages = _nudge(conversation, violations, language)
+        return self._fallback(language)
+
+    def _sentences(self, deltas: Iterator[str]) -> Iterator[str]:
+        """Regroup a delta stream into complete sentences (with their trailing whitespace)."""
+        buf = ""
+        for delta in deltas:
+            buf += delta
+            while True:
+                m = next(sentence_ends(buf), None)
+                if not m or (m.end() == len(buf) and not buf[m.end() - 1 :].isspace()):
+                    break  # boundary at the very end may still grow ("..." / closing quote)
+                yield buf[: m.end()]
+                buf = buf[m.end() :]
+        if buf.strip():
+            yield buf
+
+    def generate_stream(
+        self, conversation: Conversation, *, config: PatientSimConfig, info: Optional[ReplyInfo] = None
+    ) -> Iterator[str]:
+        language = language_of(conversation)
+        self.stats.replies += 1
+        messages = conversation
+        for attempt in range(self.policy.max_regenerations + 1):
+            shown: List[str] = []
+            failed: List[Violation] = []
+            stream = self._inner.generate_stream(messages, config=config, info=info)
+            for sentence in self._sentences(stream):
+                hard = [v for v in check_reply(sentence, language, self.policy) if not v.fixable]
+                if hard:
+                    failed = hard
+                    break
+                if len(shown) >= self.policy.max_sentences:
+                    failed = [Violation("max_sentences", f"More than {self.policy.max_sentences} sentences.", True)]
+                    break
+                if not shown and is_idk_variant(sentence):
+                    canonical = IDK_CANONICAL.get(language, IDK_CANONICAL["English"])
+                    if sentence.strip() != canonical:
+                        failed = [Violation("idk_exact", "Uncertain reply must be exactly \"I don't know\".", True)]
+                        sentence = canonical
+                    shown.append(sentence)
+                    yield sentence
+                    break
+                shown.append(sentence)
+                yield sentence
+            close = getattr(stream, "close", None)
+            if callable(close):
+                close()
+
+            if not failed:
+                if attempt == 0:
+                    self.stats.clean += 1
+                return
+            self._count(failed)
+            if shown:
+                # Something valid is already on screen: the violating remainder was dropped.
+                self.stats.local_fixes += 1
+                return
+            if attempt < self.policy.max_regenerations:
+                self.stats.regenerations += 1
+                messages = _nudge(conversation, failed, language)
+        yield self._fallback(language)
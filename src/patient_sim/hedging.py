@@ -0,0 +1,248 @@
+"""src.patient_sim.hedging
+
+Hedged requests for patient replies (tail-latency control).
+
+If the primary request has not finished (`generate`) or produced its first token
+(`generate_stream`) within a deadline, a second request is fired — same model or a
+fallback such as `openai/gpt-oss-20b` — and whichever wins is used; the loser is
+cancelled.
+
+The deadline is the configured percentile of recent latencies for the primary model
+(separate windows for total latency and TTFT), clamped to [min_deadline_s,
+max_deadline_s]; until enough samples exist, `initial_deadline_s` is used. A cancelled
+loser records its elapsed time as a lower-bound sample, so slow requests still pull
+the percentile up instead of the window only ever seeing the fast winners.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, replace
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Tuple
+
+from src.patient_sim.interfaces import AsyncPatientSimulator, Conversation, PatientSimConfig, ReplyInfo
+
+
+@dataclass(frozen=True)
+class HedgeConfig:
+    percentile: float = 0.95
+    min_samples: int = 20
+    initial_deadline_s: float = 4.0
+    min_deadline_s: float = 0.5
+    max_deadline_s: float = 15.0
+    fallback_model: Optional[str] = "openai/gpt-oss-20b"   # None = hedge with the same model
+    window: int = 500                                       # latency samples kept per (model, kind)
+
+
+class LatencyWindow:
+    """Sliding window of recent latencies with percentile queries."""
+
+    def __init__(self, maxlen: int = 500) -> None:
+        self._samples: Deque[float] = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if not self._samples:
+                return None
+            data = sorted(self._samples)
+        idx = min(len(data) - 1, max(0, int(round(q * (len(data) - 1)))))
+        return data[idx]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "n": len(self),
+            "p50_s": self.percentile(0.5),
+            "p90_s": self.percentile(0.9),
+            "p99_s": self.percentile(0.99),
+        }
+
+
+@dataclass
+class HedgeStats:
+    calls: int = 0
+    hedges_fired: int = 0
+    hedges_won: int = 0          # the secondary request finished/first-token first
+    primary_failures: int = 0
+
+
+def _copy_info(src: ReplyInfo, dst: Optional[ReplyInfo]) -> None:
+    if dst is not None:
+        attempts = dst.attempts
+        dst.__dict__.update(src.__dict__)
+        dst.attempts = attempts + src.attempts
+
+
+class HedgedPatientSimulator:
+    """Wraps an `AsyncPatientSimulator`; wrap in `BlockingPatientSimulator` for Streamlit."""
+
+    def __init__(self, inner: AsyncPatientSimulator, *, config: HedgeConfig = HedgeConfig()) -> None:
+        self._inner = inner
+        self.config = config
+        self.stats = HedgeStats()
+        self._windows: Dict[Tuple[str, str], LatencyWindow] = {}
+        self._lock = threading.Lock()
+
+    # --- latency model ---
+    def _window(self, model: str, kind: str) -> LatencyWindow:
+        with self._lock:
+            w = self._windows.get((model, kind))
+            if w is None:
+                w = LatencyWindow(self.config.window)
+                self._windows[(model, kind)] = w
+            return w
+
+    def deadline_s(self, model: str, kind: str = "total") -> float:
+        w = self._window(model, kind)
+        p = w.percentile(self.config.percentile) if len(w) >= self.config.min_samples else None
+        d = self.config.initial_deadline_s if p is None else p
+        return min(self.config.max_deadline_s, max(self.config.min_deadline_s, d))
+
+    def _secondary_config(self, config: PatientSimConfig) -> PatientSimConfig:
+        return replace(config, model=self.config.fallback_model) if self.config.fallback_model else config
+
+    # --- non-streaming ---
+    async def _timed(self, conversation: Conversation, config: PatientSimConfig, info: Optional[ReplyInfo]) -> str:
+        t0 = time.perf_counter()
+        try:
+            out = await self._inner.generate(conversation, config=config, info=info)
+        except asyncio.CancelledError:
+            self._window(config.model, "total").add(time.perf_counter() - t0)  # lower bound
+            raise
+        self._window(config.model, "total").add(time.perf_counter() - t0)
+        return out
+
+    async def generate(
+        self, conversation: Conversation, *, config: PatientSimConfig, info: Optional[ReplyInfo] = None
+    ) -> str:
+        self.stats.calls += 1
+        # Each attempt fills its own ReplyInfo; the winner's is copied into `info`.
+        primary_info = ReplyInfo()
+        primary = asyncio.ensure_future(self._timed(conversation, config, primary_info))
+        infos: Dict[asyncio.Future, ReplyInfo] = {primary: primary_info}
+        done, _ = await asyncio.wait({primary}, timeout=self.deadline_s(config.model, "total"))
+        if primary in done and not primary.exception():
+            _copy_info(infos[primary], info)
+            return primary.result()
+
+        self.stats.hedges_fired += 1
+        secondary_info = ReplyInfo()
+        secondary = asyncio.ensure_future(self._timed(conversation, self._secondary_config(config), secondary_info))
+        infos[secondary] = secondary_info
+        pending = {primary, secondary}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is secondary:
+                            self.stats.hedges_won += 1
+                        _copy_info(infos[task], info)
+                        return task.result()
+                    if task is primary:
+                        self.stats.primary_failures += 1
+            # Both failed: surface the primary's error.
+            raise primary.exception()  # type: ignore[misc]
+        finally:
+            for task in pending:
+                task.cancel()
+
+    # --- streaming (hedge on first token) ---
+    async def _first(self, agen: AsyncIterator[str], model: str, t0: float) -> str:
+        try:
+            delta = await agen.__anext__()
+        except StopAsyncIteration:
+            delta = ""  # empty reply still counts as a (trivial) first token
+        except asyncio.CancelledError:
+            self._window(model, "ttft").add(time.perf_counter() - t0)  # lower bound
+            raise
+        self._window(model, "ttft").add(time.perf_counter() - t0)
+        return delta
+
+    async def generate_stream(
+        self, conversation: Conversation, *, config: PatientSimConfig, info: Optional[ReplyInfo] = None
+    ) -> AsyncIterator[str]:
+        self.stats.calls += 1
+        streams: Dict[asyncio.Future, AsyncIterator[str]] = {}
+        infos: Dict[asyncio.Future, ReplyInfo] = {}
+
+        def start(cfg: PatientSimConfig) -> asyncio.Future:
+            attempt_info = ReplyInfo()
+            agen = self._inner.generate_stream(conversation, config=cfg, info=attempt_info)
+            fut = asyncio.ensure_future(self._first(agen, cfg.model, time.perf_counter()))
+            streams[fut] = agen
+            infos[fut] = attempt_info
+            return fut
+
+        primary = start(config)
+        winner: Optional[asyncio.Future] = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=self.deadline_s(config.model, "ttft"))
+            if primary in done and primary.exception() is None:
+                winner = primary
+            else:
+                self.stats.hedges_fired += 1
+                secondary = start(self._secondary_config(config))
+                pending = {primary, secondary}
+                while pending and winner is None:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for f in done:
+                        if f.exception() is None:
+                            winner = f
+                            break
+                        if f is primary:
+                            self.stats.primary_failures += 1
+                if winner is None:
+                    raise primary.exception() or RuntimeError("All hedged streams failed.")
+                if winner is secondary:
+                    self.stats.hedges_won += 1
+        finally:
+            for fut, agen in streams.items():
+                if fut is not winner:
+                    fut.cancel()
+                    try:
+                        await agen.aclose()
+                    except Exception:
+                        pass
+
+        first = winner.result()
+        if first:
+            yield first
+        async for delta in streams[winner]:
+            yield delta
+        _copy_info(infos[winner], info)
+
+    def report(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = asdict(self.stats)
+        fired = self.stats.hedges_fired
+        out["hedge_rate"] = round(fired / self.stats.calls, 4) if self.stats.calls else 0.0
+        out["hedge_win_rate"] = round(self.stats.hedges_won / fired, 4) if fired else 0.0
+        with self._lock:
+            out["latency"] = {f"{m}:{k}": w.summary() for (m, k), w in self._windows.items()}
+        return out
+
+
+_shared_lock = threading.Lock()
+_shared: Dict[HedgeConfig, HedgedPatientSimulator] = {}
+
+
+def shared_hedged_groq_simulator(config: HedgeConfig = HedgeConfig()) -> HedgedPatientSimulator:
+    """Process-wide hedged Groq simulator, so latency windows and stats survive Streamlit reruns."""
+    from src.patient_sim.async_groq_patient_sim import AsyncGroqPatientSimulator
+
+    with _shared_lock:
+        sim = _shared.get(config)
+        if sim is None:
+            sim = HedgedPatientSimulator(AsyncGroqPatientSimulator(), config=config)
+            _shared[config] = sim
+        return sim
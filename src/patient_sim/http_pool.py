@@ -0,0 +1,106 @@
+"""src.patient_sim.http_pool
+
+Process-wide pooled Groq clients.
+
+One keep-alive connection pool per (api_key, base_url, pool settings), shared by
+every Streamlit session and headless caller in the process. The async client lives
+on the shared background loop (see `src.utils.async_runtime`) so its connections
+survive Streamlit reruns.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import httpx
+from groq import AsyncGroq, Groq
+
+from src.utils.env import get_env
+
+
+@dataclass(frozen=True)
+class HttpPoolConfig:
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry_s: float = 30.0
+    timeout_s: float = 120.0
+    max_retries: int = 0      # retries belong to the rate limiter, which must see every 429
+
+    @classmethod
+    def from_env(cls) -> "HttpPoolConfig":
+        """Read overrides from GROQ_MAX_CONNECTIONS / GROQ_MAX_KEEPALIVE / GROQ_TIMEOUT_S."""
+        d = cls()
+        return cls(
+            max_connections=int(get_env("GROQ_MAX_CONNECTIONS", str(d.max_connections))),
+            max_keepalive_connections=int(get_env("GROQ_MAX_KEEPALIVE", str(d.max_keepalive_connections))),
+            keepalive_expiry_s=d.keepalive_expiry_s,
+            timeout_s=float(get_env("GROQ_TIMEOUT_S", str(d.timeout_s))),
+            max_retries=d.max_retries,
+        )
+
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry_s,
+        )
+
+
+_Key = Tuple[Optional[str], Optional[str], HttpPoolConfig]
+
+_lock = threading.Lock()
+_async_clients: Dict[_Key, AsyncGroq] = {}
+_sync_clients: Dict[_Key, Groq] = {}
+
+
+def _key(api_key: Optional[str], base_url: Optional[str], pool: HttpPoolConfig) -> _Key:
+    return (api_key or os.getenv("GROQ_API_KEY"), base_url or os.getenv("GROQ_BASE_URL"), pool)
+
+
+def get_async_groq_client(
+    *,
+    api_key: Optional[str] = None,
+    base_url: Optional[str] = None,
+    pool: Optional[HttpPoolConfig] = None,
+) -> AsyncGroq:
+    """Shared AsyncGroq client. Only await its calls on the shared loop."""
+    k = _key(api_key, base_url, pool or HttpPoolConfig.from_env())
+    with _lock:
+        client = _async_clients.get(k)
+        if client is None:
+            cfg = k[2]
+            client = AsyncGroq(
+                api_key=k[0],
+                base_url=k[1],
+                max_retries=cfg.max_retries,
+                timeout=cfg.timeout_s,
+                http_client=httpx.AsyncClient(limits=cfg.limits(), timeout=cfg.timeout_s),
+            )
+            _async_clients[k] = client
+        return client
+
+
+def get_sync_groq_client(
+    *,
+    api_key: Optional[str] = None,
+    base_url: Optional[str] = None,
+    pool: Optional[HttpPoolConfig] = None,
+) -> Groq:
+    """Shared sync Groq client (httpx.Client is thread-safe), for code paths that stay blocking."""
+    k = _key(api_key, base_url, pool or HttpPoolConfig.from_env())
+    with _lock:
+        client = _sync_clients.get(k)
+        if client is None:
+            cfg = k[2]
+            client = Groq(
+                api_key=k[0],
+                base_url=k[1],
+                max_retries=cfg.max_retries,
+                timeout=cfg.timeout_s,
+                http_client=httpx.Client(limits=cfg.limits(), timeout=cfg.timeout_s),
+            )
+            _sync_clients[k] = client
+        return client
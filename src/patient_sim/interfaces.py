@@ -7,8 +7,8 @@ This makes it easy to swap Groq/OpenAI/local models without touching Streamlit U
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Any, Dict, List, Protocol
+from dataclasses import asdict, dataclass
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Protocol, Tuple
 
 
 Conversation = List[Dict[str, str]]
@@ -22,9 +22,69 @@ class PatientSimConfig:
     top_p: float = 1.0
     reasoning_effort: str = "medium"
     reasoning_format: str | None = None
+    stop: Tuple[str, ...] | None = None
+
+    # Context window (see src.patient_sim.context_window). None disables trimming.
+    context_window_messages: int | None = 12       # last K user/assistant messages sent verbatim
+    context_summary_max_tokens: int = 400          # upper bound on the fact ledger of older turns
+
+
+@dataclass
+class ReplyInfo:
+    """Optional out-parameter filled by simulators: why generation stopped and what it cost."""
+
+    finish_reason: Optional[str] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    reasoning_tokens: Optional[int] = None
+    model: Optional[str] = None
+    attempts: int = 0
+    cached: bool = False
+    max_completion_tokens: Optional[int] = None    # budget actually requested (see src.patient_sim.budget)
+    reasoning_effort: Optional[str] = None
+
+    def update_from_usage(self, usage: Any) -> None:
+        """Read an SDK usage object (or dict); missing fields are left untouched."""
+        if usage is None:
+            return
+
+        def pick(obj: Any, name: str) -> Any:
+            return obj.get(name) if isinstance(obj, dict) else getattr(obj, name, None)
+
+        for name in ("prompt_tokens", "completion_tokens"):
+            v = pick(usage, name)
+            if v is not None:
+                setattr(self, name, int(v))
+        details = pick(usage, "completion_tokens_details")
+        reasoning = pick(details, "reasoning_tokens") if details is not None else None
+        if reasoning is not None:
+            self.reasoning_tokens = int(reasoning)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
 
 
 class PatientSimulator(Protocol):
-    def generate(self, conversation: Conversation, *, config: PatientSimConfig) -> str:
+    def generate(self, conversation: Conversation, *, config: PatientSimConfig, info: Optional[ReplyInfo] = None) -> str:
         """Generate the next patient message given the full conversation."""
         ...
+
+    def generate_stream(
+        self, conversation: Conversation, *, config: PatientSimConfig, info: Optional[ReplyInfo] = None
+    ) -> Iterator[str]:
+        """Yield the next patient message as text deltas (in order, concatenated = full reply)."""
+        ...
+
+
+class AsyncPatientSimulator(Protocol):
+    async def generate(
+        self, conversation: Conversation, *, config: PatientSimConfig, info: Optional[ReplyInfo] = None
+    ) -> str:
+        """Async variant of `PatientSimulator.generate`."""
+        ...
+
+    def generate_stream(
+        self, conversation: Conversation, *, config: PatientSimConfig, info: Optional[ReplyInfo] = None
+    ) -> AsyncIterator[str]:
+        """Async variant of `PatientSimulator.generate_stream` (an async generator of text deltas)."""
+        ...
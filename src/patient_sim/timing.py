@@ -0,0 +1,44 @@
+"""src.patient_sim.timing
+
+Per-turn latency measurement for patient replies.
+
+Wraps a stream of text deltas and records time-to-first-token (TTFT) and total
+latency without changing what the caller sees.
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+
+@dataclass
+class TurnTiming:
+    model: str = ""
+    started_at: float = field(default_factory=time.perf_counter)
+    ttft_s: Optional[float] = None
+    total_s: Optional[float] = None
+    chunks: int = 0
+    chars: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        d = asdict(self)
+        d.pop("started_at", None)
+        return d
+
+
+def timed_stream(deltas: Iterable[str], timing: TurnTiming) -> Iterator[str]:
+    """Yield `deltas` unchanged while filling in `timing`.
+
+    `total_s` is set when the stream is exhausted (or closed early).
+    """
+    try:
+        for delta in deltas:
+            if timing.ttft_s is None:
+                timing.ttft_s = time.perf_counter() - timing.started_at
+            timing.chunks += 1
+            timing.chars += len(delta)
+            yield delta
+    finally:
+        timing.total_s = time.perf_counter() - timing.started_at
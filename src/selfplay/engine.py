@@ -0,0 +1,228 @@
+"""src.selfplay.engine
+
+Headless self-play: a trainee bot interviews the simulated patient across a matrix
+of conditions x languages x replicates, with bounded parallelism, streaming each
+finished conversation to JSONL.
+
+Resumable: jobs whose id already appears with status "ok" in the output file are
+skipped, so re-running the same command after an interruption continues the run.
+
+    python -m src.selfplay.engine --conditions depression "panic disorder" \\
+        --languages English Arabic --replicates 20 --concurrency 16 --out data/selfplay.jsonl
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from dataclasses import asdict, dataclass, replace
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from src.patient_sim.async_groq_patient_sim import AsyncGroqPatientSimulator
+from src.patient_sim.context_window import build_context_window
+from src.patient_sim.interfaces import AsyncPatientSimulator, PatientSimConfig
+from src.patient_sim.prompts import build_system_prompt
+from src.selfplay.trainee_bots import LLMTraineeBot, ScriptedTraineeBot, TraineeBot
+from src.utils.hashing import canonical_hash
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass(frozen=True)
+class SelfPlayJob:
+    condition: str
+    language: str
+    replicate: int
+    trainee_bot: str
+    max_turns: int
+    # Part of job_id, so a rerun with another patient model/temperature is not "done".
+    patient_model: str = PatientSimConfig.model
+    patient_temperature: float = PatientSimConfig.temperature
+
+    def patient_config(self, base: PatientSimConfig) -> PatientSimConfig:
+        return replace(base, model=self.patient_model, temperature=self.patient_temperature)
+
+    @property
+    def job_id(self) -> str:
+        return canonical_hash(asdict(self))[:16]
+
+
+def build_jobs(
+    conditions: Iterable[str],
+    languages: Iterable[str],
+    replicates: int,
+    *,
+    trainee_bot: str,
+    max_turns: int,
+    patient_config: PatientSimConfig = PatientSimConfig(),
+) -> List[SelfPlayJob]:
+    return [
+        SelfPlayJob(
+            condition=c,
+            language=lang,
+            replicate=r,
+            trainee_bot=trainee_bot,
+            max_turns=max_turns,
+            patient_model=patient_config.model,
+            patient_temperature=patient_config.temperature,
+        )
+        for c in conditions
+        for lang in languages
+        for r in range(replicates)
+    ]
+
+
+def completed_job_ids(out_path: Path) -> Set[str]:
+    """Job ids already written successfully (tolerates a torn last line)."""
+    done: Set[str] = set()
+    if not out_path.exists():
+        return done
+    with out_path.open("r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if rec.get("status") == "ok" and rec.get("job_id"):
+                done.add(rec["job_id"])
+    return done
+
+
+async def run_conversation(
+    job: SelfPlayJob,
+    *,
+    patient: AsyncPatientSimulator,
+    bot: TraineeBot,
+    config: PatientSimConfig,
+) -> Dict[str, Any]:
+    config = job.patient_config(config)
+    history: List[Dict[str, str]] = [{"role": "system", "content": build_system_prompt(job.condition, job.language)}]
+    t0 = time.perf_counter()
+    for _ in range(job.max_turns):
+        question = await bot.next_message(history, condition=job.condition, language=job.language)
+        if not question:
+            break
+        history.append({"role": "user", "content": question})
+        window, _ = build_context_window(history, config=config)
+        reply = await patient.generate(window, config=config)
+        history.append({"role": "assistant", "content": reply or ""})
+    return {
+        "job_id": job.job_id,
+        **asdict(job),
+        "conversation": history,
+        "turns": sum(1 for m in history if m.get("role") in ("user", "assistant")),
+        "elapsed_s": round(time.perf_counter() - t0, 3),
+        "status": "ok",
+    }
+
+
+async def run_selfplay(
+    jobs: List[SelfPlayJob],
+    out_path: Path,
+    *,
+    patient: AsyncPatientSimulator,
+    bot: TraineeBot,
+    config: PatientSimConfig = PatientSimConfig(),
+    concurrency: int = 8,
+) -> Dict[str, Any]:
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    done = completed_job_ids(out_path)
+    pending = [j for j in jobs if j.job_id not in done]
+    logger.info("selfplay: %d jobs, %d already done, %d pending", len(jobs), len(jobs) - len(pending), len(pending))
+
+    sem = asyncio.Semaphore(max(1, concurrency))
+    counts = {"ok": 0, "error": 0}
+    t0 = time.perf_counter()
+
+    with out_path.open("a", encoding="utf-8") as out:
+
+        def write(rec: Dict[str, Any]) -> None:
+            # Single event loop thread: each line is written and flushed whole.
+            out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            out.flush()
+
+        async def worker(job: SelfPlayJob) -> None:
+            async with sem:
+                try:
+                    rec = await run_conversation(job, patient=patient, bot=bot, config=config)
+                except Exception as e:
+                    rec = {"job_id": job.job_id, **asdict(job), "status": "error", "error": repr(e)}
+                counts[rec["status"]] += 1
+                write(rec)
+                finished = counts["ok"] + counts["error"]
+                if finished % 10 == 0 or finished == len(pending):
+                    elapsed = time.perf_counter() - t0
+                    logger.info(
+                        "selfplay: %d/%d done (%d errors), %.1f conv/min",
+                        finished,
+                        len(pending),
+                        counts["error"],
+                        (counts["ok"] / elapsed) * 60 if elapsed > 0 else 0.0,
+                    )
+
+        await asyncio.gather(*(worker(j) for j in pending))
+
+    elapsed = time.perf_counter() - t0
+    return {
+        "jobs": len(jobs),
+        "skipped_done": len(jobs) - len(pending),
+        "ok": counts["ok"],
+        "error": counts["error"],
+        "elapsed_s": round(elapsed, 3),
+        "conversations_per_min": round((counts["ok"] / elapsed) * 60, 2) if elapsed > 0 else None,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--conditions", nargs="+", required=True)
+    ap.add_argument("--languages", nargs="+", default=["English", "Arabic"])
+    ap.add_argument("--replicates", type=int, default=1)
+    ap.add_argument("--max-turns", type=int, default=12, help="Max trainee questions per conversation.")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--bot", choices=["scripted", "llm"], default="scripted")
+    ap.add_argument("--bot-model", default="openai/gpt-oss-20b")
+    ap.add_argument("--patient-model", default=PatientSimConfig.model)
+    ap.add_argument("--base-url", default=None, help="Override the Groq base URL (e.g. a local stub server).")
+    ap.add_argument("--out", required=True)
+    args = ap.parse_args(argv)
+
+    from src.utils.env import load_env
+
+    load_env()
+
+    bot: TraineeBot
+    if args.bot == "llm":
+        bot = LLMTraineeBot(model=args.bot_model, max_questions=args.max_turns, base_url=args.base_url)
+    else:
+        bot = ScriptedTraineeBot()
+    patient = AsyncGroqPatientSimulator(base_url=args.base_url)
+    patient_config = PatientSimConfig(model=args.patient_model)
+    jobs = build_jobs(
+        args.conditions,
+        args.languages,
+        args.replicates,
+        trainee_bot=bot.name,
+        max_turns=args.max_turns,
+        patient_config=patient_config,
+    )
+
+    summary = asyncio.run(
+        run_selfplay(
+            jobs,
+            Path(args.out),
+            patient=patient,
+            bot=bot,
+            config=patient_config,
+            concurrency=args.concurrency,
+        )
+    )
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""src.selfplay.trainee_bots
+
+"Trainee" bots that interview the simulated patient during self-play.
+
+- `ScriptedTraineeBot`: deterministic question script per language (no LLM).
+- `LLMTraineeBot`: asks an LLM to play the trainee, on the shared pooled client.
+
+A bot returns the next trainee message, or None to end the conversation.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Protocol
+
+from src.patient_sim.http_pool import HttpPoolConfig, get_async_groq_client
+from src.patient_sim.interfaces import Conversation
+from src.utils.async_runtime import run_on_shared_loop
+from src.utils.rate_limit import get_rate_limiter
+from src.utils.tokens import estimate_request_tokens
+
+
+class TraineeBot(Protocol):
+    name: str
+
+    async def next_message(self, conversation: Conversation, *, condition: str, language: str) -> Optional[str]:
+        ...
+
+
+_SCRIPTS: Dict[str, List[str]] = {
+    "English": [
+        "Hello, I'm Dr. Sam, a psychiatrist. Today I'd like to ask you some questions to understand what's going on.",
+        "What brings you here today?",
+        "How long has this been going on, and how does it affect your work, sleep or daily life?",
+        "That sounds really difficult, I'm sorry you've been going through this.",
+        "Have you had any treatment before, such as therapy or medication?",
+        "Do you drink alcohol or use any drugs?",
+        "Have you had any thoughts of harming yourself or ending your life?",
+        "Do you have a plan, any intent, or access to means to hurt yourself?",
+        "To summarize, we talked about how you've been feeling; next steps are a follow-up and a treatment plan.",
+        "Thank you for talking with me today. Is there anything else you'd like to add?",
+    ],
+    "Arabic": [
+        "مرحبا، انا الدكتور سام، طبيب نفسي. اليوم اريد ان اسالك بعض الاسئلة لافهم ما يحدث معك.",
+        "احكي لي، ايش جابك اليوم؟",
+        "من متى بدات هذه المشكلة، وكيف تؤثر على شغلك او نومك او حياتك اليومية؟",
+        "اتفهم ان هذا صعب عليك، شكرا لانك تشاركني.",
+        "هل اخذت علاجا سابقا، مثل جلسات او ادوية؟",
+        "هل تشرب الكحول او تستخدم اي مخدرات؟",
+        "هل راودتك افكار لايذاء نفسك او انهاء حياتك؟",
+        "هل لديك خطة او نية او وسيلة لايذاء نفسك؟",
+        "باختصار، تحدثنا عن حالتك؛ الخطوات التالية هي موعد متابعة وخطة علاج.",
+        "شكرا لحديثك معي اليوم. هل هناك شيء تود اضافته؟",
+    ],
+}
+
+
+@dataclass
+class ScriptedTraineeBot:
+    name: str = "scripted"
+    max_questions: Optional[int] = None
+
+    async def next_message(self, conversation: Conversation, *, condition: str, language: str) -> Optional[str]:
+        script = _SCRIPTS.get(language) or _SCRIPTS["English"]
+        if self.max_questions is not None:
+            script = script[: self.max_questions]
+        asked = sum(1 for m in conversation if m.get("role") == "user")
+        return script[asked] if asked < len(script) else None
+
+
+_LLM_TRAINEE_SYSTEM = (
+    "You are a psychiatry trainee conducting an intake interview in an OSCE station.\n"
+    "Ask one concise question or statement per turn (max 2 sentences). Cover: introduction and agenda, "
+    "open question, timeline and impact, past treatment, substance use, empathy, suicide risk screen "
+    "(and plan/intent/means if risk is present), then summarize and close.\n"
+    "When the interview is complete, reply with exactly: END\n"
+    "Language: speak in {language}."
+)
+
+
+class LLMTraineeBot:
+    def __init__(
+        self,
+        *,
+        model: str = "openai/gpt-oss-20b",
+        max_questions: int = 12,
+        temperature: float = 0.8,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        pool: Optional[HttpPoolConfig] = None,
+    ) -> None:
+        self.name = f"llm:{model}"
+        self.model = model
+        self.max_questions = max_questions
+        self.temperature = temperature
+        self._client_kwargs = {"api_key": api_key, "base_url": base_url, "pool": pool}
+
+    async def _ask(self, messages: Conversation) -> str:
+        client = get_async_groq_client(**self._client_kwargs)
+        resp = await get_rate_limiter("groq", self.model).acall(
+            lambda: client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=self.temperature,
+                max_completion_tokens=512,
+                reasoning_effort="low",
+            ),
+            estimated_tokens=estimate_request_tokens(messages, 512),
+        )
+        return (resp.choices[0].message.content or "").strip()
+
+    async def next_message(self, conversation: Conversation, *, condition: str, language: str) -> Optional[str]:
+        asked = sum(1 for m in conversation if m.get("role") == "user")
+        if asked >= self.max_questions:
+            return None
+        # Role-flip: from the bot's point of view the patient is the "user".
+        messages: Conversation = [{"role": "system", "content": _LLM_TRAINEE_SYSTEM.format(language=language)}]
+        for m in conversation:
+            if m.get("role") == "user":
+                messages.append({"role": "assistant", "content": m.get("content", "")})
+            elif m.get("role") == "assistant":
+                messages.append({"role": "user", "content": m.get("content", "")})
+        if len(messages) == 1:
+            messages.append({"role": "user", "content": "(The patient sits down.)"})
+        text = await run_on_shared_loop(self._ask(messages))
+        if not text or text.strip().upper() == "END":
+            return None
+        return text
@@ -0,0 +1,296 @@
+"""src.state.backends
+
+Persistent session-store backends (no Streamlit import: usable from scripts/benchmarks).
+
+`src.state.session_store` keeps `st.session_state` as a per-rerun read cache and
+writes through to a `SessionBackend`, so an interview survives a server restart and
+any app worker can resume a session from its id.
+
+Backends:
+- MemorySessionBackend: process-local (previous behaviour; tests/dev).
+- SQLiteSessionBackend: one SQLite file in WAL mode, shared by every worker process.
+
+Turns are append-only: `append_message` inserts exactly one row, and
+`set_conversation`/`clear_all` start a new conversation epoch instead of rewriting
+old rows.
+
+Selection: SESSION_STORE_BACKEND = sqlite (default) | memory; SESSION_DB = path.
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Protocol
+
+from src.utils.env import get_env
+from src.utils.paths import project_root
+
+Message = Dict[str, str]
+
+
+@dataclass
+class SessionSnapshot:
+    session_id: str
+    conversation_id: int = 0
+    condition: str = ""
+    language: str = "English"
+    history: List[Message] = field(default_factory=list)
+    artifacts: Dict[str, Any] = field(default_factory=dict)
+
+
+class SessionBackend(Protocol):
+    def load(self, session_id: str) -> Optional[SessionSnapshot]:
+        ...
+
+    def get_history(self, session_id: str) -> List[Message]:
+        ...
+
+    def append_message(self, session_id: str, role: str, content: str) -> None:
+        ...
+
+    def set_conversation(self, session_id: str, history: List[Message], *, condition: str, language: str) -> None:
+        ...
+
+    def clear_all(self, session_id: str, *, default_language: str = "English") -> None:
+        ...
+
+    def set_artifact(self, session_id: str, key: str, value: Any) -> None:
+        ...
+
+
+# -----------------------------
+# In-memory
+# -----------------------------
+
+
+class MemorySessionBackend:
+    def __init__(self) -> None:
+        self._sessions: Dict[str, SessionSnapshot] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, session_id: str) -> SessionSnapshot:
+        snap = self._sessions.get(session_id)
+        if snap is None:
+            snap = SessionSnapshot(session_id=session_id)
+            self._sessions[session_id] = snap
+        return snap
+
+    def load(self, session_id: str) -> Optional[SessionSnapshot]:
+        with self._lock:
+            snap = self._sessions.get(session_id)
+            if snap is None:
+                return None
+            return SessionSnapshot(
+                session_id, snap.conversation_id, snap.condition, snap.language, list(snap.history), dict(snap.artifacts)
+            )
+
+    def get_history(self, session_id: str) -> List[Message]:
+        with self._lock:
+            snap = self._sessions.get(session_id)
+            return list(snap.history) if snap else []
+
+    def append_message(self, session_id: str, role: str, content: str) -> None:
+        with self._lock:
+            self._get(session_id).history.append({"role": role, "content": content})
+
+    def set_conversation(self, session_id: str, history: List[Message], *, condition: str, language: str) -> None:
+        with self._lock:
+            snap = self._get(session_id)
+            snap.conversation_id += 1
+            snap.condition, snap.language = condition, language
+            snap.history = [dict(m) for m in history]
+            snap.artifacts = {}
+
+    def clear_all(self, session_id: str, *, default_language: str = "English") -> None:
+        self.set_conversation(session_id, [], condition="", language=default_language)
+
+    def set_artifact(self, session_id: str, key: str, value: Any) -> None:
+        with self._lock:
+            self._get(session_id).artifacts[key] = value
+
+
+# -----------------------------
+# SQLite (WAL)
+# -----------------------------
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS sessions ("
+    " session_id TEXT PRIMARY KEY, conversation_id INTEGER NOT NULL DEFAULT 0,"
+    " condition TEXT NOT NULL DEFAULT '', language TEXT NOT NULL DEFAULT 'English',"
+    " created_at REAL NOT NULL, updated_at REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS turns ("
+    " session_id TEXT NOT NULL, conversation_id INTEGER NOT NULL, seq INTEGER NOT NULL,"
+    " role TEXT NOT NULL, content TEXT NOT NULL, created_at REAL NOT NULL,"
+    " PRIMARY KEY (session_id, conversation_id, seq)) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS artifacts ("
+    " session_id TEXT NOT NULL, conversation_id INTEGER NOT NULL, key TEXT NOT NULL,"
+    " value TEXT NOT NULL, updated_at REAL NOT NULL,"
+    " PRIMARY KEY (session_id, conversation_id, key)) WITHOUT ROWID",
+)
+
+_ENSURE_SESSION = (
+    "INSERT OR IGNORE INTO sessions(session_id, conversation_id, condition, language, created_at, updated_at) "
+    "VALUES (?, 0, '', ?, ?, ?)"
+)
+
+_APPEND_TURN = (
+    "INSERT INTO turns(session_id, conversation_id, seq, role, content, created_at) "
+    "SELECT s.session_id, s.conversation_id, "
+    " COALESCE((SELECT MAX(t.seq) FROM turns t WHERE t.session_id = s.session_id"
+    "           AND t.conversation_id = s.conversation_id), -1) + 1, ?, ?, ? "
+    "FROM sessions s WHERE s.session_id = ?"
+)
+
+
+class SQLiteSessionBackend:
+    """One connection per thread; WAL lets readers proceed while a writer commits."""
+
+    def __init__(self, path: str | Path, *, busy_timeout_s: float = 30.0) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.busy_timeout_s = busy_timeout_s
+        self._local = threading.local()
+        conn = self._conn()
+        for stmt in _SCHEMA:
+            conn.execute(stmt)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; multi-statement writes use explicit BEGIN IMMEDIATE.
+            conn = sqlite3.connect(str(self.path), timeout=self.busy_timeout_s, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _write(self, statements: List[tuple]) -> None:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, params in statements:
+                conn.execute(sql, params)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def load(self, session_id: str) -> Optional[SessionSnapshot]:
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT conversation_id, condition, language FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        conversation_id, condition, language = row
+        arts = conn.execute(
+            "SELECT key, value FROM artifacts WHERE session_id = ? AND conversation_id = ?",
+            (session_id, conversation_id),
+        ).fetchall()
+        return SessionSnapshot(
+            session_id=session_id,
+            conversation_id=conversation_id,
+            condition=condition,
+            language=language,
+            history=self.get_history(session_id),
+            artifacts={k: json.loads(v) for k, v in arts},
+        )
+
+    def get_history(self, session_id: str) -> List[Message]:
+        rows = self._conn().execute(
+            "SELECT t.role, t.content FROM turns t JOIN sessions s"
+            " ON s.session_id = t.session_id AND s.conversation_id = t.conversation_id"
+            " WHERE t.session_id = ? ORDER BY t.seq",
+            (session_id,),
+        ).fetchall()
+        return [{"role": r, "content": c} for r, c in rows]
+
+    def append_message(self, session_id: str, role: str, content: str) -> None:
+        now = time.time()
+        self._write(
+            [
+                (_ENSURE_SESSION, (session_id, "English", now, now)),
+                (_APPEND_TURN, (role, content, now, session_id)),
+                ("UPDATE sessions SET updated_at = ? WHERE session_id = ?", (now, session_id)),
+            ]
+        )
+
+    def set_conversation(self, session_id: str, history: List[Message], *, condition: str, language: str) -> None:
+        now = time.time()
+        stmts: List[tuple] = [
+            (_ENSURE_SESSION, (session_id, language, now, now)),
+            (
+                "UPDATE sessions SET conversation_id = conversation_id + 1, condition = ?, language = ?, updated_at = ?"
+                " WHERE session_id = ?",
+                (condition, language, now, session_id),
+            ),
+        ]
+        stmts += [(_APPEND_TURN, (m["role"], m["content"], now, session_id)) for m in history]
+        self._write(stmts)
+
+    def clear_all(self, session_id: str, *, default_language: str = "English") -> None:
+        self.set_conversation(session_id, [], condition="", language=default_language)
+
+    def set_artifact(self, session_id: str, key: str, value: Any) -> None:
+        now = time.time()
+        payload = json.dumps(value, ensure_ascii=False, default=str)
+        self._write(
+            [
+                (_ENSURE_SESSION, (session_id, "English", now, now)),
+                (
+                    "INSERT INTO artifacts(session_id, conversation_id, key, value, updated_at) "
+                    "SELECT session_id, conversation_id, ?, ?, ? FROM sessions WHERE session_id = ? "
+                    "ON CONFLICT(session_id, conversation_id, key) DO UPDATE SET"
+                    " value = excluded.value, updated_at = excluded.updated_at",
+                    (key, payload, now, session_id),
+                ),
+            ]
+        )
+
+    def purge_older_than(self, seconds: float) -> int:
+        """Delete sessions idle for longer than `seconds` (with their turns/artifacts)."""
+        cutoff = time.time() - seconds
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            ids = [r[0] for r in conn.execute("SELECT session_id FROM sessions WHERE updated_at < ?", (cutoff,))]
+            for table in ("turns", "artifacts", "sessions"):
+                conn.executemany(f"DELETE FROM {table} WHERE session_id = ?", [(i,) for i in ids])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return len(ids)
+
+
+# -----------------------------
+# Process-wide default
+# -----------------------------
+
+_default_lock = threading.Lock()
+_default: Optional[SessionBackend] = None
+
+
+def default_session_db() -> Path:
+    p = project_root() / ".data"
+    p.mkdir(parents=True, exist_ok=True)
+    return p / "sessions.sqlite3"
+
+
+def default_session_backend() -> SessionBackend:
+    global _default
+    with _default_lock:
+        if _default is None:
+            kind = (get_env("SESSION_STORE_BACKEND", "sqlite") or "sqlite").lower()
+            if kind == "memory":
+                _default = MemorySessionBackend()
+            elif kind == "sqlite":
+                _default = SQLiteSessionBackend(get_env("SESSION_DB", "") or default_session_db())
+            else:
+                raise ValueError(f"Unknown SESSION_STORE_BACKEND: {kind!r} (expected 'sqlite' or 'memory')")
+        return _default
@@ -0,0 +1,132 @@
+"""src.state.bench_sessions
+
+Benchmark: session-store append/read latency under many concurrent sessions.
+
+Each simulated session sets a conversation, then alternates appending a turn and
+reading the full history back (what one chat rerun does). Sessions run on a thread
+pool against one backend instance; optionally several processes share the same
+SQLite file to mimic multiple app workers:
+
+    python -m src.state.bench_sessions --sessions 2000 --turns 10 --threads 32 --processes 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from src.state.backends import MemorySessionBackend, SessionBackend, SQLiteSessionBackend
+
+
+def _make_backend(kind: str, db: str) -> SessionBackend:
+    return MemorySessionBackend() if kind == "memory" else SQLiteSessionBackend(db)
+
+
+def _pct(data: List[float], q: float) -> float:
+    return round(data[min(len(data) - 1, int(q * (len(data) - 1)))] * 1000, 3)
+
+
+def _summarize(name: str, latencies: List[float]) -> Dict[str, Any]:
+    lat = sorted(latencies)
+    if not lat:
+        return {"op": name, "n": 0}
+    return {
+        "op": name,
+        "n": len(lat),
+        "p50_ms": round(statistics.median(lat) * 1000, 3),
+        "p95_ms": _pct(lat, 0.95),
+        "p99_ms": _pct(lat, 0.99),
+        "max_ms": round(lat[-1] * 1000, 3),
+    }
+
+
+def _run_worker(args: Tuple[str, str, int, int, int]) -> Tuple[List[float], List[float]]:
+    kind, db, sessions, turns, threads = args
+    backend = _make_backend(kind, db)
+
+    def session() -> Tuple[List[float], List[float]]:
+        sid = uuid.uuid4().hex
+        backend.set_conversation(sid, [{"role": "system", "content": "You are a patient."}], condition="MDD", language="English")
+        appends, reads = [], []
+        for i in range(turns):
+            role = "user" if i % 2 == 0 else "assistant"
+            t0 = time.perf_counter()
+            backend.append_message(sid, role, f"turn {i}: " + "lorem ipsum " * 8)
+            appends.append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            history = backend.get_history(sid)
+            reads.append(time.perf_counter() - t0)
+            if len(history) != i + 2:
+                raise AssertionError(f"session {sid}: expected {i + 2} messages, got {len(history)}")
+        return appends, reads
+
+    appends: List[float] = []
+    reads: List[float] = []
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for a, r in pool.map(lambda _: session(), range(sessions)):
+            appends += a
+            reads += r
+    return appends, reads
+
+
+def run_bench(*, kind: str, db: str, sessions: int, turns: int, threads: int, processes: int) -> Dict[str, Any]:
+    if kind == "memory":
+        processes = 1  # a memory backend is not shared across processes
+    if kind == "sqlite":
+        SQLiteSessionBackend(db)  # create the schema once before workers race on it
+    per_proc = [sessions // processes + (1 if i < sessions % processes else 0) for i in range(processes)]
+    jobs = [(kind, db, n, turns, threads) for n in per_proc if n]
+
+    t0 = time.perf_counter()
+    if processes == 1:
+        results = [_run_worker(jobs[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            results = list(pool.map(_run_worker, jobs))
+    wall = time.perf_counter() - t0
+
+    appends = [x for a, _ in results for x in a]
+    reads = [x for _, r in results for x in r]
+    ops = len(appends) + len(reads)
+    return {
+        "backend": kind,
+        "sessions": sessions,
+        "turns": turns,
+        "threads_per_process": threads,
+        "processes": processes,
+        "wall_s": round(wall, 3),
+        "ops_per_s": round(ops / wall, 1) if wall > 0 else None,
+        "append": _summarize("append_message", appends),
+        "read": _summarize("get_history", reads),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark session-store backends.")
+    ap.add_argument("--backend", choices=["sqlite", "memory", "both"], default="both")
+    ap.add_argument("--db", default="", help="SQLite file (default: a temp file).")
+    ap.add_argument("--sessions", type=int, default=2000)
+    ap.add_argument("--turns", type=int, default=10)
+    ap.add_argument("--threads", type=int, default=32)
+    ap.add_argument("--processes", type=int, default=1)
+    args = ap.parse_args()
+
+    kinds = ["memory", "sqlite"] if args.backend == "both" else [args.backend]
+    with tempfile.TemporaryDirectory() as tmp:
+        db = args.db or str(Path(tmp) / "bench_sessions.sqlite3")
+        for kind in kinds:
+            report = run_bench(
+                kind=kind, db=db, sessions=args.sessions, turns=args.turns, threads=args.threads, processes=args.processes
+            )
+            print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""src.state.conversation
+
+Immutable, incrementally hashed conversation type.
+
+`ConversationLog` replaces the list-of-dicts history passed around the app:
+
+- Turns are slot-based, read-only `Mapping`s, so `m["role"]`, `m.get("content")`
+  and `dict(m)` keep working at every existing call site.
+- `append` returns a new log that shares storage with its parent (append-only,
+  Go-slice style): appending at the tip is O(1); appending to an older version
+  forks a copy of the prefix once.
+- A running SHA-256 chain gives O(1) `fingerprint` (all turns) and
+  `dialogue_fingerprint` (user/assistant only), stable across processes, so
+  they can be used as cache keys.
+- Per-role index views and judge turn numbering are maintained on append, so
+  `by_role`, `dialogue` and `numbered_turns` never re-walk or re-filter.
+
+No Streamlit import: used by src.state, src.trainee_judge and src.evaluation.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections.abc import Mapping
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Union, overload
+
+# Anything shaped like the app's history: a list of role/content dicts or a ConversationLog.
+HistoryLike = Sequence[Mapping[str, str]]
+
+DIALOGUE_ROLES = ("user", "assistant")
+_JUDGE_ROLE = {"user": "trainee", "assistant": "patient"}
+_EMPTY_HASH = hashlib.sha256(b"").hexdigest()
+
+
+class Turn(Mapping):
+    """One read-only message. Behaves like `{"role": ..., "content": ...}`."""
+
+    __slots__ = ("role", "content", "_normalized")
+
+    def __init__(self, role: str, content: str) -> None:
+        object.__setattr__(self, "role", role)
+        object.__setattr__(self, "content", content or "")
+        object.__setattr__(self, "_normalized", None)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError("Turn is immutable")
+
+    def __getitem__(self, key: str) -> str:
+        if key == "role":
+            return self.role
+        if key == "content":
+            return self.content
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(("role", "content"))
+
+    def __len__(self) -> int:
+        return 2
+
+    def __hash__(self) -> int:
+        return hash((self.role, self.content))
+
+    def __repr__(self) -> str:
+        return f"Turn(role={self.role!r}, content={self.content!r})"
+
+    @property
+    def normalized(self) -> str:
+        """`legacy_regex.normalize(content)`, computed once."""
+        if self._normalized is None:
+            from src.evaluation.trainee.legacy_regex import normalize  # lazy: legacy_regex imports this module
+
+            object.__setattr__(self, "_normalized", normalize(self.content))
+        return self._normalized  # type: ignore[return-value]
+
+    def as_dict(self) -> Dict[str, str]:
+        return {"role": self.role, "content": self.content}
+
+
+class _Store:
+    """Shared append-only storage; a log sees its first `n` entries."""
+
+    __slots__ = ("turns", "chain", "dialogue_chain", "positions", "dialogue", "numbered", "lock")
+
+    def __init__(self) -> None:
+        self.turns: List[Turn] = []
+        self.chain: List[str] = []                       # chain[i] = hash after turn i
+        self.dialogue_chain: List[str] = []              # same, user/assistant turns only
+        self.positions: Dict[str, List[int]] = {}        # role -> indexes into turns
+        self.dialogue: List[int] = []                    # indexes of user/assistant turns
+        self.numbered: List[Dict[str, Any]] = []         # judge format, one per dialogue turn
+        self.lock = threading.Lock()
+
+    def fork(self, n: int, n_dialogue: int, role_counts: Dict[str, int]) -> "_Store":
+        s = _Store()
+        s.turns = self.turns[:n]
+        s.chain = self.chain[:n]
+        s.dialogue_chain = self.dialogue_chain[:n_dialogue]
+        s.positions = {r: self.positions[r][:c] for r, c in role_counts.items()}
+        s.dialogue = self.dialogue[:n_dialogue]
+        s.numbered = self.numbered[:n_dialogue]
+        return s
+
+
+def _link(prev: str, turn: Turn) -> str:
+    h = hashlib.sha256(prev.encode("ascii"))
+    h.update(turn.role.encode("utf-8"))
+    h.update(b"\x00")
+    h.update(turn.content.encode("utf-8"))
+    return h.hexdigest()
+
+
+class TurnView(Sequence):
+    """Zero-copy view over a subset of a log's turns."""
+
+    __slots__ = ("_turns", "_positions", "_n")
+
+    def __init__(self, turns: List[Turn], positions: List[int], n: int) -> None:
+        self._turns = turns
+        self._positions = positions
+        self._n = n
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __getitem__(self, i):  # type: ignore[override]
+        if isinstance(i, slice):
+            return [self._turns[self._positions[j]] for j in range(*i.indices(self._n))]
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError(i)
+        return self._turns[self._positions[i]]
+
+    def contents(self) -> List[str]:
+        return [t.content for t in self]
+
+
+class ConversationLog(Sequence):
+    """Immutable conversation; see module docstring."""
+
+    __slots__ = ("_store", "_n", "_n_dialogue", "_role_counts")
+
+    def __init__(self, messages: Optional[Iterable[Mapping[str, str]]] = None) -> None:
+        self._store = _Store()
+        self._n = 0
+        self._n_dialogue = 0
+        self._role_counts: Dict[str, int] = {}
+        for m in messages or ():
+            self._push(Turn(m.get("role", ""), m.get("content", "") or ""))
+
+    @classmethod
+    def coerce(cls, history: Optional[HistoryLike]) -> "ConversationLog":
+        return history if isinstance(history, ConversationLog) else cls(history)
+
+    # --- construction ---
+    def _push(self, turn: Turn) -> None:
+        """Append in place; only used while building `self` (before it is shared)."""
+        s = self._store
+        with s.lock:
+            if len(s.turns) != self._n:
+                s = self._store = s.fork(self._n, self._n_dialogue, self._role_counts)
+            i = len(s.turns)
+            s.turns.append(turn)
+            s.chain.append(_link(s.chain[-1] if s.chain else _EMPTY_HASH, turn))
+            s.positions.setdefault(turn.role, []).append(i)
+            if turn.role in DIALOGUE_ROLES:
+                s.dialogue_chain.append(_link(s.dialogue_chain[-1] if s.dialogue_chain else _EMPTY_HASH, turn))
+                s.dialogue.append(i)
+                s.numbered.append({"turn": len(s.dialogue), "role": _JUDGE_ROLE[turn.role], "content": turn.content})
+                self._n_dialogue += 1
+        self._n += 1
+        self._role_counts = {**self._role_counts, turn.role: self._role_counts.get(turn.role, 0) + 1}
+
+    def append(self, role: str, content: str) -> "ConversationLog":
+        """Return a new log with one more turn; `self` is unchanged."""
+        child = ConversationLog.__new__(ConversationLog)
+        child._store = self._store
+        child._n = self._n
+        child._n_dialogue = self._n_dialogue
+        child._role_counts = self._role_counts
+        child._push(Turn(role, content))
+        return child
+
+    # --- Sequence ---
+    def __len__(self) -> int:
+        return self._n
+
+    @overload
+    def __getitem__(self, i: int) -> Turn: ...
+    @overload
+    def __getitem__(self, i: slice) -> Union["ConversationLog", List[Turn]]: ...
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(self._n)
+            if start == 0 and step == 1:
+                return self.prefix(stop)
+            return [self._store.turns[j] for j in range(start, stop, step)]
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError(i)
+        return self._store.turns[i]
+
+    def __iter__(self) -> Iterator[Turn]:
+        turns = self._store.turns
+        for i in range(self._n):
+            yield turns[i]
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, ConversationLog):
+            return self._n == other._n and self.fingerprint == other.fingerprint
+        if isinstance(other, list):
+            return len(other) == self._n and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(self.fingerprint)
+
+    def __repr__(self) -> str:
+        return f"ConversationLog(n={self._n}, fingerprint={self.fingerprint[:12]})"
+
+    def prefix(self, n: int) -> "ConversationLog":
+        """The first `n` turns, sharing storage."""
+        n = max(0, min(n, self._n))
+        if n == self._n:
+            return self
+        s = self._store
+        out = ConversationLog.__new__(ConversationLog)
+        out._store = s
+        out._n = n
+        out._n_dialogue = sum(1 for i in s.dialogue[: self._n_dialogue] if i < n)
+        out._role_counts = {r: sum(1 for i in s.positions[r][:c] if i < n) for r, c in self._role_counts.items()}
+        return out
+
+    # --- O(1) fingerprints ---
+    @property
+    def fingerprint(self) -> str:
+        return self._store.chain[self._n - 1] if self._n else _EMPTY_HASH
+
+    @property
+    def dialogue_fingerprint(self) -> str:
+        """Hash of user/assistant turns only (system prompt excluded): the judge's input."""
+        return self._store.dialogue_chain[self._n_dialogue - 1] if self._n_dialogue else _EMPTY_HASH
+
+    def dialogue_fingerprint_at(self, k: int) -> str:
+        """`dialogue_fingerprint` of the first `k` user/assistant turns (O(1))."""
+        k = max(0, min(k, self._n_dialogue))
+        return self._store.dialogue_chain[k - 1] if k else _EMPTY_HASH
+
+    # --- views ---
+    def by_role(self, role: str) -> TurnView:
+        s = self._store
+        return TurnView(s.turns, s.positions.get(role, []), self._role_counts.get(role, 0))
+
+    def dialogue(self) -> TurnView:
+        return TurnView(self._store.turns, self._store.dialogue, self._n_dialogue)
+
+    def numbered_turns(self) -> List[Dict[str, Any]]:
+        """`build_numbered_turns` output, maintained on append (treat the dicts as read-only)."""
+        return self._store.numbered[: self._n_dialogue]
+
+    def as_messages(self) -> List[Dict[str, str]]:
+        return [t.as_dict() for t in self]
+
+
+def as_message_dicts(history: Optional[HistoryLike]) -> List[Dict[str, str]]:
+    """Plain JSON-serializable messages for provider SDKs."""
+    return [m if type(m) is dict else {"role": m["role"], "content": m["content"]} for m in history or []]
@@ -3,12 +3,20 @@
 Centralized Streamlit session_state keys to prevent typos.
 """
 
+SESSION_ID = "session_id"
+
 CONVERSATION_HISTORY = "conversation_history"
 ACTIVE_CONDITION = "active_condition"
 ACTIVE_LANGUAGE = "active_language"
 RUBRIC_PATH = "rubric_path"
 RUBRIC = "rubric"
 
+PATIENT_TURN_TIMINGS = "patient_turn_timings"
+
 TRAINEE_GRADE = "trainee_grade"
 TRAINEE_META = "trainee_meta"
 TRAINEE_SCORED = "trainee_scored"
+# Speculative pre-evaluation (src.evaluation.speculative): last-used settings + shown result key.
+TRAINEE_RUN_SETTINGS = "trainee_run_settings"
+TRAINEE_RESULT_KEY = "trainee_result_key"
+PATIENT_EVAL_CONFIG = "patient_eval_config"
@@ -4,30 +4,107 @@ Session state helpers.
 
 This module intentionally keeps Streamlit-specific logic here so the rest of the
 codebase can stay testable without Streamlit.
+
+`st.session_state` is a per-browser-session read cache; every write also goes to the
+persistent backend (`src.state.backends`, SQLite/WAL by default), keyed by a session
+id carried in the URL (`?sid=`) and a cookie. A restarted or different worker
+rehydrates the interview from the backend on first access.
 """
 
 from __future__ import annotations
 
-from typing import Dict, List
+import re
+import uuid
+from typing import Any, Dict, List, Optional
 
 import streamlit as st
+import streamlit.components.v1 as components
 
+from src.state.backends import SessionBackend, default_session_backend
+from src.state.conversation import ConversationLog, HistoryLike
 from src.state.session_keys import (
     ACTIVE_CONDITION,
     ACTIVE_LANGUAGE,
     CONVERSATION_HISTORY,
+    PATIENT_TURN_TIMINGS,
     RUBRIC,
     RUBRIC_PATH,
+    SESSION_ID,
     TRAINEE_GRADE,
     TRAINEE_META,
     TRAINEE_SCORED,
 )
 
+SESSION_COOKIE = "sp_session_id"
+SESSION_QUERY_PARAM = "sid"
+SESSION_COOKIE_MAX_AGE_S = 7 * 24 * 3600
+_SESSION_ID_RE = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+# Artifacts persisted alongside the conversation (rehydrated on resume).
+_PERSISTED_ARTIFACTS = (PATIENT_TURN_TIMINGS, TRAINEE_GRADE, TRAINEE_META, TRAINEE_SCORED)
+
+
+# -----------------------------
+# Session id + backend
+# -----------------------------
+
+
+def _backend() -> SessionBackend:
+    return default_session_backend()
+
+
+def _cookie_session_id() -> Optional[str]:
+    try:
+        return st.context.cookies.get(SESSION_COOKIE)
+    except Exception:
+        return None
+
+
+def _set_cookie(session_id: str) -> None:
+    # Streamlit can read cookies but not set them; a zero-height component writes it.
+    components.html(
+        f"<script>parent.document.cookie = '{SESSION_COOKIE}={session_id}; path=/; "
+        f"max-age={SESSION_COOKIE_MAX_AGE_S}; SameSite=Lax';</script>",
+        height=0,
+    )
+
+
+def session_id() -> str:
+    """Resolve (once per browser session) the persistent session id: URL, then cookie, then new."""
+    sid = st.session_state.get(SESSION_ID)
+    if sid:
+        return sid
+    candidates = (st.query_params.get(SESSION_QUERY_PARAM), _cookie_session_id())
+    sid = next((c for c in candidates if c and _SESSION_ID_RE.match(c)), None) or uuid.uuid4().hex
+    st.session_state[SESSION_ID] = sid
+    st.query_params[SESSION_QUERY_PARAM] = sid
+    _set_cookie(sid)
+    return sid
+
+
+def _hydrate(sid: str) -> None:
+    snap = _backend().load(sid)
+    if snap is None:
+        return
+    st.session_state[CONVERSATION_HISTORY] = ConversationLog(snap.history)
+    st.session_state[ACTIVE_CONDITION] = snap.condition
+    st.session_state[ACTIVE_LANGUAGE] = snap.language
+    for k in _PERSISTED_ARTIFACTS:
+        if k in snap.artifacts:
+            st.session_state[k] = snap.artifacts[k]
+
+
+# -----------------------------
+# Public API
+# -----------------------------
+
 
 def ensure_initialized(*, default_language: str = "English") -> None:
-    """Initialize expected session_state keys."""
+    """Initialize expected session_state keys (rehydrating a persisted session if any)."""
+    if SESSION_ID not in st.session_state:
+        _hydrate(session_id())
     if CONVERSATION_HISTORY not in st.session_state:
-        st.session_state[CONVERSATION_HISTORY] = []
+        st.session_state[CONVERSATION_HISTORY] = ConversationLog()
     if ACTIVE_CONDITION not in st.session_state:
         st.session_state[ACTIVE_CONDITION] = ""
     if ACTIVE_LANGUAGE not in st.session_state:
@@ -37,6 +114,8 @@ def ensure_initialized(*, default_language: str = "English") -> None:
         st.session_state[RUBRIC_PATH] = "rubrics/psychiatry_intake.json"
     if RUBRIC not in st.session_state:
         st.session_state[RUBRIC] = None
+    if PATIENT_TURN_TIMINGS not in st.session_state:
+        st.session_state[PATIENT_TURN_TIMINGS] = []
 
     for k in (TRAINEE_GRADE, TRAINEE_META, TRAINEE_SCORED):
         if k not in st.session_state:
@@ -45,20 +124,25 @@ def ensure_initialized(*, default_language: str = "English") -> None:
 
 def clear_all(*, default_language: str = "English") -> None:
     """Clear conversation and evaluation outputs."""
-    st.session_state[CONVERSATION_HISTORY] = []
+    _backend().clear_all(session_id(), default_language=default_language)
+    st.session_state[CONVERSATION_HISTORY] = ConversationLog()
     st.session_state[ACTIVE_CONDITION] = ""
     st.session_state[ACTIVE_LANGUAGE] = default_language
     st.session_state[RUBRIC] = None
+    st.session_state[PATIENT_TURN_TIMINGS] = []
     st.session_state[TRAINEE_GRADE] = None
     st.session_state[TRAINEE_META] = None
     st.session_state[TRAINEE_SCORED] = None
 
 
-def set_conversation(history: List[Dict[str, str]], *, condition: str, language: str) -> None:
+def set_conversation(history: HistoryLike, *, condition: str, language: str) -> None:
     """Set a new conversation (e.g., after reset) and clear eval artifacts."""
-    st.session_state[CONVERSATION_HISTORY] = history
+    log = ConversationLog.coerce(history)
+    _backend().set_conversation(session_id(), log.as_messages(), condition=condition, language=language)
+    st.session_state[CONVERSATION_HISTORY] = log
     st.session_state[ACTIVE_CONDITION] = condition
     st.session_state[ACTIVE_LANGUAGE] = language
+    st.session_state[PATIENT_TURN_TIMINGS] = []
 
     st.session_state[TRAINEE_GRADE] = None
     st.session_state[TRAINEE_META] = None
@@ -70,11 +154,31 @@ def conversation_ready(min_turns: int = 2) -> bool:
     return len(history) >= min_turns
 
 
-def get_history() -> List[Dict[str, str]]:
-    return list(st.session_state.get(CONVERSATION_HISTORY) or [])
+def get_history() -> ConversationLog:
+    """The current conversation. Immutable, so it is returned without copying."""
+    return st.session_state.get(CONVERSATION_HISTORY) or ConversationLog()
 
 
 def append_message(role: str, content: str) -> None:
-    history = st.session_state.get(CONVERSATION_HISTORY) or []
-    history.append({"role": role, "content": content})
-    st.session_state[CONVERSATION_HISTORY] = history
+    _backend().append_message(session_id(), role, content)
+    st.session_state[CONVERSATION_HISTORY] = get_history().append(role, content)
+
+
+def record_turn_timing(timing: Dict[str, Any]) -> None:
+    """Append per-turn patient latency metrics (TTFT/total) for the current conversation."""
+    timings = st.session_state.get(PATIENT_TURN_TIMINGS) or []
+    timings.append(timing)
+    st.session_state[PATIENT_TURN_TIMINGS] = timings
+    _backend().set_artifact(session_id(), PATIENT_TURN_TIMINGS, timings)
+
+
+def save_trainee_result(*, grade: Any, meta: Any, scored: Any) -> None:
+    """Store the latest trainee evaluation (persisted with the conversation)."""
+    sid = session_id()
+    for key, value in ((TRAINEE_GRADE, grade), (TRAINEE_META, meta), (TRAINEE_SCORED, scored)):
+        st.session_state[key] = value
+        _backend().set_artifact(sid, key, value)
+
+
+def get_turn_timings() -> List[Dict[str, Any]]:
+    return list(st.session_state.get(PATIENT_TURN_TIMINGS) or [])
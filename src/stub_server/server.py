@@ -0,0 +1,370 @@
+"""src.stub_server.server
+
+Local OpenAI/Groq-compatible chat-completions stub for offline load testing.
+
+Speaks enough of the wire format for the groq/openai SDKs:
+  - POST .../chat/completions  (Groq: /openai/v1/chat/completions, OpenAI: /v1/chat/completions)
+  - non-streaming JSON and streaming SSE (`stream=true`, chunked, `data: [DONE]`)
+  - `response_format` json_schema (instance generated from the schema) and json_object
+    (judge requests get an output conforming to `build_judge_output_schema`)
+  - configurable latency / TTFT distributions, 5xx and 429 (+ retry-after) injection,
+    and models that reject json_schema with a 400
+
+Run:
+    python -m src.stub_server.server --port 8787 --latency lognormal:0.8,0.4 --ttft uniform:0.1,0.4 \\
+        --rate-limit-rate 0.02 --error-rate 0.01
+
+Point the app at it:
+    GROQ_BASE_URL=http://127.0.0.1:8787 GROQ_API_KEY=stub streamlit run app.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.trainee_judge.trainee_judge_schema import build_judge_output_schema
+from src.utils.tokens import estimate_messages_tokens, estimate_tokens
+
+
+# ----------------------------
+# Latency distributions
+# ----------------------------
+def parse_distribution(spec: str) -> Callable[[random.Random], float]:
+    """Parse `fixed:s`, `uniform:a,b`, `exp:mean`, `lognormal:median,sigma` (seconds)."""
+    kind, _, args = (spec or "fixed:0").partition(":")
+    vals = [float(x) for x in args.split(",") if x.strip()] if args else []
+    if kind == "fixed":
+        v = vals[0] if vals else 0.0
+        return lambda rng: v
+    if kind == "uniform":
+        a, b = vals
+        return lambda rng: rng.uniform(a, b)
+    if kind == "exp":
+        mean = vals[0]
+        return lambda rng: rng.expovariate(1.0 / mean) if mean > 0 else 0.0
+    if kind == "lognormal":
+        median, sigma = vals
+        mu = math.log(median) if median > 0 else 0.0
+        return lambda rng: rng.lognormvariate(mu, sigma)
+    raise ValueError(f"Unknown latency distribution: {spec!r}")
+
+
+@dataclass
+class StubConfig:
+    latency: str = "fixed:0.2"               # total (non-streaming) latency
+    ttft: str = "fixed:0.1"                  # time to first token when streaming
+    error_rate: float = 0.0                  # fraction of requests answered with 500
+    rate_limit_rate: float = 0.0             # fraction of requests answered with 429
+    retry_after_s: float = 1.0
+    no_json_schema_models: List[str] = field(default_factory=list)  # 400 on response_format=json_schema
+    stream_chunk_chars: int = 8
+    seed: Optional[int] = None
+
+
+# ----------------------------
+# Response content
+# ----------------------------
+_PATIENT_EN = [
+    "I've been feeling really low for a few months now.",
+    "I can't sleep well and I feel tired all the time.",
+    "I don't know.",
+    "It started after I lost my job.",
+    "Sometimes I feel like nothing will get better.",
+]
+_PATIENT_AR = [
+    "اشعر بالحزن منذ عدة اشهر.",
+    "لا استطيع النوم جيدا واشعر بالتعب طوال الوقت.",
+    "لا اعرف.",
+    "بدأ ذلك بعد ان فقدت عملي.",
+]
+
+
+def instance_from_schema(schema: Dict[str, Any], rng: random.Random, *, hints: Optional[Dict[str, Any]] = None) -> Any:
+    """Generate a value conforming to the (subset of) JSON Schema our app emits."""
+    hints = hints or {}
+    t = schema.get("type")
+    if isinstance(t, list):
+        t = next((x for x in t if x != "null"), "null")
+    if "enum" in schema:
+        return rng.choice(schema["enum"])
+    if t == "object":
+        props = schema.get("properties") or {}
+        keys = list(schema.get("required") or props.keys())
+        return {k: hints[k] if k in hints else instance_from_schema(props.get(k, {}), rng) for k in keys}
+    if t == "array":
+        lo = int(schema.get("minItems", 0))
+        n = max(lo, rng.randint(0, 2))
+        return [instance_from_schema(schema.get("items") or {}, rng) for _ in range(n)]
+    if t == "boolean":
+        return rng.random() < 0.5
+    if t == "integer":
+        lo = int(schema.get("minimum", 1))
+        return rng.randint(lo, lo + 9)
+    if t == "number":
+        lo, hi = float(schema.get("minimum", 0.0)), float(schema.get("maximum", 1.0))
+        return round(rng.uniform(lo, hi), 3)
+    if t == "string":
+        return "stub"
+    if t == "null":
+        return None
+    return {}
+
+
+def _judge_payload(messages: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Return the judge's JSON user payload (has a `rubric`), if this looks like a judge request."""
+    for m in messages:
+        if m.get("role") != "user":
+            continue
+        try:
+            # raw_decode: compact judge prompts put transcript lines after the JSON header.
+            payload, _ = json.JSONDecoder().raw_decode(m.get("content") or "")
+        except (TypeError, ValueError):
+            continue
+        if isinstance(payload, dict) and isinstance(payload.get("rubric"), dict):
+            return payload
+    return None
+
+
+def build_content(body: Dict[str, Any], rng: random.Random) -> str:
+    messages = body.get("messages") or []
+    rf = body.get("response_format") or {}
+    judge = _judge_payload(messages)
+    hints: Dict[str, Any] = {}
+    if judge:
+        rb = judge["rubric"]
+        hints = {
+            "rubric_id": rb.get("rubric_id", ""),
+            "rubric_version": rb.get("rubric_version", ""),
+            "rubric_fingerprint": rb.get("rubric_fingerprint", ""),
+        }
+
+    if rf.get("type") == "json_schema":
+        schema = (rf.get("json_schema") or {}).get("schema") or {}
+        return json.dumps(instance_from_schema(schema, rng, hints=hints), ensure_ascii=False)
+    if rf.get("type") == "json_object":
+        if judge and judge["rubric"].get("items"):
+            schema = build_judge_output_schema(judge["rubric"])
+            return json.dumps(instance_from_schema(schema, rng, hints=hints), ensure_ascii=False)
+        return json.dumps({"result": "stub"})
+
+    system = " ".join(m.get("content") or "" for m in messages if m.get("role") == "system")
+    return rng.choice(_PATIENT_AR if "respond in Arabic" in system else _PATIENT_EN)
+
+
+# ----------------------------
+# HTTP handler
+# ----------------------------
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "StubServer"
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+    def _send_json(self, status: int, obj: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        payload = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _error(self, status: int, message: str, err_type: str, headers: Optional[Dict[str, str]] = None) -> None:
+        self._send_json(status, {"error": {"message": message, "type": err_type, "code": err_type}}, headers)
+
+    def do_GET(self) -> None:  # noqa: N802
+        self._send_json(200, {"status": "ok", "stats": self.server.stats_snapshot()})
+
+    def do_POST(self) -> None:  # noqa: N802
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._error(400, "Invalid JSON body.", "invalid_request_error")
+            return
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._error(404, f"Unknown path: {self.path}", "not_found")
+            return
+
+        cfg = self.server.config
+        rng = self.server.rng_for(body)
+        # Faults and latency come from the server RNG so seeded requests are faulted like any other.
+        timing_rng = self.server.request_rng()
+        self.server.count("requests")
+
+        roll = timing_rng.random()
+        if roll < cfg.rate_limit_rate:
+            self.server.count("rate_limited")
+            self._error(429, "Rate limit reached (stub).", "rate_limit_exceeded", {"retry-after": str(cfg.retry_after_s)})
+            return
+        if roll < cfg.rate_limit_rate + cfg.error_rate:
+            self.server.count("errors")
+            self._error(500, "Injected server error (stub).", "internal_server_error")
+            return
+        rf = body.get("response_format") or {}
+        if rf.get("type") == "json_schema" and body.get("model") in cfg.no_json_schema_models:
+            self.server.count("schema_rejected")
+            self._error(400, "response_format json_schema is not supported with this model", "invalid_request_error")
+            return
+
+        content = build_content(body, rng)
+        usage = {
+            "prompt_tokens": estimate_messages_tokens(body.get("messages") or []),
+            "completion_tokens": estimate_tokens(content),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+        if body.get("stream"):
+            self._stream(body, content, usage, timing_rng)
+        else:
+            time.sleep(max(0.0, self.server.latency(timing_rng)))
+            self._send_json(
+                200,
+                {
+                    "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "stub"),
+                    "system_fingerprint": "fp_stub",
+                    "choices": [
+                        {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+                    ],
+                    "usage": usage,
+                },
+            )
+
+    def _stream(self, body: Dict[str, Any], content: str, usage: Dict[str, int], rng: random.Random) -> None:
+        ttft = max(0.0, self.server.ttft(rng))
+        total = max(ttft, self.server.latency(rng))
+        size = max(1, self.server.config.stream_chunk_chars)
+        pieces = [content[i : i + size] for i in range(0, len(content), size)] or [""]
+        gap = (total - ttft) / max(1, len(pieces))
+        cid = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        model = body.get("model", "stub")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def emit(obj: Any) -> None:
+            data = ("data: " + (obj if isinstance(obj, str) else json.dumps(obj, ensure_ascii=False)) + "\n\n").encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        def chunk(delta: Dict[str, Any], finish: Optional[str] = None, extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+            out = {
+                "id": cid,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+            }
+            out.update(extra or {})
+            return out
+
+        try:
+            time.sleep(ttft)
+            emit(chunk({"role": "assistant", "content": ""}))
+            for i, piece in enumerate(pieces):
+                if i:
+                    time.sleep(gap)
+                emit(chunk({"content": piece}))
+            emit(chunk({}, "stop", {"x_groq": {"id": cid, "usage": usage}, "usage": usage}))
+            emit("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            self.server.count("client_aborts")
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], config: StubConfig) -> None:
+        super().__init__(address, StubHandler)
+        self.config = config
+        self.latency = parse_distribution(config.latency)
+        self.ttft = parse_distribution(config.ttft)
+        self._rng = random.Random(config.seed)
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {}
+
+    def request_rng(self) -> random.Random:
+        """Per-request RNG drawn from the server RNG (fault injection, latency)."""
+        with self._lock:
+            return random.Random(self._rng.random())
+
+    def rng_for(self, body: Dict[str, Any]) -> random.Random:
+        # Honor the request seed for reproducible judge outputs (content only); otherwise draw from the server RNG.
+        if body.get("seed") is not None:
+            return random.Random(int(body["seed"]))
+        return self.request_rng()
+
+    def count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] = self._stats.get(key, 0) + 1
+
+    def stats_snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_stub_server(config: StubConfig = StubConfig(), *, host: str = "127.0.0.1", port: int = 0) -> StubServer:
+    """Start in a daemon thread; call `.shutdown()` when done. `port=0` picks a free port."""
+    server = StubServer((host, port), config)
+    threading.Thread(target=server.serve_forever, name="stub-llm-server", daemon=True).start()
+    return server
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8787)
+    ap.add_argument("--latency", default=StubConfig.latency)
+    ap.add_argument("--ttft", default=StubConfig.ttft)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--rate-limit-rate", type=float, default=0.0)
+    ap.add_argument("--retry-after", type=float, default=1.0)
+    ap.add_argument("--no-json-schema-model", action="append", default=[], help="Reject json_schema for this model (repeatable).")
+    ap.add_argument("--seed", type=int, default=None)
+    args = ap.parse_args()
+
+    config = StubConfig(
+        latency=args.latency,
+        ttft=args.ttft,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after_s=args.retry_after,
+        no_json_schema_models=args.no_json_schema_model,
+        seed=args.seed,
+    )
+    server = StubServer((args.host, args.port), config)
+    print(f"Stub LLM server on {server.base_url} (set GROQ_BASE_URL to this)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
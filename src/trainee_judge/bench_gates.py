@@ -0,0 +1,139 @@
+"""
+bench_gates.py
+
+Micro-benchmark: gate evaluation cost vs number of gated rubric items.
+
+Builds synthetic rubrics with N gated items and scores judge output for transcripts of
+T turns, comparing:
+
+  - per_item: the previous scorer behaviour, where every gated item re-normalized and
+    re-joined all patient turns and re-ran the risk regexes;
+  - engine:   gates.py, with transcript features computed once and each gate evaluated
+    once per transcript (cold: a new transcript every call; warm: memo hit);
+  - engine_mixed: the engine with items spread over several rubric-declared gates.
+
+Each timed call uses a transcript that differs from the previous one, so "cold" numbers
+include feature extraction and regex matching.
+
+    python -m src.trainee_judge.bench_gates
+    python -m src.trainee_judge.bench_gates --items 10 100 500 --turns 60 --repeat 30
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from src.state.conversation import ConversationLog
+
+from .compiled_rubric import compile_rubric, risk_patterns_for
+from .gates import evaluate_gates
+from .trainee_score import any_match, normalize
+
+_PATIENT = [
+    "I've been feeling low for months and I can't sleep.",
+    "Work is hard, I stopped going last week and I drink more than before.",
+    "Sometimes I think everyone would be better off without me.",
+    "أشعر بالتعب ولا أستطيع التركيز في العمل.",
+]
+_TRAINEE = [
+    "Can you tell me more about how this started?",
+    "How has this affected your work and family?",
+    "Do you drink alcohol or use any drugs?",
+    "Have you had thoughts of ending your life?",
+]
+
+_DECLARED_GATES = {
+    "substance_disclosed": {"predicate": "patient_matches", "patterns_en": [r"\b(drink|alcohol|drugs?)\b"], "patterns_ar": ["(كحول|مخدرات)"]},
+    "asked_substance": {"predicate": "trainee_matches", "patterns_en": [r"\b(alcohol|drugs?)\b"], "patterns_ar": ["(كحول|مخدرات)"]},
+    "long_interview": {"predicate": "min_turns", "role": "trainee", "turns": 10},
+    "risk_or_substance": {"predicate": "any_of", "gates": ["patient_risk_positive", "substance_disclosed"]},
+}
+
+
+def _rubric(n_items: int, *, mixed: bool) -> Dict[str, Any]:
+    names = ["patient_risk_positive"] + (list(_DECLARED_GATES) if mixed else [])
+    rb: Dict[str, Any] = {
+        "rubric_id": f"bench_gates_{n_items}{'_mixed' if mixed else ''}",
+        "version": "1",
+        "items": [
+            {"id": f"item_{i}", "desc": f"Item {i}", "weight": 1.0, "gate": names[i % len(names)], "patterns_en": [r"\bx\b"]}
+            for i in range(n_items)
+        ],
+        "pass_criteria": {"min_percent": 0.7},
+    }
+    if mixed:
+        rb["gates"] = _DECLARED_GATES
+    return rb
+
+
+def _transcripts(turns: int, count: int) -> List[ConversationLog]:
+    out = []
+    for k in range(count):
+        msgs = []
+        for t in range(turns // 2):
+            msgs.append({"role": "user", "content": f"{_TRAINEE[t % len(_TRAINEE)]} ({k})"})
+            msgs.append({"role": "assistant", "content": _PATIENT[t % len(_PATIENT)]})
+        out.append(ConversationLog.coerce(msgs))
+    return out
+
+
+def _per_item(log: ConversationLog, rb: Dict[str, Any], language: str) -> int:
+    """The pre-engine cost model: one full patient-text normalize + regex pass per gated item."""
+    active = 0
+    for it in rb["items"]:
+        if it.get("gate") == "patient_risk_positive":
+            text = " ".join(normalize(m.get("content", "")) for m in log.as_messages() if m.get("role") == "assistant")
+            active += any_match(risk_patterns_for(rb, language), text)
+        else:
+            active += 1
+    return active
+
+
+def _engine(log: ConversationLog, rb: Dict[str, Any], language: str) -> int:
+    gates = evaluate_gates(log, rb, language)
+    return sum(gates.active(it.get("gate")) for it in rb["items"])
+
+
+def _time(fn: Callable[[ConversationLog], Any], logs: List[ConversationLog]) -> Dict[str, float]:
+    samples = []
+    for log in logs:
+        t0 = time.perf_counter()
+        fn(log)
+        samples.append((time.perf_counter() - t0) * 1000)
+    return {"p50_ms": round(statistics.median(samples), 4), "mean_ms": round(statistics.fmean(samples), 4)}
+
+
+def run(items: List[int], turns: int, repeat: int, language: str = "English") -> Dict[str, Any]:
+    report: Dict[str, Any] = {"turns": turns, "repeat": repeat, "language": language, "by_items": {}}
+    for n in items:
+        rb = compile_rubric(_rubric(n, mixed=False))
+        rb_mixed = compile_rubric(_rubric(n, mixed=True))
+        row = {
+            "per_item": _time(lambda log: _per_item(log, rb, language), _transcripts(turns, repeat)),
+            "engine_cold": _time(lambda log: _engine(log, rb, language), _transcripts(turns, repeat)),
+        }
+        warm = _transcripts(turns, 1) * repeat
+        _engine(warm[0], rb, language)
+        row["engine_warm"] = _time(lambda log: _engine(log, rb, language), warm)
+        row["engine_mixed_cold"] = _time(lambda log: _engine(log, rb_mixed, language), _transcripts(turns, repeat))
+        row["speedup_p50"] = round(row["per_item"]["p50_ms"] / max(row["engine_cold"]["p50_ms"], 1e-9), 1)
+        report["by_items"][n] = row
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--items", type=int, nargs="+", default=[10, 100, 500])
+    ap.add_argument("--turns", type=int, default=40)
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--language", default="English", choices=["English", "Arabic"])
+    args = ap.parse_args(argv)
+    print(json.dumps(run(args.items, args.turns, args.repeat, args.language), indent=2))
+
+
+if __name__ == "__main__":
+    main()
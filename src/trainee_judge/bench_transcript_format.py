@@ -0,0 +1,206 @@
+"""
+bench_transcript_format.py
+
+Measures the compact judge transcript encoding against the default JSON one.
+
+For every transcript in a sample set it builds the judge prompt in both formats and
+reports input-token savings (estimated with `src.utils.tokens`, split by language). With
+`--judge` it also grades each transcript in both formats and reports the provider's
+prompt_tokens and grade agreement: per-item achieved agreement and Cohen's kappa,
+pass/fail agreement, and mean |percent difference| of the deterministic score.
+
+    python -m src.trainee_judge.bench_transcript_format --in data/selfplay.jsonl --limit 50
+    python -m src.trainee_judge.bench_transcript_format --in data/selfplay.jsonl --judge --limit 20
+    python -m src.trainee_judge.bench_transcript_format --demo --judge --stub   # offline plumbing check
+
+Judge calls bypass the judge cache (they call `judge_turns_with_groq` directly).
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.state.conversation import ConversationLog
+from src.utils.tokens import estimate_messages_tokens
+
+from .trainee_judge_groq import GroqJudgeConfig, build_messages, judge_turns_with_groq
+from .trainee_judge_schema import DEFAULT_RUBRIC_PATH, load_rubric
+from .trainee_score import score_from_judge_output
+
+_DEMO = [
+    (
+        "English",
+        [
+            ("user", "Hello, I'm Dr. Lee. What brings you in today?"),
+            ("assistant", "I've been feeling really low for a few months and I can't sleep properly anymore."),
+            ("user", "I'm sorry to hear that. Can you tell me more about how this has affected your work and family?"),
+            ("assistant", "I stopped going to work two weeks ago. Sometimes I think everyone would be better off without me."),
+            ("user", "Have you had thoughts of ending your life? Do you have a plan?"),
+            ("assistant", "Sometimes, but I don't have a plan."),
+        ],
+    ),
+    (
+        "Arabic",
+        [
+            ("user", "مرحبا، أنا الدكتورة سارة. ما الذي أتى بك اليوم؟"),
+            ("assistant", "أشعر بالحزن منذ عدة أشهر ولا أستطيع النوم جيدا."),
+            ("user", "أنا آسفة لسماع ذلك. هل فكرت في إيذاء نفسك أو الانتحار؟"),
+            ("assistant", "أحيانا أفكر في الانتحار لكن ليس لدي خطة."),
+            ("user", "شكرا لمشاركتك. سألخص ما قلته ونتفق على الخطوات التالية."),
+            ("assistant", "حسنا."),
+        ],
+    ),
+]
+
+
+def _load_samples(path: Optional[str], limit: int) -> List[Dict[str, Any]]:
+    if path is None:
+        return [
+            {"id": f"demo-{i}", "language": lang, "condition": "depression", "conversation": [{"role": r, "content": c} for r, c in turns]}
+            for i, (lang, turns) in enumerate(_DEMO)
+        ]
+    from src.evaluation.trainee.batch import read_items
+
+    return [
+        {"id": it.item_id, "language": it.language, "condition": it.condition, "conversation": it.conversation}
+        for it in list(read_items(Path(path)))[:limit]
+    ]
+
+
+def _kappa(pairs: List[Tuple[bool, bool]]) -> Optional[float]:
+    n = len(pairs)
+    if not n:
+        return None
+    observed = sum(a == b for a, b in pairs) / n
+    pa = sum(a for a, _ in pairs) / n
+    pb = sum(b for _, b in pairs) / n
+    expected = pa * pb + (1 - pa) * (1 - pb)
+    return round((observed - expected) / (1 - expected), 3) if expected < 1 else 1.0
+
+
+def measure_tokens(samples: List[Dict[str, Any]], rubric: Dict[str, Any], config: GroqJudgeConfig) -> Dict[str, Any]:
+    by_lang: Dict[str, Dict[str, List[int]]] = {}
+    for s in samples:
+        turns = ConversationLog.coerce(s["conversation"]).numbered_turns()
+        row = by_lang.setdefault(s["language"], {"json": [], "compact": []})
+        for fmt in ("json", "compact"):
+            messages = build_messages(
+                rubric,
+                turns,
+                language=s["language"],
+                condition=s["condition"],
+                transcript_format=fmt,
+                max_patient_turn_chars=config.max_patient_turn_chars if fmt == "compact" else None,
+            )
+            row[fmt].append(estimate_messages_tokens(messages))
+
+    def summary(j: List[int], c: List[int]) -> Dict[str, Any]:
+        return {
+            "samples": len(j),
+            "json_tokens_mean": round(statistics.fmean(j), 1) if j else None,
+            "compact_tokens_mean": round(statistics.fmean(c), 1) if c else None,
+            "savings_pct": round(100 * (1 - sum(c) / sum(j)), 1) if sum(j) else None,
+        }
+
+    all_j = [x for r in by_lang.values() for x in r["json"]]
+    all_c = [x for r in by_lang.values() for x in r["compact"]]
+    return {"overall": summary(all_j, all_c), "by_language": {k: summary(v["json"], v["compact"]) for k, v in by_lang.items()}}
+
+
+def measure_agreement(
+    samples: List[Dict[str, Any]], rubric: Dict[str, Any], config: GroqJudgeConfig, *, concurrency: int = 4
+) -> Dict[str, Any]:
+    json_cfg = replace(config, transcript_format="json", max_patient_turn_chars=None)
+    compact_cfg = replace(config, transcript_format="compact")
+
+    def run(s: Dict[str, Any]) -> Dict[str, Any]:
+        log = ConversationLog.coerce(s["conversation"])
+        out: Dict[str, Any] = {"id": s["id"]}
+        for name, cfg in (("json", json_cfg), ("compact", compact_cfg)):
+            grade, meta = judge_turns_with_groq(log.numbered_turns(), rubric, language=s["language"], condition=s["condition"], config=cfg)
+            usage = meta.get("usage")
+            out[name] = {
+                "scored": score_from_judge_output(log, rubric, s["language"], grade),
+                "prompt_tokens": getattr(usage, "prompt_tokens", None) if not isinstance(usage, dict) else usage.get("prompt_tokens"),
+            }
+        return out
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        results = list(pool.map(run, samples))
+
+    item_pairs: List[Tuple[bool, bool]] = []
+    pass_agree, pct_diffs, prompt = [], [], {"json": [], "compact": []}
+    for r in results:
+        j, c = r["json"]["scored"], r["compact"]["scored"]
+        cj = {x["id"]: x for x in c["items"]}
+        item_pairs += [(bool(x["achieved"]), bool(cj[x["id"]]["achieved"])) for x in j["items"]]
+        pass_agree.append(j["pass"] == c["pass"])
+        pct_diffs.append(abs(float(j["percent"]) - float(c["percent"])))
+        for fmt in prompt:
+            if r[fmt]["prompt_tokens"] is not None:
+                prompt[fmt].append(int(r[fmt]["prompt_tokens"]))
+
+    return {
+        "samples": len(results),
+        "item_agreement": round(sum(a == b for a, b in item_pairs) / len(item_pairs), 3) if item_pairs else None,
+        "item_kappa": _kappa(item_pairs),
+        "pass_agreement": round(sum(pass_agree) / len(pass_agree), 3) if pass_agree else None,
+        "mean_abs_percent_diff": round(statistics.fmean(pct_diffs), 4) if pct_diffs else None,
+        "prompt_tokens_json": sum(prompt["json"]) or None,
+        "prompt_tokens_compact": sum(prompt["compact"]) or None,
+        "prompt_savings_pct": (
+            round(100 * (1 - sum(prompt["compact"]) / sum(prompt["json"])), 1) if sum(prompt["json"]) else None
+        ),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--in", dest="inp", help="JSONL of transcripts (self-play output / judge_many input).")
+    src.add_argument("--demo", action="store_true", help="Use two built-in transcripts (English + Arabic).")
+    ap.add_argument("--rubric", default=str(DEFAULT_RUBRIC_PATH))
+    ap.add_argument("--limit", type=int, default=50)
+    ap.add_argument("--max-patient-turn-chars", type=int, default=None, help="Truncation applied in compact mode.")
+    ap.add_argument("--judge", action="store_true", help="Also grade in both formats and report agreement.")
+    ap.add_argument("--model", default=GroqJudgeConfig.model)
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--base-url", default=None)
+    ap.add_argument("--stub", action="store_true", help="Judge against a built-in stub server (plumbing check only).")
+    args = ap.parse_args(argv)
+
+    from src.utils.env import load_env
+
+    load_env()
+
+    rubric = load_rubric(args.rubric)
+    samples = _load_samples(None if args.demo else args.inp, args.limit)
+    config = GroqJudgeConfig(model=args.model, base_url=args.base_url, max_patient_turn_chars=args.max_patient_turn_chars)
+    report: Dict[str, Any] = {"estimated_input_tokens": measure_tokens(samples, rubric, config)}
+
+    if args.judge:
+        server = None
+        if args.stub:
+            import os
+
+            from src.stub_server.server import StubConfig, start_stub_server
+
+            server = start_stub_server(StubConfig(latency="fixed:0.05"))
+            os.environ.setdefault("GROQ_API_KEY", "stub")
+            config = replace(config, base_url=server.base_url)
+        try:
+            report["agreement"] = measure_agreement(samples, rubric, config, concurrency=args.concurrency)
+        finally:
+            if server is not None:
+                server.shutdown()
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
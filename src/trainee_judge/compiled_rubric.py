@@ -0,0 +1,199 @@
+"""
+compiled_rubric.py
+
+A rubric processed once per version instead of on every judge/score call.
+
+`CompiledRubric` is a read-only `dict` subclass holding the rubric JSON, so it drops
+in wherever a rubric dict is accepted (`.get`, `{**rb, ...}`, `json.dumps`, Streamlit
+session state). On top it precomputes:
+
+  - `fingerprint` (the SHA-256 `rubric_fingerprint` would recompute per call)
+  - `item_ids` / `item_index` (validated once)
+  - `judge_payload` (the minimized rubric sent to the judge) and
+    `response_format(strict)` (the Structured Outputs schema), built on first use
+  - `gates` (item id -> gate) and compiled regexes for item patterns and patient
+    risk cues, per language
+  - `gate_engine` (gates.py): gate definitions compiled once, results memoized per
+    transcript
+
+Caching:
+  - `load_compiled_rubric(path)`: process-wide, keyed by resolved path + mtime + size,
+    so an examiner editing the file is picked up on the next call.
+  - `compile_rubric(rubric)`: accepts a dict (or an already compiled rubric) and caches
+    by fingerprint, which also covers sub-rubrics built for shards/incremental calls.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Pattern, Tuple
+
+# Default patient risk cues (used when rubric.patient_cues.risk_positive is absent).
+DEFAULT_PATIENT_RISK_CUES = {
+    "patterns_en": [r"\b(suicid|kill myself|end my life|self[- ]harm|hurt myself)\b"],
+    "patterns_ar": [r"(انتحار|اقتل نفسي|انهي حياتي|ايذاء النفس|اؤذي نفسي)"],
+}
+
+
+def patterns_for_language(obj: Mapping[str, Any], language: str) -> List[str]:
+    """Patterns for a language, falling back to the other language's list."""
+    if language == "Arabic":
+        return (obj.get("patterns_ar") or []) or (obj.get("patterns_en") or [])
+    return (obj.get("patterns_en") or []) or (obj.get("patterns_ar") or [])
+
+
+def _compile(patterns: List[str]) -> Tuple[Pattern[str], ...]:
+    return tuple(re.compile(p, re.IGNORECASE) for p in patterns)
+
+
+def _readonly(self: Any, *args: Any, **kwargs: Any) -> None:
+    raise TypeError("CompiledRubric is read-only; build a new rubric dict and compile it instead.")
+
+
+class CompiledRubric(dict):
+    """Read-only rubric dict with precomputed derived data (see module docstring)."""
+
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly  # type: ignore[assignment]
+
+    def __init__(self, rubric: Mapping[str, Any], *, source: Optional[str] = None, fingerprint: Optional[str] = None) -> None:
+        from .trainee_judge_schema import _item_ids  # validates ids (non-empty, unique)
+
+        dict.__init__(self, rubric)
+        self.source = source
+        self.fingerprint = fingerprint or _fingerprint(rubric)
+        self.item_ids: Tuple[str, ...] = tuple(_item_ids(rubric))
+        self.item_index: Dict[str, Dict[str, Any]] = {str(it["id"]).strip(): it for it in rubric["items"]}
+        self.gates: Dict[str, str] = {i: it["gate"] for i, it in self.item_index.items() if it.get("gate")}
+        self._lock = threading.Lock()
+        self._judge_payload: Optional[Dict[str, Any]] = None
+        self._response_formats: Dict[Tuple[str, bool], Dict[str, Any]] = {}
+        self._item_patterns: Dict[Tuple[str, str], Tuple[Pattern[str], ...]] = {}
+        self._risk_patterns: Dict[str, Tuple[Pattern[str], ...]] = {}
+        self._gate_engine: Optional[Any] = None
+
+    # Immutable: copies are the object itself; pickling rebuilds it from the JSON.
+    def __copy__(self) -> "CompiledRubric":
+        return self
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> "CompiledRubric":
+        return self
+
+    def __reduce__(self):
+        return (CompiledRubric, (dict(self),), {"source": self.source})
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.source = state.get("source")
+
+    def gated_items(self, gate: str) -> List[str]:
+        return [i for i, g in self.gates.items() if g == gate]
+
+    @property
+    def gate_engine(self) -> Any:
+        """`gates.GateEngine` for this rubric (built on first use)."""
+        if self._gate_engine is None:
+            from .gates import GateEngine
+
+            with self._lock:
+                if self._gate_engine is None:
+                    self._gate_engine = GateEngine(self)
+        return self._gate_engine
+
+    @property
+    def judge_payload(self) -> Dict[str, Any]:
+        """Minimized rubric for the judge prompt (shared; do not mutate)."""
+        if self._judge_payload is None:
+            from .trainee_judge_groq import _minimize_rubric
+
+            self._judge_payload = _minimize_rubric(self)
+        return self._judge_payload
+
+    def response_format(self, *, name: str = "trainee_rubric_grade", strict: bool = True) -> Dict[str, Any]:
+        """Structured Outputs payload (shared; do not mutate)."""
+        key = (name, bool(strict))
+        rf = self._response_formats.get(key)
+        if rf is None:
+            from .trainee_judge_schema import _build_response_format
+
+            with self._lock:
+                rf = self._response_formats.setdefault(key, _build_response_format(self, name=name, strict=strict))
+        return rf
+
+    def item_patterns(self, item_id: str, language: str) -> Tuple[Pattern[str], ...]:
+        key = (item_id, language)
+        pats = self._item_patterns.get(key)
+        if pats is None:
+            pats = _compile(patterns_for_language(self.item_index[item_id], language))
+            self._item_patterns[key] = pats
+        return pats
+
+    def risk_patterns(self, language: str) -> Tuple[Pattern[str], ...]:
+        pats = self._risk_patterns.get(language)
+        if pats is None:
+            cues = (self.get("patient_cues") or {}).get("risk_positive", DEFAULT_PATIENT_RISK_CUES)
+            pats = _compile(patterns_for_language(cues, language))
+            self._risk_patterns[language] = pats
+        return pats
+
+
+def _fingerprint(rubric: Mapping[str, Any]) -> str:
+    from .trainee_judge_schema import _raw_fingerprint
+
+    return _raw_fingerprint(rubric)
+
+
+# ----------------------------
+# Process-wide caches
+# ----------------------------
+_lock = threading.Lock()
+_by_path: Dict[str, Tuple[int, int, CompiledRubric]] = {}
+_by_fingerprint: "OrderedDict[str, CompiledRubric]" = OrderedDict()
+_MAX_BY_FINGERPRINT = 64
+
+
+def load_compiled_rubric(rubric_path: str | Path) -> CompiledRubric:
+    """Load + compile a rubric file; reused until the file's mtime/size changes."""
+    path = Path(rubric_path)
+    if not path.exists():
+        raise FileNotFoundError(f"Rubric not found: {path}")
+    key = str(path.resolve())
+    st = path.stat()
+    with _lock:
+        hit = _by_path.get(key)
+    if hit is not None and hit[0] == st.st_mtime_ns and hit[1] == st.st_size:
+        return hit[2]
+    with path.open("r", encoding="utf-8") as f:
+        compiled = CompiledRubric(json.load(f), source=key)
+    with _lock:
+        _by_path[key] = (st.st_mtime_ns, st.st_size, compiled)
+    return compiled
+
+
+def compile_rubric(rubric: Mapping[str, Any]) -> CompiledRubric:
+    """Compiled view of a rubric dict (cached by fingerprint); compiled input is returned as-is."""
+    if isinstance(rubric, CompiledRubric):
+        return rubric
+    fp = _fingerprint(rubric)
+    with _lock:
+        hit = _by_fingerprint.get(fp)
+        if hit is not None:
+            _by_fingerprint.move_to_end(fp)
+            return hit
+    compiled = CompiledRubric(rubric, fingerprint=fp)
+    with _lock:
+        _by_fingerprint[fp] = compiled
+        while len(_by_fingerprint) > _MAX_BY_FINGERPRINT:
+            _by_fingerprint.popitem(last=False)
+    return compiled
+
+
+def risk_patterns_for(rubric: Optional[Mapping[str, Any]], language: str) -> Tuple[Pattern[str], ...]:
+    """Compiled patient risk-cue patterns; tolerates a missing/empty rubric (defaults)."""
+    if isinstance(rubric, CompiledRubric) or (rubric and rubric.get("items")):
+        return compile_rubric(rubric).risk_patterns(language)
+    cues = (rubric or {}).get("patient_cues", {}).get("risk_positive", DEFAULT_PATIENT_RISK_CUES)
+    return _compile(patterns_for_language(cues, language))
@@ -0,0 +1,182 @@
+"""
+ensemble_judge.py
+
+Adaptive self-consistency ensemble for the trainee judge.
+
+With `GroqJudgeConfig.ensemble_size = N > 1`, up to N judge samples are drawn (seed
+offset per sample; models cycled from `ensemble_models` when set; optional
+`ensemble_temperature` for more diversity than temperature 0 gives), and:
+
+  - `ensemble_concurrency` samples start at once; each finished sample may launch the next;
+  - item_results are aggregated by majority vote (ties -> achieved=false, matching the
+    judge's "unclear means not achieved" rule), averaging the confidence and unioning the
+    evidence turns of the samples that agree with the majority;
+  - early stopping: once every item's outcome can no longer change, whatever the
+    outstanding samples say (|yes - no| exceeds the samples still possible), no further
+    samples are launched and the result is returned without waiting for in-flight ones.
+
+meta["ensemble"] reports votes and agreement per item, calls launched/completed/failed
+and `calls_saved` versus a fixed-N ensemble.
+"""
+
+from __future__ import annotations
+
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import replace
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from src.utils.tokens import sum_usage
+
+from .compiled_rubric import compile_rubric
+from .sharded_judge import is_partial
+from .trainee_judge_groq import GroqJudgeConfig
+
+SampleFn = Callable[..., Tuple[Dict[str, Any], Dict[str, Any]]]
+
+_SEED_STRIDE = 7919  # distinct, reproducible per-sample seeds
+
+
+def sample_config(config: GroqJudgeConfig, index: int) -> GroqJudgeConfig:
+    models = config.ensemble_models or (config.model,)
+    return replace(
+        config,
+        ensemble_size=1,
+        model=models[index % len(models)],
+        seed=None if config.seed is None else config.seed + index * _SEED_STRIDE,
+        temperature=config.temperature if config.ensemble_temperature is None else config.ensemble_temperature,
+    )
+
+
+def _votes(grades: List[Dict[str, Any]], item_ids: List[str]) -> Dict[str, Tuple[int, int]]:
+    out: Dict[str, Tuple[int, int]] = {}
+    for i in item_ids:
+        yes = sum(1 for g in grades if ((g.get("item_results") or {}).get(i) or {}).get("achieved"))
+        out[i] = (yes, len(grades) - yes)
+    return out
+
+
+def undecided_items(votes: Dict[str, Tuple[int, int]], remaining: int) -> Set[str]:
+    """Items whose majority could still flip if all `remaining` samples voted against it."""
+    return {i for i, (yes, no) in votes.items() if not (yes > no + remaining or yes + remaining <= no)}
+
+
+def aggregate(grades: List[Dict[str, Any]], rubric: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Majority-vote grade + per-item vote stats."""
+    rb = compile_rubric(rubric)
+    item_ids = list(rb.item_ids)
+    results: Dict[str, Any] = {}
+    stats: Dict[str, Any] = {}
+    for i, (yes, no) in _votes(grades, item_ids).items():
+        achieved = yes > no
+        agreeing = [
+            r for r in (((g.get("item_results") or {}).get(i)) or {} for g in grades) if bool(r.get("achieved")) == achieved
+        ]
+        best = max(agreeing, key=lambda r: float(r.get("confidence", 0.0) or 0.0), default={})
+        results[i] = {
+            "achieved": achieved,
+            "confidence": round(sum(float(r.get("confidence", 0.0) or 0.0) for r in agreeing) / len(agreeing), 3) if agreeing else 0.0,
+            "evidence_turns": sorted({t for r in agreeing for t in r.get("evidence_turns") or []}),
+            "rationale": str(best.get("rationale", "") or ""),
+        }
+        stats[i] = {"yes": yes, "no": no, "agreement": round(max(yes, no) / max(1, yes + no), 3)}
+
+    flags: List[Dict[str, Any]] = []
+    seen: Set[Tuple[Any, Any, Any]] = set()
+    for g in grades:
+        for f in g.get("flags") or []:
+            sig = (f.get("type"), f.get("item_id"), f.get("message"))
+            if sig in seen or (results.get(f.get("item_id")) or {}).get("achieved"):
+                continue
+            seen.add(sig)
+            flags.append(f)
+
+    grade = {
+        "rubric_id": rb.get("rubric_id", ""),
+        "rubric_version": rb.get("version", ""),
+        "rubric_fingerprint": rb.fingerprint,
+        "item_results": results,
+        "flags": flags,
+        "summary_feedback": list(grades[0].get("summary_feedback") or []) if grades else [],
+    }
+    return grade, stats
+
+
+def judge_ensemble(
+    turns: List[Dict[str, Any]],
+    rb: Dict[str, Any],
+    *,
+    language: str,
+    condition: Optional[str] = None,
+    config: GroqJudgeConfig = GroqJudgeConfig(),
+    extra_instructions: Optional[Dict[str, str]] = None,
+    sample_fn: SampleFn,
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    rb = compile_rubric(rb)
+    item_ids = list(rb.item_ids)
+    n_max = max(1, config.ensemble_size)
+    lock = threading.Lock()
+    grades: List[Dict[str, Any]] = []
+    metas: List[Dict[str, Any]] = []
+    errors: List[BaseException] = []
+    launched = 0
+    early_stopped = False
+
+    pool = ThreadPoolExecutor(max_workers=max(1, min(n_max, config.ensemble_concurrency)), thread_name_prefix="judge-ensemble")
+    in_flight: Set[Future] = set()
+
+    def launch() -> None:
+        nonlocal launched
+        cfg = sample_config(config, launched)
+        launched += 1
+        in_flight.add(
+            pool.submit(sample_fn, turns, rb, language=language, condition=condition, config=cfg, extra_instructions=extra_instructions)
+        )
+
+    try:
+        for _ in range(min(n_max, config.ensemble_concurrency)):
+            launch()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for fut in done:
+                in_flight.discard(fut)
+                try:
+                    grade, meta = fut.result()
+                    with lock:
+                        grades.append(grade)
+                        metas.append(meta)
+                except Exception as e:  # a failed sample just doesn't vote
+                    errors.append(e)
+            remaining = n_max - len(grades) - len(errors)
+            if config.ensemble_early_stop and grades and not undecided_items(_votes(grades, item_ids), remaining):
+                early_stopped = remaining > 0
+                break
+            while launched < n_max and len(in_flight) < config.ensemble_concurrency:
+                launch()
+    finally:
+        pool.shutdown(wait=False)  # in-flight samples after an early stop finish unobserved
+
+    if not grades:
+        raise errors[-1]
+    grade, stats = aggregate(grades, rb)
+    models = sorted({str(m.get("model")) for m in metas if m.get("model")})
+    meta = {
+        "model": models[0] if len(models) == 1 else models,
+        "system_fingerprint": metas[0].get("system_fingerprint"),
+        "usage": sum_usage(m.get("usage") for m in metas),
+        "seed": config.seed,
+        "temperature": config.temperature if config.ensemble_temperature is None else config.ensemble_temperature,
+        "strict_schema": config.strict_schema,
+        "partial": any(is_partial(m) for m in metas),  # a sharded sample lost a shard
+        "ensemble": {
+            "max_samples": n_max,
+            "launched": launched,
+            "completed": len(grades),
+            "failed": len(errors),
+            "early_stopped": early_stopped,
+            "calls_saved": n_max - launched,
+            "items": stats,
+            "mean_agreement": round(sum(s["agreement"] for s in stats.values()) / max(1, len(stats)), 3),
+        },
+    }
+    return grade, meta
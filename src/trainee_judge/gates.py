@@ -0,0 +1,278 @@
+"""
+gates.py
+
+Memoized gate evaluation for rubric items.
+
+An item with `"gate": "<name>"` is scored only when that gate is active for the
+transcript. Gates are deterministic predicates over transcript features, so for one
+transcript each gate is evaluated once, however many items reference it:
+
+  - `TranscriptFeatures`: normalized patient/trainee text and turn counts, computed on
+    first use and shared by every gate of a scoring call;
+  - `GateEngine` (one per compiled rubric, `CompiledRubric.gate_engine`): gate
+    definitions with their regexes compiled once; `evaluate()` memoizes results per
+    (transcript fingerprint, language), so the scorer, the incremental judge and the
+    legacy evaluator share them;
+  - a registry of predicate types (`register_predicate`) from which rubrics declare
+    their own gates:
+
+        "gates": {
+          "substance_disclosed": {"predicate": "patient_matches",
+                                  "patterns_en": ["\\\\b(alcohol|drink|weed)\\\\b"], "patterns_ar": ["(كحول|حشيش)"]},
+          "long_interview": {"predicate": "min_turns", "role": "trainee", "turns": 8},
+          "risk_and_long": {"predicate": "all_of", "gates": ["patient_risk_positive", "long_interview"]}
+        }
+
+Built-in gate: `patient_risk_positive` (patient risk cues from `patient_cues.risk_positive`,
+else defaults). Unknown gate names stay active (items are never silently hidden), but
+they are reported in `GateResults.unknown` and logged once per rubric.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Mapping, Optional, Pattern, Set, Tuple
+
+from src.state.conversation import ConversationLog, HistoryLike
+from src.utils.logger import get_logger
+
+from .compiled_rubric import DEFAULT_PATIENT_RISK_CUES, _compile, patterns_for_language
+
+logger = get_logger(__name__)
+
+RISK_GATE = "patient_risk_positive"
+
+_ROLES = {"patient": "assistant", "trainee": "user"}
+
+
+# ----------------------------
+# Transcript features
+# ----------------------------
+class TranscriptFeatures:
+    """Per-transcript inputs to gates, each computed once on first use."""
+
+    def __init__(self, log: ConversationLog, language: str) -> None:
+        self.log = log
+        self.language = language
+        self._text: Dict[str, str] = {}
+        self._turns: Dict[str, int] = {}
+
+    def text(self, role: str) -> str:
+        """Normalized text of all `role` ("patient"/"trainee") turns, joined by spaces."""
+        t = self._text.get(role)
+        if t is None:
+            t = self._text[role] = " ".join(turn.normalized for turn in self.log.by_role(_ROLES[role]))
+        return t
+
+    def turns(self, role: str) -> int:
+        n = self._turns.get(role)
+        if n is None:
+            n = self._turns[role] = len(self.log.by_role(_ROLES[role]))
+        return n
+
+    @property
+    def patient_text(self) -> str:
+        return self.text("patient")
+
+    @property
+    def trainee_text(self) -> str:
+        return self.text("trainee")
+
+
+# ----------------------------
+# Predicate registry
+# ----------------------------
+# A predicate factory turns a gate definition (rubric JSON) into a check on GateResults.
+Check = Callable[["GateResults"], bool]
+PredicateFactory = Callable[[Mapping[str, Any], Mapping[str, Any]], Check]
+
+_PREDICATES: Dict[str, PredicateFactory] = {}
+
+
+def register_predicate(name: str) -> Callable[[PredicateFactory], PredicateFactory]:
+    """Decorator: make `name` usable as `"predicate"` in rubric gate definitions."""
+
+    def deco(factory: PredicateFactory) -> PredicateFactory:
+        _PREDICATES[name] = factory
+        return factory
+
+    return deco
+
+
+def predicate_names() -> List[str]:
+    return sorted(_PREDICATES)
+
+
+class _LanguagePatterns:
+    """patterns_en / patterns_ar compiled once per language, on first use."""
+
+    def __init__(self, spec: Mapping[str, Any]) -> None:
+        self.spec = spec
+        self._by_language: Dict[str, Tuple[Pattern[str], ...]] = {}
+
+    def get(self, language: str) -> Tuple[Pattern[str], ...]:
+        pats = self._by_language.get(language)
+        if pats is None:
+            pats = self._by_language[language] = _compile(patterns_for_language(self.spec, language))
+        return pats
+
+
+def _matches(patterns: Tuple[Pattern[str], ...], text: str) -> bool:
+    return any(p.search(text) for p in patterns)
+
+
+def _text_matcher(role: str) -> PredicateFactory:
+    def factory(spec: Mapping[str, Any], rubric: Mapping[str, Any]) -> Check:
+        pats = _LanguagePatterns(spec)
+        return lambda r: _matches(pats.get(r.features.language), r.features.text(role))
+
+    return factory
+
+
+register_predicate("patient_matches")(_text_matcher("patient"))
+register_predicate("trainee_matches")(_text_matcher("trainee"))
+
+
+@register_predicate("patient_risk_cues")
+def _patient_risk_cues(spec: Mapping[str, Any], rubric: Mapping[str, Any]) -> Check:
+    pats = _LanguagePatterns((rubric.get("patient_cues") or {}).get("risk_positive", DEFAULT_PATIENT_RISK_CUES))
+    return lambda r: _matches(pats.get(r.features.language), r.features.patient_text)
+
+
+@register_predicate("min_turns")
+def _min_turns(spec: Mapping[str, Any], rubric: Mapping[str, Any]) -> Check:
+    role, n = str(spec.get("role", "trainee")), int(spec.get("turns", 1))
+    if role not in _ROLES:
+        raise ValueError(f"min_turns gate: role must be one of {sorted(_ROLES)}, got {role!r}")
+    return lambda r: r.features.turns(role) >= n
+
+
+def _gate_list(spec: Mapping[str, Any]) -> List[str]:
+    names = spec.get("gates")
+    if not isinstance(names, list) or not names:
+        raise ValueError(f"{spec.get('predicate')} gate needs a non-empty 'gates' list")
+    return [str(n) for n in names]
+
+
+@register_predicate("all_of")
+def _all_of(spec: Mapping[str, Any], rubric: Mapping[str, Any]) -> Check:
+    names = _gate_list(spec)
+    return lambda r: all(r.active(n) for n in names)
+
+
+@register_predicate("any_of")
+def _any_of(spec: Mapping[str, Any], rubric: Mapping[str, Any]) -> Check:
+    names = _gate_list(spec)
+    return lambda r: any(r.active(n) for n in names)
+
+
+@register_predicate("not")
+def _not(spec: Mapping[str, Any], rubric: Mapping[str, Any]) -> Check:
+    name = str(spec.get("gate", ""))
+    if not name:
+        raise ValueError("not gate needs a 'gate' name")
+    return lambda r: not r.active(name)
+
+
+BUILTIN_GATES: Dict[str, Dict[str, Any]] = {RISK_GATE: {"predicate": "patient_risk_cues"}}
+
+
+# ----------------------------
+# Engine
+# ----------------------------
+class GateResults:
+    """Gate values for one transcript; each gate is evaluated at most once."""
+
+    def __init__(self, engine: "GateEngine", features: TranscriptFeatures) -> None:
+        self.engine = engine
+        self.features = features
+        self._values: Dict[str, bool] = {}
+        self._evaluating: Set[str] = set()
+        self._lock = threading.RLock()  # composite gates re-enter active()
+
+    @property
+    def unknown(self) -> List[str]:
+        return sorted(self.engine.unknown)
+
+    def active(self, gate: Optional[str]) -> bool:
+        """No gate -> True; unknown gate -> True (reported via `unknown`)."""
+        if not gate:
+            return True
+        v = self._values.get(gate)
+        if v is not None:
+            return v
+        check = self.engine.checks.get(gate)
+        if check is None:
+            return True
+        with self._lock:
+            v = self._values.get(gate)
+            if v is None:
+                if gate in self._evaluating:
+                    raise ValueError(f"Gate {gate!r} depends on itself")
+                self._evaluating.add(gate)
+                try:
+                    v = self._values[gate] = bool(check(self))
+                finally:
+                    self._evaluating.discard(gate)
+        return v
+
+    def as_dict(self) -> Dict[str, bool]:
+        """Values of every gate used by the rubric's items."""
+        return {g: self.active(g) for g in self.engine.item_gates}
+
+
+class GateEngine:
+    """Gate definitions of one rubric (builtins + rubric["gates"]), compiled once."""
+
+    def __init__(self, rubric: Mapping[str, Any], *, memo_entries: int = 256) -> None:
+        specs: Dict[str, Mapping[str, Any]] = {**BUILTIN_GATES, **(rubric.get("gates") or {})}
+        self.checks: Dict[str, Check] = {}
+        for name, spec in specs.items():
+            if not isinstance(spec, Mapping):
+                raise ValueError(f"Gate {name!r} must be an object with a 'predicate'")
+            predicate = spec.get("predicate")
+            factory = _PREDICATES.get(str(predicate))
+            if factory is None:
+                raise ValueError(f"Gate {name!r}: unknown predicate {predicate!r} (known: {', '.join(predicate_names())})")
+            self.checks[name] = factory(spec, rubric)
+        for name, spec in specs.items():
+            refs = list(spec.get("gates") or []) + ([spec["gate"]] if spec.get("gate") else [])
+            missing = [str(r) for r in refs if str(r) not in specs]
+            if missing:
+                raise ValueError(f"Gate {name!r} refers to undefined gates {missing}")
+        items = rubric.get("items") or []
+        self.item_gates: List[str] = sorted({str(it["gate"]) for it in items if it.get("gate")})
+        self.unknown: Set[str] = {g for g in self.item_gates if g not in self.checks}
+        if self.unknown:
+            logger.warning(
+                "rubric %s: unknown gates %s are treated as always active", rubric.get("rubric_id", ""), sorted(self.unknown)
+            )
+        self.memo_entries = memo_entries
+        self._memo: "OrderedDict[Tuple[str, str], GateResults]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def evaluate(self, conversation: HistoryLike, language: str) -> GateResults:
+        """Gate results for this transcript, shared across calls (LRU of `memo_entries`)."""
+        log = ConversationLog.coerce(conversation)
+        key = (log.dialogue_fingerprint, language)
+        with self._lock:
+            hit = self._memo.get(key)
+            if hit is not None:
+                self._memo.move_to_end(key)
+                self.stats["hits"] += 1
+                return hit
+            self.stats["misses"] += 1
+        results = GateResults(self, TranscriptFeatures(log, language))
+        with self._lock:
+            self._memo[key] = results
+            while len(self._memo) > self.memo_entries:
+                self._memo.popitem(last=False)
+        return results
+
+
+def evaluate_gates(conversation: HistoryLike, rubric: Mapping[str, Any], language: str) -> GateResults:
+    from .compiled_rubric import compile_rubric
+
+    return compile_rubric(rubric).gate_engine.evaluate(conversation, language)
@@ -0,0 +1,271 @@
+"""
+incremental_judge.py
+
+Incremental trainee judging: re-evaluate only new turns and still-open rubric items.
+
+Rubric items are "achieved if demonstrated at least once", so once an item is
+achieved on a transcript prefix it stays achieved on every extension. On
+re-evaluation we:
+
+  1. find the grade stored for the longest already-judged prefix of this transcript
+     (state is keyed by the prefix's dialogue fingerprint, so it is per session
+     without threading session ids through the pipeline);
+  2. send the judge only the new turns (+ `context_turns` earlier turns, original
+     turn numbers kept) and only the items not yet achieved;
+  3. merge deterministically (see `merge_grades`).
+
+Gates: items whose gate (e.g. `patient_risk_positive` for `risk_depth`, see gates.py)
+flips from inactive to active are re-opened; they are re-judged over the full
+transcript, since the trainee's follow-up may precede the cue the gate detects.
+
+No stored prefix (first evaluation) -> a normal full judge call, stored for next time.
+Partial grades (failed judge shards) are not stored, so the next call re-judges them.
+"""
+
+from __future__ import annotations
+
+import copy
+import threading
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from src.state.conversation import ConversationLog, HistoryLike
+from src.utils.cache import Cache, LRUTTLCache, SQLiteCache, TieredCache
+from src.utils.env import get_env
+from src.utils.hashing import canonical_hash
+from src.utils.paths import cache_dir
+
+from .judge_cache import jsonable_meta
+from .sharded_judge import is_partial, judge_turns
+from .trainee_judge_groq import GroqJudgeConfig
+from .compiled_rubric import compile_rubric
+from .stream_parser import ItemCallback
+from .trainee_judge_schema import load_rubric, rubric_fingerprint
+from .gates import RISK_GATE, evaluate_gates
+
+TurnsJudgeFn = Callable[..., Tuple[Dict[str, Any], Dict[str, Any]]]
+
+
+def state_key(
+    dialogue_fingerprint: str,
+    *,
+    rubric: Dict[str, Any],
+    language: str,
+    condition: Optional[str],
+    config: GroqJudgeConfig,
+) -> str:
+    return canonical_hash(
+        {
+            "kind": "trainee_judge_incremental/v1",
+            "rubric_fingerprint": rubric_fingerprint(rubric),
+            "transcript": dialogue_fingerprint,
+            "language": language,
+            "condition": condition or "",
+            "model": config.model,
+            "seed": config.seed,
+            "temperature": config.temperature,
+            "strict_schema": config.strict_schema,
+            "reasoning_effort": config.reasoning_effort,
+        }
+    )
+
+
+def _merge_item(prev: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Both achieved: union evidence, max confidence. Otherwise the newer judgment wins
+    (it saw more of the conversation), keeping any earlier evidence turns."""
+    evidence = sorted(set(prev.get("evidence_turns") or []) | set(new.get("evidence_turns") or []))
+    if prev.get("achieved") and new.get("achieved"):
+        return {
+            "achieved": True,
+            "confidence": max(float(prev.get("confidence", 0.0) or 0.0), float(new.get("confidence", 0.0) or 0.0)),
+            "evidence_turns": evidence,
+            "rationale": new.get("rationale") or prev.get("rationale", ""),
+        }
+    out = dict(new)
+    out["evidence_turns"] = evidence if new.get("achieved") else sorted(set(new.get("evidence_turns") or []))
+    return out
+
+
+def merge_grades(
+    prev: Dict[str, Any],
+    delta: Dict[str, Any],
+    *,
+    judged_items: Set[str],
+    rubric: Dict[str, Any],
+) -> Dict[str, Any]:
+    """Deterministic merge of a delta grade (subset of items) into the previous grade."""
+    prev_results = prev.get("item_results") or {}
+    delta_results = delta.get("item_results") or {}
+    results: Dict[str, Any] = {}
+    for it in rubric.get("items", []):
+        item_id = str(it.get("id"))
+        old = prev_results.get(item_id) or {"achieved": False, "confidence": 0.0, "evidence_turns": [], "rationale": ""}
+        if item_id in judged_items and item_id in delta_results:
+            results[item_id] = _merge_item(old, delta_results[item_id])
+        else:
+            results[item_id] = old
+
+    achieved = {k for k, v in results.items() if v.get("achieved")}
+    flags: List[Dict[str, Any]] = []
+    seen: Set[Tuple[Any, Any, Any]] = set()
+    for f in list(prev.get("flags") or []) + list(delta.get("flags") or []):
+        sig = (f.get("type"), f.get("item_id"), f.get("message"))
+        if f.get("item_id") in achieved or sig in seen:
+            continue
+        seen.add(sig)
+        flags.append(f)
+
+    return {
+        "rubric_id": rubric.get("rubric_id", ""),
+        "rubric_version": rubric.get("version", ""),
+        "rubric_fingerprint": rubric_fingerprint(rubric),
+        "item_results": results,
+        "flags": flags,
+        "summary_feedback": list(delta.get("summary_feedback") or prev.get("summary_feedback") or []),
+    }
+
+
+class IncrementalJudge:
+    """Same call signature as `judge_trainee_with_groq`; active when `config.incremental`."""
+
+    def __init__(
+        self,
+        turns_judge_fn: TurnsJudgeFn = judge_turns,
+        *,
+        state: Cache,
+        context_turns: int = 2,
+    ) -> None:
+        self._judge_turns = turns_judge_fn
+        self.state = state
+        self.context_turns = context_turns
+        self.calls = {"full": 0, "delta": 0, "carried": 0, "unchanged": 0}
+
+    def _find_previous(self, log: ConversationLog, key_kwargs: Dict[str, Any]) -> Tuple[int, Optional[Dict[str, Any]]]:
+        n = len(log.dialogue())
+        for k in range(n, 0, -1):
+            st = self.state.get(state_key(log.dialogue_fingerprint_at(k), **key_kwargs))
+            if st is not None:
+                return k, st
+        return 0, None
+
+    def __call__(
+        self,
+        conversation_history: HistoryLike,
+        language: str,
+        condition: Optional[str] = None,
+        rubric_path: Optional[str] = None,
+        rubric: Optional[Dict[str, Any]] = None,
+        config: GroqJudgeConfig = GroqJudgeConfig(),
+        on_item: Optional[ItemCallback] = None,
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        rb = compile_rubric(rubric) if rubric is not None else load_rubric(rubric_path)
+        log = ConversationLog.coerce(conversation_history)
+        turns = log.numbered_turns()
+        n = len(turns)
+        gates_now = evaluate_gates(log, rb, language).as_dict()
+        key_kwargs = {"rubric": rb, "language": language, "condition": condition, "config": config}
+
+        prev_n, prev = self._find_previous(log, key_kwargs) if config.incremental else (0, None)
+        prev = copy.deepcopy(prev)  # the memory tier hands out shared objects
+
+        info: Dict[str, Any] = {"previous_turns": prev_n, "total_turns": n}
+        if prev is None:
+            # Only full runs stream: delta results are merged with the previous grade afterwards.
+            stream_kwargs = {"on_item": on_item} if on_item is not None else {}
+            grade, meta = self._judge_turns(turns, rb, language=language, condition=condition, config=config, **stream_kwargs)
+            info.update(mode="full", judged_turns=[1, n] if n else [], open_items=[str(it.get("id")) for it in rb["items"]])
+            self.calls["full"] += 1
+        elif prev_n == n:
+            grade, meta = prev["grade"], dict(prev.get("meta") or {})
+            info.update(mode="unchanged", judged_turns=[], open_items=[])
+            self.calls["unchanged"] += 1
+        else:
+            prev_grade = prev["grade"]
+            # States written before gate values were stored only carry risk_positive.
+            prev_gates = prev.get("gates") or {RISK_GATE: bool(prev.get("risk_positive"))}
+            flipped = {g for g, active in gates_now.items() if active and not prev_gates.get(g, True)}
+            reopened = {i for i, g in rb.gates.items() if g in flipped}
+            prev_results = prev_grade.get("item_results") or {}
+            open_items = {
+                str(it.get("id"))
+                for it in rb["items"]
+                if not (prev_results.get(str(it.get("id"))) or {}).get("achieved")
+            } | reopened
+
+            if not open_items:
+                grade, meta = prev_grade, dict(prev.get("meta") or {})
+                info.update(mode="carried", judged_turns=[], open_items=[])
+                self.calls["carried"] += 1
+            else:
+                first_new = 1 if reopened else prev_n + 1
+                window = turns[max(0, first_new - 1 - self.context_turns) :] if not reopened else turns
+                sub_rubric = compile_rubric({**rb, "items": [it for it in rb["items"] if str(it.get("id")) in open_items]})
+                extra = {
+                    "incremental": (
+                        f"Turns before {first_new} were already graded and are context only. "
+                        f"Only the listed items are still open: mark achieved only if the trainee demonstrates "
+                        f"the behavior in turn {first_new} or later."
+                    )
+                } if first_new > 1 else None
+                delta, meta = self._judge_turns(
+                    window, sub_rubric, language=language, condition=condition, config=config, extra_instructions=extra
+                )
+                if reopened:
+                    # Re-opened items are re-judged from scratch, not merged with pre-flip results.
+                    prev_grade = {
+                        **prev_grade,
+                        "item_results": {k: v for k, v in prev_results.items() if k not in reopened},
+                    }
+                grade = merge_grades(prev_grade, delta, judged_items=open_items, rubric=rb)
+                info.update(
+                    mode="delta",
+                    judged_turns=[window[0]["turn"], n] if window else [],
+                    open_items=sorted(open_items),
+                    reopened=sorted(reopened),
+                )
+                self.calls["delta"] += 1
+
+        # Stored even for full (non-incremental) runs, so a later incremental run can build on it.
+        if not is_partial(meta):
+            self.state.set(
+                state_key(log.dialogue_fingerprint, **key_kwargs),
+                {
+                    "grade": copy.deepcopy(grade),
+                    "meta": _plain_meta(meta),
+                    "gates": gates_now,
+                    "risk_positive": gates_now.get(RISK_GATE, False),
+                },
+            )
+        meta = dict(meta)
+        meta["incremental"] = info
+        return grade, meta
+
+    def report(self) -> Dict[str, Any]:
+        return dict(self.calls)
+
+
+def _plain_meta(meta: Dict[str, Any]) -> Dict[str, Any]:
+    return jsonable_meta({k: v for k, v in (meta or {}).items() if k not in ("cache", "incremental")})
+
+
+_default_lock = threading.Lock()
+_default_judge: Optional[IncrementalJudge] = None
+
+
+def shared_incremental_judge() -> IncrementalJudge:
+    """Process-wide incremental judge; state in memory + SQLite (JUDGE_STATE_* env vars)."""
+    global _default_judge
+    with _default_lock:
+        if _default_judge is None:
+            ttl = get_env("JUDGE_STATE_TTL_S")
+            ttl_s = float(ttl) if ttl else 7 * 24 * 3600.0
+            state = TieredCache(
+                LRUTTLCache(max_entries=int(get_env("JUDGE_STATE_MEMORY_ENTRIES", "512")), ttl_s=ttl_s),
+                SQLiteCache(
+                    cache_dir() / "trainee_judge.sqlite",
+                    max_entries=int(get_env("JUDGE_STATE_DISK_ENTRIES", "50000")),
+                    ttl_s=ttl_s,
+                    table="judge_incremental_state",
+                ),
+            )
+            _default_judge = IncrementalJudge(judge_turns, state=state)
+        return _default_judge
@@ -0,0 +1,179 @@
+"""
+judge_cache.py
+
+Persistent cache in front of the trainee judge (`judge_trainee_with_groq`).
+
+Key = SHA-256 of:
+  - rubric_fingerprint(rubric)
+  - the transcript the judge sees: the user/assistant turns that `build_numbered_turns`
+    numbers, hashed via `ConversationLog.dialogue_fingerprint` (O(1) for logs)
+  - language, condition
+  - GroqJudgeConfig: model, seed, temperature, strict_schema, reasoning_effort, incremental, sharding,
+    transcript_format, max_patient_turn_chars, ensemble settings
+
+A hit returns the stored `(grade, meta)` instantly; `meta["cache"]` says whether
+the result was served from cache. Partial grades (a failed judge shard, see
+`sharded_judge.is_partial`) are returned but not stored. Storage is the
+memory+SQLite tiered cache from `src.utils.cache` (LRU size bound + TTL age bound).
+
+`GroqJudgeConfig.use_cache=False` bypasses the read (forces a fresh judge call)
+and refreshes the stored entry.
+"""
+
+from __future__ import annotations
+
+import copy
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from src.state.conversation import ConversationLog, HistoryLike
+from src.utils.cache import Cache, LRUTTLCache, SQLiteCache, TieredCache
+from src.utils.env import get_env
+from src.utils.hashing import canonical_hash
+from src.utils.paths import cache_dir
+
+from .trainee_judge_groq import GroqJudgeConfig, judge_trainee_with_groq
+from .compiled_rubric import compile_rubric
+from .sharded_judge import is_partial
+from .stream_parser import ItemCallback
+from .trainee_judge_schema import load_rubric, rubric_fingerprint
+
+JudgeFn = Callable[..., Tuple[Dict[str, Any], Dict[str, Any]]]
+
+
+def transcript_hash(conversation_history: HistoryLike) -> str:
+    return ConversationLog.coerce(conversation_history).dialogue_fingerprint
+
+
+def judge_cache_key(
+    conversation_history: HistoryLike,
+    *,
+    rubric: Dict[str, Any],
+    language: str,
+    condition: Optional[str],
+    config: GroqJudgeConfig,
+) -> str:
+    return canonical_hash(
+        {
+            "kind": "trainee_judge/v1",
+            "rubric_fingerprint": rubric_fingerprint(rubric),
+            "transcript": transcript_hash(conversation_history),
+            "language": language,
+            "condition": condition or "",
+            "model": config.model,
+            "seed": config.seed,
+            "temperature": config.temperature,
+            "strict_schema": config.strict_schema,
+            "reasoning_effort": config.reasoning_effort,
+            "incremental": config.incremental,
+            "shard_size": config.shard_size,
+            "shard_groups": [list(g) for g in config.shard_groups or ()],
+            "transcript_format": config.transcript_format,
+            "max_patient_turn_chars": config.max_patient_turn_chars,
+            "ensemble": [
+                config.ensemble_size,
+                list(config.ensemble_models or ()),
+                config.ensemble_temperature,
+                config.ensemble_early_stop,
+            ] if config.ensemble_size > 1 else None,
+        }
+    )
+
+
+def jsonable_meta(meta: Dict[str, Any]) -> Dict[str, Any]:
+    """Judge meta carries SDK objects (e.g. usage); store plain JSON."""
+
+    def default(o: Any) -> Any:
+        dump = getattr(o, "model_dump", None)
+        if callable(dump):
+            return dump()
+        return getattr(o, "__dict__", None) or str(o)
+
+    return json.loads(json.dumps(meta, ensure_ascii=False, default=default))
+
+
+class CachedJudge:
+    """Drop-in replacement for `judge_trainee_with_groq` (same call signature)."""
+
+    def __init__(self, judge_fn: JudgeFn = judge_trainee_with_groq, *, cache: Cache) -> None:
+        self._judge_fn = judge_fn
+        self.cache = cache
+        self.bypassed = 0
+        self.saved_s = 0.0   # judge latency avoided by hits (stored latency of the original call)
+
+    def __call__(
+        self,
+        conversation_history: HistoryLike,
+        language: str,
+        condition: Optional[str] = None,
+        rubric_path: Optional[str] = None,
+        rubric: Optional[Dict[str, Any]] = None,
+        config: GroqJudgeConfig = GroqJudgeConfig(),
+        on_item: Optional[ItemCallback] = None,
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        rb = compile_rubric(rubric) if rubric is not None else load_rubric(rubric_path)
+        key = judge_cache_key(conversation_history, rubric=rb, language=language, condition=condition, config=config)
+
+        if config.use_cache:
+            hit = self.cache.get(key)
+            if hit is not None:
+                self.saved_s += float(hit.get("latency_s") or 0.0)
+                # Deep copies: the scorer fills missing items into the grade in place.
+                meta = copy.deepcopy(hit["meta"])
+                meta["cache"] = {"hit": True, "key": key, "stored_at": hit.get("stored_at")}
+                return copy.deepcopy(hit["grade"]), meta
+        else:
+            self.bypassed += 1
+
+        t0 = time.perf_counter()
+        stream_kwargs = {"on_item": on_item} if on_item is not None else {}
+        grade, meta = self._judge_fn(
+            conversation_history, language=language, condition=condition, rubric=rb, config=config, **stream_kwargs
+        )
+        latency = time.perf_counter() - t0
+        meta = jsonable_meta(meta)
+        partial = is_partial(meta)
+        if not partial:
+            self.cache.set(
+                key,
+                {"grade": copy.deepcopy(grade), "meta": meta, "latency_s": round(latency, 3), "stored_at": time.time()},
+            )
+        meta = dict(meta)
+        meta["cache"] = {"hit": False, "key": key, "bypassed": not config.use_cache, "stored": not partial}
+        return grade, meta
+
+    def report(self) -> Dict[str, Any]:
+        stats = self.cache.tier_stats() if hasattr(self.cache, "tier_stats") else {"total": self.cache.stats.as_dict()}
+        return {**stats, "bypassed": self.bypassed, "judge_seconds_saved": round(self.saved_s, 2)}
+
+
+_default_lock = threading.Lock()
+_default_judge: Optional[CachedJudge] = None
+
+
+def default_judge_cache() -> TieredCache:
+    """Memory+SQLite cache; sizes/TTL via JUDGE_CACHE_* env vars."""
+    ttl = get_env("JUDGE_CACHE_TTL_S")
+    ttl_s = float(ttl) if ttl else 30 * 24 * 3600.0
+    return TieredCache(
+        LRUTTLCache(max_entries=int(get_env("JUDGE_CACHE_MEMORY_ENTRIES", "256")), ttl_s=ttl_s),
+        SQLiteCache(
+            cache_dir() / "trainee_judge.sqlite",
+            max_entries=int(get_env("JUDGE_CACHE_DISK_ENTRIES", "20000")),
+            ttl_s=ttl_s,
+            table="judge_results",
+        ),
+    )
+
+
+def shared_cached_judge() -> CachedJudge:
+    """Process-wide cached judge, so hit-rate metrics survive Streamlit reruns."""
+    global _default_judge
+    with _default_lock:
+        if _default_judge is None:
+            from .incremental_judge import shared_incremental_judge  # full judge unless config.incremental
+
+            _default_judge = CachedJudge(shared_incremental_judge(), cache=default_judge_cache())
+        return _default_judge
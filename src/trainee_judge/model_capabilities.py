@@ -0,0 +1,145 @@
+"""
+model_capabilities.py
+
+Remembers, per (model, schema shape), whether Groq accepts strict `json_schema`
+response_format, so the judge does not pay a rejected request + json_object retry on
+every evaluation.
+
+  - Schema shape = the JSON Schema keywords used, nesting depth and a property-count
+    bucket, plus the strict flag. Those are what structured-output support depends on;
+    rubric item ids are not, so one probe covers every rubric/shard of the same form.
+  - Only a genuine "schema not supported" 400 teaches `supported=False`. Rate limits,
+    5xx, timeouts and `json_validate_failed` (the model produced invalid output for a
+    supported schema) are not capability signals and are never recorded.
+  - The first successful strict call records `supported=True`.
+  - Entries expire (MODEL_CAPS_TTL_S, default 7 days; negative results after
+    MODEL_CAPS_NEGATIVE_TTL_S, default 1 day) so newly added model support is picked up.
+
+Storage: memory + SQLite (`cache_dir()/trainee_judge.sqlite`, table `model_capabilities`).
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Dict, Optional, Set
+
+from src.utils.cache import Cache, LRUTTLCache, SQLiteCache, TieredCache
+from src.utils.env import get_env
+from src.utils.hashing import canonical_hash
+from src.utils.paths import cache_dir
+
+_SCHEMA_HINTS = ("response_format", "json_schema", "structured output", "schema")
+_UNSUPPORTED_HINTS = ("not supported", "unsupported", "does not support", "invalid", "not available")
+
+
+def schema_shape(response_format: Dict[str, Any]) -> str:
+    """Structural signature of a response_format payload (independent of rubric item ids)."""
+    js = response_format.get("json_schema") or {}
+    keywords: Set[str] = set()
+    max_props = 0
+
+    def walk(node: Any, depth: int) -> int:
+        nonlocal max_props
+        if isinstance(node, list):
+            return max((walk(x, depth) for x in node), default=depth)
+        if not isinstance(node, dict):
+            return depth
+        deepest = depth
+        for k, v in node.items():
+            if k == "properties" and isinstance(v, dict):
+                keywords.add(k)
+                max_props = max(max_props, len(v))
+                for sub in v.values():
+                    deepest = max(deepest, walk(sub, depth + 1))
+            else:
+                keywords.add(k)
+                if k != "required":  # a list of property names, not subschemas
+                    deepest = max(deepest, walk(v, depth + 1))
+        return deepest
+
+    depth = walk(js.get("schema") or {}, 0)
+    return canonical_hash(
+        {
+            "type": response_format.get("type"),
+            "strict": bool(js.get("strict")),
+            "keywords": sorted(keywords),
+            "depth": depth,
+            "props_bucket": min(max_props // 32, 4),  # coarse: only large objects hit provider limits
+        }
+    )[:16]
+
+
+def _status(exc: BaseException) -> Optional[int]:
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_schema_unsupported_error(exc: BaseException) -> bool:
+    """True only for a 400 that rejects the response_format itself."""
+    if _status(exc) != 400 and exc.__class__.__name__ != "BadRequestError":
+        return False
+    body = getattr(exc, "body", None)
+    text = f"{exc} {body or ''}".lower()
+    if "json_validate_failed" in text:
+        return False  # generation failed validation: the schema itself was accepted
+    return any(h in text for h in _SCHEMA_HINTS) and any(h in text for h in _UNSUPPORTED_HINTS)
+
+
+class CapabilityRegistry:
+    def __init__(self, cache: Cache, *, ttl_s: float = 7 * 24 * 3600.0, negative_ttl_s: float = 24 * 3600.0) -> None:
+        self.cache = cache
+        self.ttl_s = ttl_s
+        self.negative_ttl_s = negative_ttl_s
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    @staticmethod
+    def key(model: str, shape: str) -> str:
+        return canonical_hash({"kind": "strict_schema/v1", "model": model, "shape": shape})
+
+    def strict_supported(self, model: str, shape: str) -> Optional[bool]:
+        """True/False if known and not expired, None if it still needs probing."""
+        entry = self.cache.get(self.key(model, shape))
+        if entry is None or float(entry.get("expires_at", 0.0)) < time.time():
+            return None
+        return bool(entry.get("supported"))
+
+    def record(self, model: str, shape: str, supported: bool, *, reason: str = "") -> None:
+        now = time.time()
+        ttl = self.ttl_s if supported else self.negative_ttl_s
+        self.cache.set(
+            self.key(model, shape),
+            {"model": model, "shape": shape, "supported": supported, "reason": reason[:500], "checked_at": now, "expires_at": now + ttl},
+        )
+
+    def forget(self, model: str, shape: str) -> None:
+        """Expire the entry so the next call probes again."""
+        self.cache.set(self.key(model, shape), {"model": model, "shape": shape, "supported": None, "expires_at": 0.0})
+
+    def probe_lock(self, model: str, shape: str) -> threading.Lock:
+        """Serializes the first (probing) call per key so concurrent shards don't all probe."""
+        k = self.key(model, shape)
+        with self._locks_guard:
+            return self._locks.setdefault(k, threading.Lock())
+
+
+_default_lock = threading.Lock()
+_default_registry: Optional[CapabilityRegistry] = None
+
+
+def default_capability_registry() -> CapabilityRegistry:
+    """Process-wide registry; TTLs via MODEL_CAPS_* env vars."""
+    global _default_registry
+    with _default_lock:
+        if _default_registry is None:
+            ttl_s = float(get_env("MODEL_CAPS_TTL_S", "") or 7 * 24 * 3600.0)
+            negative_ttl_s = float(get_env("MODEL_CAPS_NEGATIVE_TTL_S", "") or 24 * 3600.0)
+            cache = TieredCache(
+                LRUTTLCache(max_entries=256),
+                SQLiteCache(cache_dir() / "trainee_judge.sqlite", max_entries=1000, table="model_capabilities"),
+            )
+            _default_registry = CapabilityRegistry(cache, ttl_s=ttl_s, negative_ttl_s=negative_ttl_s)
+        return _default_registry
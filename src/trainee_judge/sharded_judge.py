@@ -0,0 +1,211 @@
+"""
+sharded_judge.py
+
+Sharded parallel judging across rubric items.
+
+One judge call must emit a structured object covering every rubric item, so its
+latency grows with output length and a single schema failure loses every item.
+In sharded mode (`GroqJudgeConfig.shard_size` / `shard_groups`):
+
+  - rubric["items"] is split into groups (explicit `shard_groups` of item ids first,
+    remaining items chunked by `shard_size`, rubric order preserved);
+  - each shard gets its own schema (`build_response_format` on the sub-rubric) and
+    runs concurrently (threads; every call still goes through the shared rate limiter);
+  - failed shards are retried individually (`shard_retries`); a shard that still fails
+    yields achieved=false items plus a JUDGE_SHARD_FAILED flag instead of failing the
+    whole grade (unless every shard failed); such a grade is partial (`is_partial`) and is
+    never cached or stored as incremental state, so the next run re-judges it;
+  - results merge into one grade dict with the shape `score_from_judge_output` expects.
+
+`judge_turns` is the entry point used by `judge_trainee_with_groq` and the incremental
+judge: it dispatches to a single call, shards or an ensemble (ensemble_judge.py; each
+sample is itself single or sharded) based on the config, and records
+wall-clock latency for both so `sharding_report()` can compare them.
+"""
+
+from __future__ import annotations
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.patient_sim.hedging import LatencyWindow
+from src.utils.tokens import sum_usage
+
+from .compiled_rubric import CompiledRubric, compile_rubric
+from .stream_parser import ItemCallback
+from .trainee_judge_groq import GroqJudgeConfig, judge_turns_with_groq
+from .trainee_judge_schema import _item_ids, rubric_fingerprint
+
+TurnsJudgeFn = Callable[..., Tuple[Dict[str, Any], Dict[str, Any]]]
+
+SHARD_FAILED_FLAG = "JUDGE_SHARD_FAILED"
+
+_latency = {"single": LatencyWindow(500), "sharded": LatencyWindow(500)}
+
+
+def is_sharded(config: GroqJudgeConfig) -> bool:
+    return bool(config.shard_groups) or bool(config.shard_size and config.shard_size > 0)
+
+
+def split_rubric(rubric: Dict[str, Any], config: GroqJudgeConfig) -> List[CompiledRubric]:
+    """Sub-rubrics (same top-level fields, subset of items) covering every item exactly once.
+    Compiled and cached by fingerprint, so repeat evaluations reuse each shard's schema."""
+    by_id = {str(it.get("id")): it for it in rubric.get("items", [])}
+    order = _item_ids(rubric)
+    groups: List[List[str]] = []
+    assigned = set()
+    for group in config.shard_groups or ():
+        ids = [i for i in group if i in by_id and i not in assigned]
+        if ids:
+            groups.append(ids)
+            assigned.update(ids)
+    rest = [i for i in order if i not in assigned]
+    size = config.shard_size if config.shard_size and config.shard_size > 0 else len(rest) or 1
+    groups += [rest[i : i + size] for i in range(0, len(rest), size)]
+    return [compile_rubric({**rubric, "items": [by_id[i] for i in ids]}) for ids in groups]
+
+
+def is_partial(meta: Optional[Dict[str, Any]]) -> bool:
+    """True if the grade behind `meta` has items that were not actually judged (failed shards)."""
+    meta = meta or {}
+    return bool(meta.get("partial") or (meta.get("sharded") or {}).get("failed_shards"))
+
+
+def merge_shard_grades(rubric: Dict[str, Any], shard_grades: List[Dict[str, Any]]) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    flags: List[Dict[str, Any]] = []
+    feedback: List[str] = []
+    for g in shard_grades:
+        results.update(g.get("item_results") or {})
+        flags.extend(g.get("flags") or [])
+        feedback.extend(x for x in g.get("summary_feedback") or [] if x not in feedback)
+    return {
+        "rubric_id": rubric.get("rubric_id", ""),
+        "rubric_version": rubric.get("version", ""),
+        "rubric_fingerprint": rubric_fingerprint(rubric),
+        "item_results": {i: results[i] for i in _item_ids(rubric) if i in results},
+        "flags": flags,
+        "summary_feedback": feedback,
+    }
+
+
+def _failed_shard_grade(sub: Dict[str, Any], error: BaseException) -> Dict[str, Any]:
+    ids = _item_ids(sub)
+    return {
+        "item_results": {
+            i: {"achieved": False, "confidence": 0.0, "evidence_turns": [], "rationale": f"Judge shard failed: {error}"}
+            for i in ids
+        },
+        "flags": [
+            {"type": SHARD_FAILED_FLAG, "item_id": i, "message": "Not graded: judge shard failed after retries.", "evidence_turns": []}
+            for i in ids
+        ],
+        "summary_feedback": [],
+    }
+
+
+def judge_sharded(
+    turns: List[Dict[str, Any]],
+    rb: Dict[str, Any],
+    *,
+    language: str,
+    condition: Optional[str] = None,
+    config: GroqJudgeConfig = GroqJudgeConfig(),
+    extra_instructions: Optional[Dict[str, str]] = None,
+    shard_fn: TurnsJudgeFn = judge_turns_with_groq,
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    rb = compile_rubric(rb)
+    shards = split_rubric(rb, config)
+
+    def run(sub: Dict[str, Any]) -> Dict[str, Any]:
+        ids = _item_ids(sub)
+        attempts, error, t0 = 0, None, time.perf_counter()
+        for attempt in range(config.shard_retries + 1):
+            attempts += 1
+            try:
+                grade, meta = shard_fn(
+                    turns, sub, language=language, condition=condition, config=config, extra_instructions=extra_instructions
+                )
+                missing = [i for i in ids if i not in (grade.get("item_results") or {})]
+                if missing:
+                    raise ValueError(f"shard output missing items: {missing}")
+                return {"ok": True, "grade": grade, "meta": meta, "attempts": attempts, "latency_s": time.perf_counter() - t0, "items": ids}
+            except Exception as e:  # retry this shard only
+                error = e
+                if attempt < config.shard_retries:
+                    time.sleep(min(4.0, 0.5 * 2**attempt))
+        return {"ok": False, "error": error, "attempts": attempts, "latency_s": time.perf_counter() - t0, "items": ids}
+
+    t0 = time.perf_counter()
+    workers = max(1, min(len(shards), config.shard_concurrency))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="judge-shard") as pool:
+        outcomes = list(pool.map(run, shards))
+    wall = time.perf_counter() - t0
+
+    ok = [o for o in outcomes if o["ok"]]
+    if not ok:
+        raise outcomes[-1]["error"]  # nothing graded: surface like a single-call failure
+    grades = [o["grade"] if o["ok"] else _failed_shard_grade(sub, o["error"]) for o, sub in zip(outcomes, shards)]
+    grade = merge_shard_grades(rb, grades)
+
+    metas = [o["meta"] for o in ok]
+    latencies = [o["latency_s"] for o in outcomes]
+    meta = {
+        "model": metas[0].get("model"),
+        "system_fingerprint": metas[0].get("system_fingerprint"),
+        "usage": sum_usage(m.get("usage") for m in metas),
+        "seed": config.seed,
+        "temperature": config.temperature,
+        "strict_schema": config.strict_schema,
+        "sharded": {
+            "shards": len(shards),
+            "shard_items": [o["items"] for o in outcomes],
+            "wall_s": round(wall, 3),
+            "shard_latency_s": [round(x, 3) for x in latencies],
+            "sum_shard_s": round(sum(latencies), 3),
+            "retries": sum(o["attempts"] - 1 for o in outcomes),
+            "failed_shards": [i for i, o in enumerate(outcomes) if not o["ok"]],
+        },
+    }
+    return grade, meta
+
+
+def judge_turns(
+    turns: List[Dict[str, Any]],
+    rb: Dict[str, Any],
+    *,
+    language: str,
+    condition: Optional[str] = None,
+    config: GroqJudgeConfig = GroqJudgeConfig(),
+    extra_instructions: Optional[Dict[str, str]] = None,
+    on_item: Optional[ItemCallback] = None,
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Single call, sharded or ensemble, per `config`; records wall-clock latency for single/sharded.
+
+    `on_item` streams item results for single calls only (shard/sample threads don't call back).
+    """
+    if config.ensemble_size > 1:
+        from .ensemble_judge import judge_ensemble
+
+        return judge_ensemble(
+            turns, rb, language=language, condition=condition, config=config, extra_instructions=extra_instructions, sample_fn=judge_turns
+        )
+    t0 = time.perf_counter()
+    if is_sharded(config):
+        out = judge_sharded(turns, rb, language=language, condition=condition, config=config, extra_instructions=extra_instructions)
+        _latency["sharded"].add(time.perf_counter() - t0)
+    else:
+        out = judge_turns_with_groq(
+            turns, rb, language=language, condition=condition, config=config, extra_instructions=extra_instructions, on_item=on_item
+        )
+        _latency["single"].add(time.perf_counter() - t0)
+    return out
+
+
+def sharding_report() -> Dict[str, Any]:
+    """Wall-clock latency of single-call vs sharded judging in this process."""
+    out = {mode: w.summary() for mode, w in _latency.items()}
+    single, sharded = _latency["single"].percentile(0.5), _latency["sharded"].percentile(0.5)
+    out["p50_speedup"] = round(single / sharded, 2) if single and sharded else None
+    return out
@@ -0,0 +1,112 @@
+"""
+stream_parser.py
+
+Incremental parser for streamed judge output.
+
+The judge returns one JSON object; with streaming, its text arrives in small deltas.
+`ItemResultsParser.feed()` scans only the new characters (tracking nesting, strings and
+escapes) and returns every `item_results[<id>]` entry whose object has just closed, so
+callers can show items long before the whole object (and `json.loads`) is available.
+
+    parser = ItemResultsParser()
+    for delta in deltas:
+        for item_id, result in parser.feed(delta):
+            ...
+    grade = json.loads(parser.text)
+
+Entries are decoded with `json.loads` on their own slice, so what is emitted is exactly
+what the final parse will contain for that id.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ITEMS_KEY = "item_results"
+
+# on_item(item_id, item_result): called as each entry completes (may repeat an id when a
+# request is retried; the later call wins).
+ItemCallback = Callable[[str, Dict[str, Any]], None]
+
+
+class _Frame:
+    __slots__ = ("kind", "name", "start", "pending_key", "expect_key")
+
+    def __init__(self, kind: str, name: Optional[str], start: int) -> None:
+        self.kind = kind              # "{" or "["
+        self.name = name              # key this container is the value of (None for array elements / root)
+        self.start = start            # offset of the opening bracket in the buffer
+        self.pending_key: Optional[str] = None
+        self.expect_key = kind == "{"
+
+
+class ItemResultsParser:
+    def __init__(self, items_key: str = ITEMS_KEY) -> None:
+        self.items_key = items_key
+        self._text = ""
+        self._pos = 0
+        self._stack: List[_Frame] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self.emitted: List[str] = []
+        self.closed = False           # the top-level object has been completed
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+    def feed(self, delta: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """Consume `delta`; return (item_id, item_result) for entries completed by it."""
+        if not delta:
+            return []
+        self._text += delta
+        out: List[Tuple[str, Dict[str, Any]]] = []
+        text = self._text
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    top = self._stack[-1] if self._stack else None
+                    if top is not None and top.kind == "{" and top.expect_key:
+                        top.pending_key = json.loads(text[self._string_start : i + 1])
+                continue
+            if self.closed:
+                break
+            if ch == '"':
+                if self._stack:
+                    self._in_string = True
+                    self._string_start = i
+            elif ch in "{[":
+                parent = self._stack[-1] if self._stack else None
+                name = parent.pending_key if parent is not None and parent.kind == "{" else None
+                self._stack.append(_Frame(ch, name, i))
+            elif ch in "}]":
+                if not self._stack:
+                    continue
+                frame = self._stack.pop()
+                if (
+                    frame.kind == "{"
+                    and len(self._stack) == 2
+                    and self._stack[1].name == self.items_key
+                    and self._stack[1].kind == "{"
+                    and frame.name is not None
+                ):
+                    out.append((frame.name, json.loads(text[frame.start : i + 1])))
+                    self.emitted.append(frame.name)
+                if not self._stack:
+                    self.closed = True
+            elif ch == ":" and self._stack and self._stack[-1].kind == "{":
+                self._stack[-1].expect_key = False
+            elif ch == "," and self._stack and self._stack[-1].kind == "{":
+                top = self._stack[-1]
+                top.expect_key = True
+                top.pending_key = None
+        self._pos = len(text)
+        return out
@@ -6,6 +6,9 @@ returning STRICT structured JSON (when supported) plus response metadata.
 
 Depends on:
   - trainee_judge_schema.py (build_response_format, load_rubric, rubric_fingerprint)
+  - compiled_rubric.py (fingerprint, judge payload and response format computed once per rubric version)
+  - stream_parser.py (with `on_item`, the response is streamed and each item result is
+    handed over as soon as its JSON object closes)
 
 Groq docs used by this file:
   - Chat Completions parameters: response_format (json_schema/json_object), seed, temperature, reasoning_effort/format
@@ -16,16 +19,24 @@ Groq docs used by this file:
 from __future__ import annotations
 
 import json
+import time
 from dataclasses import dataclass
+from types import SimpleNamespace
 from typing import Any, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
-from groq import Groq
 
+from .compiled_rubric import compile_rubric
+from .model_capabilities import default_capability_registry, is_schema_unsupported_error, schema_shape
+from .stream_parser import ItemCallback, ItemResultsParser
 from .trainee_judge_schema import (
     load_rubric,
     build_response_format,
     rubric_fingerprint,
 )
+from src.patient_sim.http_pool import get_sync_groq_client
+from src.state.conversation import ConversationLog, HistoryLike
+from src.utils.rate_limit import get_rate_limiter, total_usage_tokens
+from src.utils.tokens import estimate_request_tokens
 
 load_dotenv()
 
@@ -43,18 +54,37 @@ class GroqJudgeConfig:
     max_completion_tokens: int = 1200
     strict_schema: bool = True                  # try strict json_schema mode first
     timeout_s: Optional[float] = None           # pass-through if your groq client supports it
+    base_url: Optional[str] = None              # e.g. a local stub server; defaults to GROQ_BASE_URL / Groq cloud
+    use_cache: bool = True                      # False bypasses judge_cache reads (fresh call, entry refreshed)
+    incremental: bool = False                   # judge only new turns / open items (see incremental_judge.py)
+    # Sharded mode (see sharded_judge.py): explicit item-id groups first, the rest chunked by shard_size.
+    shard_size: Optional[int] = None            # None/0 = one call for all items
+    shard_groups: Optional[Tuple[Tuple[str, ...], ...]] = None
+    shard_concurrency: int = 4
+    shard_retries: int = 2
+    # Prompt encoding (see build_messages): "json" turn objects or "compact" `T3 trainee: ...` lines.
+    transcript_format: str = "json"
+    max_patient_turn_chars: Optional[int] = None  # truncate overlong patient turns (None = keep all)
+    # Self-consistency ensemble (see ensemble_judge.py): up to N samples, majority vote, early stop.
+    ensemble_size: int = 1
+    ensemble_models: Optional[Tuple[str, ...]] = None   # cycled per sample; default: `model`
+    ensemble_temperature: Optional[float] = None        # None = `temperature`
+    ensemble_concurrency: int = 3
+    ensemble_early_stop: bool = True
 
 
 # ----------------------------
 # Transcript formatting
 # ----------------------------
-def build_numbered_turns(conversation_history: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+def build_numbered_turns(conversation_history: HistoryLike) -> List[Dict[str, Any]]:
     """
     Convert your app's conversation history to numbered turns.
 
-    Expected input: [{"role": "user"|"assistant", "content": "..."}]
+    Expected input: [{"role": "user"|"assistant", "content": "..."}] or a ConversationLog
     Output: [{"turn": 1, "role": "trainee"|"patient", "content": "..."}]
     """
+    if isinstance(conversation_history, ConversationLog):
+        return conversation_history.numbered_turns()  # maintained incrementally on append
     turns: List[Dict[str, Any]] = []
     t = 1
     for m in conversation_history or []:
@@ -73,6 +103,11 @@ def build_numbered_turns(conversation_history: List[Dict[str, str]]) -> List[Dic
 
 
 def _rubric_for_judge(rubric: Dict[str, Any]) -> Dict[str, Any]:
+    """Minimized rubric payload sent to the model (computed once per compiled rubric)."""
+    return compile_rubric(rubric).judge_payload
+
+
+def _minimize_rubric(rubric: Dict[str, Any]) -> Dict[str, Any]:
     """
     Minimize rubric payload sent to the model.
 
@@ -107,11 +142,29 @@ def _rubric_for_judge(rubric: Dict[str, Any]) -> Dict[str, Any]:
 # ----------------------------
 # Prompting
 # ----------------------------
+TRANSCRIPT_FORMATS = ("json", "compact")
+
+
+def _truncate_turn(content: str, max_chars: Optional[int]) -> str:
+    if not max_chars or len(content) <= max_chars:
+        return content
+    return f"{content[:max_chars].rstrip()} [...{len(content) - max_chars} chars truncated]"
+
+
+def _compact_rubric(rb: Dict[str, Any]) -> Dict[str, Any]:
+    """Drop empty/default item fields (gate None, safety_critical False, anchors None)."""
+    return {**rb, "items": [{k: v for k, v in it.items() if v is not None and v is not False} for it in rb.get("items", [])]}
+
+
 def build_messages(
     rubric: Dict[str, Any],
     turns: List[Dict[str, Any]],
     language: str,
     condition: Optional[str] = None,
+    extra_instructions: Optional[Dict[str, str]] = None,
+    *,
+    transcript_format: str = "json",
+    max_patient_turn_chars: Optional[int] = None,
 ) -> List[Dict[str, str]]:
     """
     Builds the messages payload for the judge model.
@@ -122,8 +175,20 @@ def build_messages(
       - language/condition context
 
     Using JSON in the user message makes it easier to parse and reduces ambiguity.
+
+    transcript_format="compact" spends fewer input tokens: the JSON header (rubric,
+    context, instructions) is serialized without whitespace or empty item fields, and
+    the turns follow it as one `T<n> <role>: <content>` line each instead of
+    `{"turn": n, "role": ..., "content": ...}` objects.
     """
+    if transcript_format not in TRANSCRIPT_FORMATS:
+        raise ValueError(f"Unknown transcript_format: {transcript_format!r} (expected one of {TRANSCRIPT_FORMATS})")
     rb = _rubric_for_judge(rubric)
+    if max_patient_turn_chars:
+        turns = [
+            {**t, "content": _truncate_turn(t.get("content", ""), max_patient_turn_chars)} if t.get("role") == "patient" else t
+            for t in turns
+        ]
 
     system = (
         "You are a strict psychiatry OSCE examiner grading a trainee.\n"
@@ -142,68 +207,199 @@ def build_messages(
         "grading_instructions": {
             "evidence": "Use turn numbers. Prefer trainee turns, but you may cite patient turns for context (e.g., risk cue).",
             "achieved_definition": "Achieved if the trainee clearly demonstrates the behavior at least once in the conversation.",
+            **(extra_instructions or {}),
         },
     }
 
+    if transcript_format == "compact":
+        user_payload["rubric"] = _compact_rubric(rb)
+        del user_payload["conversation_turns"]
+        user_payload["conversation_format"] = "Turns follow this JSON, one per line: T<turn> <trainee|patient>: <content>"
+        header = json.dumps(user_payload, ensure_ascii=False, separators=(",", ":"))
+        lines = [f"T{t['turn']} {t['role']}: {' '.join(str(t.get('content', '')).split())}" for t in turns]
+        user_content = header + "\n\n" + "\n".join(lines)
+    else:
+        user_content = json.dumps(user_payload, ensure_ascii=False)
+
     return [
         {"role": "system", "content": system},
-        {"role": "user", "content": json.dumps(user_payload, ensure_ascii=False)},
+        {"role": "user", "content": user_content},
     ]
 
 
+# ----------------------------
+# Streaming
+# ----------------------------
+def _read_stream(stream: Any, parser: ItemResultsParser, on_item: ItemCallback, info: Dict[str, Any]) -> Any:
+    """Consume a chat-completions stream, handing completed items to `on_item`.
+
+    Returns a response-shaped object (choices[0].message.content, model, usage) so the
+    caller treats streamed and non-streamed responses alike.
+    """
+    model = fingerprint = usage = None
+    try:
+        for chunk in stream:
+            model = getattr(chunk, "model", None) or model
+            fingerprint = getattr(chunk, "system_fingerprint", None) or fingerprint
+            x_groq = getattr(chunk, "x_groq", None)
+            usage = getattr(x_groq, "usage", None) or getattr(chunk, "usage", None) or usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            info["chunks"] += 1
+            for item_id, result in parser.feed(delta):
+                if info["ttfi_s"] is None:
+                    info["ttfi_s"] = round(time.perf_counter() - info["started"], 3)
+                info["items_streamed"] += 1
+                on_item(item_id, result)
+    finally:
+        close = getattr(stream, "close", None)
+        if callable(close):
+            close()  # frees the limiter slot if on_item raised mid-stream
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=parser.text))],
+        model=model,
+        system_fingerprint=fingerprint,
+        usage=usage,
+    )
+
+
 # ----------------------------
 # Calling Groq
 # ----------------------------
 def judge_trainee_with_groq(
-    conversation_history: List[Dict[str, str]],
+    conversation_history: HistoryLike,
     language: str,
     condition: Optional[str] = None,
     rubric_path: Optional[str] = None,
     rubric: Optional[Dict[str, Any]] = None,
     config: GroqJudgeConfig = GroqJudgeConfig(),
+    on_item: Optional[ItemCallback] = None,
 ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
     """
     Returns: (grade_json, meta)
 
     grade_json conforms to the schema produced by build_response_format(rubric).
     meta includes Groq response metadata (model, system_fingerprint, usage).
+    With `on_item`, single-call judging streams and reports each item as it completes.
     """
-    client = Groq()
-
-    rb = rubric or load_rubric(rubric_path)  # rubric_path can be None if rubric dict provided
+    # rubric_path can be None if rubric dict provided
+    rb = compile_rubric(rubric) if rubric is not None else load_rubric(rubric_path)
     turns = build_numbered_turns(conversation_history)
-    messages = build_messages(rb, turns, language=language, condition=condition)
+    from .sharded_judge import judge_turns  # single call or sharded, per config
 
-    # Prefer strict schema when supported; fallback to json_object mode if strict fails.
-    response_format = build_response_format(rb, strict=config.strict_schema) if config.strict_schema else {"type": "json_object"}
+    return judge_turns(turns, rb, language=language, condition=condition, config=config, on_item=on_item)
 
-    try:
-        resp = client.chat.completions.create(
+
+def judge_turns_with_groq(
+    turns: List[Dict[str, Any]],
+    rb: Dict[str, Any],
+    *,
+    language: str,
+    condition: Optional[str] = None,
+    config: GroqJudgeConfig = GroqJudgeConfig(),
+    extra_instructions: Optional[Dict[str, str]] = None,
+    on_item: Optional[ItemCallback] = None,
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Grade already-numbered turns (possibly a subset, keeping their original numbers)
+    against `rb` (possibly a subset of rubric items).
+
+    With `on_item`, the response is streamed and `on_item(item_id, item_result)` is called
+    as each `item_results` entry completes; meta["stream"] records time-to-first-item.
+    """
+    rb = compile_rubric(rb)
+    client = get_sync_groq_client(base_url=config.base_url)
+    messages = build_messages(
+        rb,
+        turns,
+        language=language,
+        condition=condition,
+        extra_instructions=extra_instructions,
+        transcript_format=config.transcript_format,
+        max_patient_turn_chars=config.max_patient_turn_chars,
+    )
+
+    # Prefer strict schema when supported; the capability registry remembers models/schema
+    # shapes that reject it, so those go straight to json_object mode (one call, not two).
+    json_object = {"type": "json_object"}
+    response_format = build_response_format(rb, strict=config.strict_schema) if config.strict_schema else json_object
+    registry = default_capability_registry()
+    shape = schema_shape(response_format)
+    known = registry.strict_supported(config.model, shape) if config.strict_schema else None
+    if known is False:
+        response_format = json_object
+
+    limiter = get_rate_limiter("groq", config.model)
+    est_tokens = estimate_request_tokens(messages, config.max_completion_tokens, expected_completion=config.max_completion_tokens)
+
+    stream_info: Optional[Dict[str, Any]] = None
+    if on_item is not None:
+        stream_info = {"started": time.perf_counter(), "ttfi_s": None, "items_streamed": 0, "chunks": 0, "fallback": None}
+
+    def _request(fmt: Dict[str, Any], stream: bool):
+        create = lambda: client.chat.completions.create(  # noqa: E731
             model=config.model,
             messages=messages,
             temperature=config.temperature,
             seed=config.seed,
-            response_format=response_format,
+            response_format=fmt,
             reasoning_effort=config.reasoning_effort,
             reasoning_format=config.reasoning_format,
             max_completion_tokens=config.max_completion_tokens,
+            stream=stream,
         )
-    except Exception as e:
-        # If strict schema isn't supported by the model, Groq docs note you may get 400 errors.
-        # Fall back to json_object mode (valid JSON, but not guaranteed schema adherence).
-        if config.strict_schema:
-            resp = client.chat.completions.create(
-                model=config.model,
-                messages=messages,
-                temperature=config.temperature,
-                seed=config.seed,
-                response_format={"type": "json_object"},
-                reasoning_effort=config.reasoning_effort,
-                reasoning_format=config.reasoning_format,
-                max_completion_tokens=config.max_completion_tokens,
-            )
-        else:
-            raise
+        if stream:  # the slot is held until the stream is read to the end
+            return limiter.call_stream(create, estimated_tokens=est_tokens)
+        return limiter.call(create, estimated_tokens=est_tokens, usage_tokens=total_usage_tokens)
+
+    def _create(fmt: Dict[str, Any]):
+        if stream_info is None:
+            return _request(fmt, False)
+        try:
+            stream = _request(fmt, True)
+        except Exception as e:
+            if getattr(e, "status_code", None) != 400:
+                raise
+            # Streaming refused for this request shape: answer in one piece, items at the end.
+            stream_info["fallback"] = str(e)[:200]
+            resp = _request(fmt, False)
+            for item_id, result in ((json.loads(resp.choices[0].message.content or "{}")).get("item_results") or {}).items():
+                on_item(item_id, result)
+            return resp
+        return _read_stream(stream, ItemResultsParser(), on_item, stream_info)
+
+    def _create_strict():
+        try:
+            resp = _create(response_format)
+        except Exception as e:
+            # Groq answers 400 when a model doesn't support strict schema: learn that and fall
+            # back. Other 400s (e.g. json_validate_failed: schema accepted, output invalid)
+            # fall back once without learning anything. Transient errors (429, 5xx, timeouts)
+            # re-raise: the limiter already retried them, and a second request would only
+            # double traffic.
+            if is_schema_unsupported_error(e):
+                registry.record(config.model, shape, False, reason=str(e))
+            elif getattr(e, "status_code", None) != 400:
+                raise
+            return _create(json_object), "json_object"
+        if known is None:
+            registry.record(config.model, shape, True)
+        return resp, "json_schema"
+
+    if response_format is json_object:
+        resp, mode = _create(json_object), "json_object"
+    elif known is None:
+        with registry.probe_lock(config.model, shape):  # concurrent shards wait for one probe
+            known = registry.strict_supported(config.model, shape)
+            if known is False:
+                resp, mode = _create(json_object), "json_object"
+            else:
+                resp, mode = _create_strict()
+    else:
+        resp, mode = _create_strict()
 
     content = resp.choices[0].message.content
     grade = json.loads(content)
@@ -225,7 +421,11 @@ def judge_trainee_with_groq(
         "seed": config.seed,
         "temperature": config.temperature,
         "strict_schema": config.strict_schema,
+        "response_format": mode,
     }
+    if stream_info is not None:
+        started = stream_info.pop("started")
+        meta["stream"] = {**stream_info, "total_s": round(time.perf_counter() - started, 3)}
     return grade, meta
 
 
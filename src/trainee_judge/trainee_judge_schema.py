@@ -16,29 +16,35 @@ from __future__ import annotations
 import json
 import hashlib
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Mapping
 from dotenv import load_dotenv
 from src.utils.paths import default_rubric_path
 
+from .compiled_rubric import CompiledRubric, load_compiled_rubric
+
 DEFAULT_RUBRIC_PATH = default_rubric_path()
 load_dotenv()
 
-def load_rubric(rubric_path: str | Path = DEFAULT_RUBRIC_PATH) -> Dict[str, Any]:
-    """Load rubric JSON from disk."""
-    path = Path(rubric_path)
-    if not path.exists():
-        raise FileNotFoundError(f"Rubric not found: {path}")
-    with path.open("r", encoding="utf-8") as f:
-        return json.load(f)
+def load_rubric(rubric_path: str | Path = DEFAULT_RUBRIC_PATH) -> CompiledRubric:
+    """Load rubric JSON from disk (compiled; cached until the file changes)."""
+    return load_compiled_rubric(rubric_path)
 
 
 def rubric_fingerprint(rubric: Dict[str, Any]) -> str:
     """Deterministic SHA-256 hash of the rubric JSON (useful for audit logs)."""
+    if isinstance(rubric, CompiledRubric):
+        return rubric.fingerprint
+    return _raw_fingerprint(rubric)
+
+
+def _raw_fingerprint(rubric: Mapping[str, Any]) -> str:
     canonical = json.dumps(rubric, ensure_ascii=False, sort_keys=True).encode("utf-8")
     return hashlib.sha256(canonical).hexdigest()
 
 
 def _item_ids(rubric: Dict[str, Any]) -> List[str]:
+    if isinstance(rubric, CompiledRubric):
+        return list(rubric.item_ids)
     items = rubric.get("items", [])
     if not isinstance(items, list) or not items:
         raise ValueError("Rubric must contain a non-empty 'items' list.")
@@ -133,7 +139,13 @@ def build_response_format(
     name: str = "trainee_rubric_grade",
     strict: bool = True,
 ) -> Dict[str, Any]:
-    """Groq response_format payload for Structured Outputs."""
+    """Groq response_format payload for Structured Outputs (prebuilt for compiled rubrics)."""
+    if isinstance(rubric, CompiledRubric):
+        return rubric.response_format(name=name, strict=strict)
+    return _build_response_format(rubric, name=name, strict=strict)
+
+
+def _build_response_format(rubric: Dict[str, Any], *, name: str, strict: bool) -> Dict[str, Any]:
     return {
         "type": "json_schema",
         "json_schema": {
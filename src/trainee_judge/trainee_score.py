@@ -27,10 +27,14 @@ from __future__ import annotations
 import json
 import re
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Pattern, Sequence, Tuple, Union
 from dotenv import load_dotenv
+from src.state.conversation import ConversationLog, HistoryLike
 from src.utils.paths import default_rubric_path
 
+from .compiled_rubric import CompiledRubric, compile_rubric, load_compiled_rubric, risk_patterns_for
+from .gates import RISK_GATE, evaluate_gates
+
 # Optional: reuse the same default rubric path convention as other files.
 DEFAULT_RUBRIC_PATH = default_rubric_path()
 load_dotenv()
@@ -52,82 +56,56 @@ def normalize(text: str) -> str:
     return t
 
 
-def any_match(patterns: List[str], text: str) -> bool:
+def any_match(patterns: Sequence[Union[str, Pattern[str]]], text: str) -> bool:
+    """Patterns may be strings or precompiled (CompiledRubric) regexes."""
     for p in patterns or []:
-        if re.search(p, text, flags=re.IGNORECASE):
+        if (p.search(text) if isinstance(p, re.Pattern) else re.search(p, text, flags=re.IGNORECASE)):
             return True
     return False
 
 
-def _patterns_for_language(obj: Dict[str, Any], language: str) -> List[str]:
-    """
-    Choose patterns for a language with fallback.
-    """
-    if language == "Arabic":
-        return (obj.get("patterns_ar") or []) or (obj.get("patterns_en") or [])
-    return (obj.get("patterns_en") or []) or (obj.get("patterns_ar") or [])
-
-
 # ----------------------------
 # Rubric loading
 # ----------------------------
-def load_rubric(rubric_path: str | Path = DEFAULT_RUBRIC_PATH) -> Dict[str, Any]:
-    path = Path(rubric_path)
-    if not path.exists():
-        raise FileNotFoundError(f"Rubric not found: {path}")
-    with path.open("r", encoding="utf-8") as f:
-        return json.load(f)
+def load_rubric(rubric_path: str | Path = DEFAULT_RUBRIC_PATH) -> CompiledRubric:
+    return load_compiled_rubric(rubric_path)
 
 
 # ----------------------------
 # Gate detection (deterministic)
 # ----------------------------
-_DEFAULT_PATIENT_RISK_CUES = {
-    "patterns_en": [r"\b(suicid|kill myself|end my life|self[- ]harm|hurt myself)\b"],
-    "patterns_ar": [r"(انتحار|اقتل نفسي|انهي حياتي|ايذاء النفس|اؤذي نفسي)"],
-}
-
-
-def patient_risk_positive(conversation_history: List[Dict[str, str]], rubric: Dict[str, Any], language: str) -> bool:
+def patient_risk_positive(conversation_history: HistoryLike, rubric: Dict[str, Any], language: str) -> bool:
     """
     Detect patient suicidality/self-harm cues from patient turns (role == 'assistant').
     Uses rubric.patient_cues.risk_positive patterns when present, else defaults.
     """
-    cues = (rubric or {}).get("patient_cues", {}).get("risk_positive", _DEFAULT_PATIENT_RISK_CUES)
-    patterns = _patterns_for_language(cues, language)
-    patient_text = " ".join(normalize(m.get("content", "")) for m in conversation_history if m.get("role") == "assistant")
+    if isinstance(rubric, CompiledRubric) or (rubric and rubric.get("items")):
+        return evaluate_gates(conversation_history, rubric, language).active(RISK_GATE)  # memoized per transcript
+    patterns = risk_patterns_for(rubric, language)
+    if isinstance(conversation_history, ConversationLog):
+        # Role view + per-turn normalization cache: no re-walk/re-normalize of the full history.
+        patient_text = " ".join(t.normalized for t in conversation_history.by_role("assistant"))
+    else:
+        patient_text = " ".join(normalize(m.get("content", "")) for m in conversation_history if m.get("role") == "assistant")
     return any_match(patterns, patient_text)
 
 
-def is_gate_active(gate: Optional[str], conversation_history: List[Dict[str, str]], rubric: Dict[str, Any], language: str) -> bool:
+def is_gate_active(gate: Optional[str], conversation_history: HistoryLike, rubric: Dict[str, Any], language: str) -> bool:
     """
     Returns True if a rubric item gate condition is active (meaning the item should be scored).
-    Unknown gates default to True (so you don't silently hide items).
+    Unknown gates default to True (so you don't silently hide items) and are reported in
+    the scored output. Gates are defined in gates.py / rubric["gates"].
     """
     if not gate:
         return True
-    if gate == "patient_risk_positive":
-        return patient_risk_positive(conversation_history, rubric, language)
-    # Add more gates here as you design them.
-    return True
+    return evaluate_gates(conversation_history, rubric, language).active(gate)
 
 
 # ----------------------------
 # Scoring
 # ----------------------------
 def _index_rubric_items(rubric: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
-    items = rubric.get("items", [])
-    if not isinstance(items, list) or not items:
-        raise ValueError("Rubric must contain a non-empty 'items' list.")
-    out: Dict[str, Dict[str, Any]] = {}
-    for it in items:
-        item_id = str(it.get("id", "")).strip()
-        if not item_id:
-            raise ValueError("Found rubric item with empty 'id'.")
-        if item_id in out:
-            raise ValueError(f"Duplicate rubric item id: '{item_id}'")
-        out[item_id] = it
-    return out
+    return compile_rubric(rubric).item_index  # validated + indexed once per rubric version
 
 
 def _ensure_grade_has_all_items(
@@ -155,7 +133,7 @@ def _ensure_grade_has_all_items(
 
 
 def score_from_judge_output(
-    conversation_history: List[Dict[str, str]],
+    conversation_history: HistoryLike,
     rubric: Dict[str, Any],
     language: str,
     judge_grade: Dict[str, Any],
@@ -167,9 +145,11 @@ def score_from_judge_output(
 
     Returns a dict ready to display in Streamlit.
     """
-    item_index = _index_rubric_items(rubric)
-    item_ids = list(item_index.keys())
+    rubric = compile_rubric(rubric)
+    item_index = rubric.item_index
+    item_ids = list(rubric.item_ids)
     judge_grade = _ensure_grade_has_all_items(judge_grade, item_ids)
+    gates = evaluate_gates(conversation_history, rubric, language)  # each gate evaluated once per transcript
 
     pass_cfg = rubric.get("pass_criteria") or {}
     min_percent = float(pass_cfg.get("min_percent", 0.7))
@@ -187,7 +167,7 @@ def score_from_judge_output(
         it = item_index[item_id]
         weight = float(it.get("weight", 0) or 0)
         gate = it.get("gate")
-        gate_active = is_gate_active(gate, conversation_history, rubric, language)
+        gate_active = gates.active(gate)
 
         jr = (judge_grade.get("item_results") or {}).get(item_id) or {}
         achieved = bool(jr.get("achieved", False))
@@ -253,6 +233,8 @@ def score_from_judge_output(
         "flags": flags,
         "items": scored_items,
         "summary_feedback": summary_feedback,
+        "gates": gates.as_dict(),
+        "unknown_gates": gates.unknown,
     }
 
 
@@ -17,19 +17,27 @@ from src.ui.patient_eval_tab import render_patient_eval_tab
 from src.ui.trainee_eval_tab import render_trainee_eval_tab
 
 
-def render_app(*, patient_simulator: Any, patient_evaluator: Any, trainee_pipeline: Any, legacy_regex_evaluator: Optional[Any] = None) -> None:
-    ensure_initialized()
-
+def render_app(
+    *,
+    patient_simulator: Any,
+    patient_evaluator: Any,
+    trainee_pipeline: Any,
+    legacy_regex_evaluator: Optional[Any] = None,
+    speculative: Optional[Any] = None,
+) -> None:
     st.set_page_config(page_title="Simulated Patient Chatbot", layout="wide")
+    ensure_initialized()
     st.title("Simulated Patient Chatbot")
 
     tab_chat, tab_patient_eval, tab_trainee_eval = st.tabs(["Chat", "Evaluate Patient", "Evaluate Trainee"])
 
     with tab_chat:
-        render_chat_tab(patient_simulator=patient_simulator)
+        render_chat_tab(patient_simulator=patient_simulator, speculative=speculative)
 
     with tab_patient_eval:
-        render_patient_eval_tab(patient_evaluator=patient_evaluator)
+        render_patient_eval_tab(patient_evaluator=patient_evaluator, speculative=speculative)
 
     with tab_trainee_eval:
-        render_trainee_eval_tab(trainee_pipeline=trainee_pipeline, legacy_regex_evaluator=legacy_regex_evaluator)
+        render_trainee_eval_tab(
+            trainee_pipeline=trainee_pipeline, legacy_regex_evaluator=legacy_regex_evaluator, speculative=speculative
+        )
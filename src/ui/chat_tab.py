@@ -6,21 +6,100 @@ Chat UI for the simulated patient.
 from __future__ import annotations
 
 import os
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 import streamlit as st
 
-from src.patient_sim.interfaces import PatientSimConfig
+from src.patient_sim.context_window import build_context_window
+from src.patient_sim.interfaces import PatientSimConfig, ReplyInfo
 from src.patient_sim.prompts import build_system_prompt
-from src.state.session_keys import ACTIVE_CONDITION, ACTIVE_LANGUAGE, CONVERSATION_HISTORY
-from src.state.session_store import append_message, clear_all, get_history, set_conversation
+from src.patient_sim.timing import TurnTiming, timed_stream
+from src.state.session_keys import (
+    ACTIVE_CONDITION,
+    ACTIVE_LANGUAGE,
+    CONVERSATION_HISTORY,
+    PATIENT_EVAL_CONFIG,
+    RUBRIC,
+    TRAINEE_RUN_SETTINGS,
+)
+from src.state.session_store import (
+    append_message,
+    clear_all,
+    get_history,
+    get_turn_timings,
+    record_turn_timing,
+    session_id,
+    set_conversation,
+)
+from src.trainee_judge.trainee_judge_groq import GroqJudgeConfig
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 
 def _init_history(condition: str, language: str) -> List[Dict[str, str]]:
     return [{"role": "system", "content": build_system_prompt(condition, language)}]
 
 
-def render_chat_tab(*, patient_simulator: Any) -> None:
+def _render_message(message: Dict[str, str]) -> None:
+    if message.get("role") == "user":
+        st.chat_message("user").markdown(message.get("content", ""))
+    elif message.get("role") == "assistant":
+        st.chat_message("assistant").markdown(message.get("content", ""))
+
+
+def _stream_patient_reply(patient_simulator: Any, history: List[Dict[str, str]], cfg: PatientSimConfig) -> str:
+    """Render the patient reply incrementally and return the full text once complete."""
+    window, context = build_context_window(history, config=cfg)
+    timing = TurnTiming(model=cfg.model)
+    info = ReplyInfo()
+    with st.chat_message("assistant"):
+        reply = st.write_stream(timed_stream(patient_simulator.generate_stream(window, config=cfg, info=info), timing))
+
+    if not isinstance(reply, str):
+        # st.write_stream returns a list when non-text chunks are mixed in.
+        reply = "".join(str(x) for x in reply)
+
+    record_turn_timing({**timing.as_dict(), "context": context.as_dict(), "usage": info.as_dict()})
+    logger.info(
+        "patient_turn model=%s ttft_s=%.3f total_s=%.3f chars=%d prompt_tokens~%d saved~%d "
+        "usage(prompt=%s completion=%s reasoning=%s) finish=%s attempts=%d budget=%s/%s",
+        timing.model,
+        timing.ttft_s or 0.0,
+        timing.total_s or 0.0,
+        timing.chars,
+        context.window_tokens,
+        context.tokens_saved,
+        info.prompt_tokens,
+        info.completion_tokens,
+        info.reasoning_tokens,
+        info.finish_reason,
+        info.attempts,
+        info.max_completion_tokens,
+        info.reasoning_effort,
+    )
+    return reply
+
+
+def _schedule_speculation(speculative: Any) -> None:
+    """Pre-evaluate the transcript in the background with the evaluation tabs' last-used settings."""
+    settings = st.session_state.get(TRAINEE_RUN_SETTINGS) or {}
+    try:
+        speculative.schedule(
+            get_history(),
+            session_id=session_id(),
+            condition=st.session_state.get(ACTIVE_CONDITION, ""),
+            language=st.session_state.get(ACTIVE_LANGUAGE, "English"),
+            rubric=st.session_state.get(RUBRIC),
+            judge_config=settings.get("judge_config") or GroqJudgeConfig(),
+            cascade=settings.get("cascade"),
+            patient_config=st.session_state.get(PATIENT_EVAL_CONFIG),
+        )
+    except Exception as e:  # never let speculation break the chat
+        logger.warning("speculative evaluation not scheduled: %s", e)
+
+
+def render_chat_tab(*, patient_simulator: Any, speculative: Optional[Any] = None) -> None:
     condition = st.text_input("Enter the patient's condition (Ex: depression, anxiety):").strip()
     language = st.selectbox("Select the language for responses:", ["English", "Arabic"], index=0)
 
@@ -53,25 +132,39 @@ def render_chat_tab(*, patient_simulator: Any) -> None:
 
     user_message = st.chat_input("Type your message here...")
 
+    needs_reply = False
     if user_message:
         history = get_history()
         if not history:
             st.warning("Click Start / Reset conversation first.")
+        elif not os.getenv("GROQ_API_KEY"):
+            st.error("GROQ_API_KEY is missing. Add it to your environment or .env file.")
         else:
-            if not os.getenv("GROQ_API_KEY"):
-                st.error("GROQ_API_KEY is missing. Add it to your environment or .env file.")
-            else:
-                append_message("user", user_message)
-                try:
-                    cfg = PatientSimConfig()
-                    assistant_response = patient_simulator.generate(get_history(), config=cfg)
-                    append_message("assistant", assistant_response)
-                except Exception as e:
-                    st.error(f"LLM call failed: {e}")
+            append_message("user", user_message)
+            needs_reply = True
 
     with chat_box:
         for message in get_history():
-            if message.get("role") == "user":
-                st.chat_message("user").markdown(message.get("content", ""))
-            elif message.get("role") == "assistant":
-                st.chat_message("assistant").markdown(message.get("content", ""))
+            _render_message(message)
+
+        if needs_reply:
+            try:
+                cfg = PatientSimConfig()
+                assistant_response = _stream_patient_reply(patient_simulator, get_history(), cfg)
+                # Only the complete reply enters the session history.
+                append_message("assistant", assistant_response)
+                if speculative is not None:
+                    _schedule_speculation(speculative)
+            except Exception as e:
+                st.error(f"LLM call failed: {e}")
+
+    timings = get_turn_timings()
+    if timings:
+        last = timings[-1]
+        st.caption(
+            f"Last patient reply — TTFT: {round((last.get('ttft_s') or 0.0) * 1000)} ms · "
+            f"total: {round((last.get('total_s') or 0.0) * 1000)} ms · "
+            f"prompt tokens saved: ~{(last.get('context') or {}).get('tokens_saved', 0)} · "
+            f"completion/reasoning tokens: {(last.get('usage') or {}).get('completion_tokens')}"
+            f"/{(last.get('usage') or {}).get('reasoning_tokens')}"
+        )
@@ -8,16 +8,16 @@ Default implementation uses DeepEval, but the UI calls an abstract evaluator.
 from __future__ import annotations
 
 import os
-from typing import Any
+from typing import Any, Optional
 
 import streamlit as st
 
 from src.evaluation.patient.interfaces import PatientEvalConfig
-from src.state.session_keys import ACTIVE_CONDITION, ACTIVE_LANGUAGE
+from src.state.session_keys import ACTIVE_CONDITION, ACTIVE_LANGUAGE, PATIENT_EVAL_CONFIG
 from src.state.session_store import conversation_ready, get_history
 
 
-def render_patient_eval_tab(*, patient_evaluator: Any) -> None:
+def render_patient_eval_tab(*, patient_evaluator: Any, speculative: Optional[Any] = None) -> None:
     st.subheader("Patient evaluation")
 
     if not getattr(patient_evaluator, "available", True):
@@ -35,15 +35,24 @@ def render_patient_eval_tab(*, patient_evaluator: Any) -> None:
     role_threshold = st.slider("Role adherence threshold", 0.0, 1.0, 0.8, 0.05)
     geval_threshold = st.slider("Conversation quality threshold", 0.0, 1.0, 0.7, 0.05)
 
+    cfg = PatientEvalConfig(role_adherence_threshold=role_threshold, convo_quality_threshold=geval_threshold)
+    st.session_state[PATIENT_EVAL_CONFIG] = cfg  # used by background pre-evaluation (SPECULATIVE_PATIENT_EVAL=1)
+    eval_kwargs = {
+        "condition": st.session_state.get(ACTIVE_CONDITION, ""),
+        "language": st.session_state.get(ACTIVE_LANGUAGE, "English"),
+        "config": cfg,
+    }
+
     if st.button("Run patient evaluation"):
         try:
-            cfg = PatientEvalConfig(role_adherence_threshold=role_threshold, convo_quality_threshold=geval_threshold)
-            out = patient_evaluator.evaluate(
-                get_history(),
-                condition=st.session_state.get(ACTIVE_CONDITION, ""),
-                language=st.session_state.get(ACTIVE_LANGUAGE, "English"),
-                config=cfg,
-            )
+            pre = None
+            if speculative is not None and speculative.patient_enabled:
+                pre = speculative.patient_result(get_history(), **eval_kwargs, wait_s=120.0)
+            if pre is not None:
+                out = pre[0]
+                st.caption(f"Precomputed in the background ({pre[1]['run_s']}s evaluation time saved).")
+            else:
+                out = patient_evaluator.evaluate(get_history(), **eval_kwargs)
 
             for m in out.get("metrics", []):
                 with st.expander(f"{m.get('class')} results", expanded=True):
@@ -13,20 +13,25 @@ from __future__ import annotations
 
 import json
 import os
-from typing import Any, Optional
+from typing import Any, Callable, Optional, Tuple
 
 import streamlit as st
 
+from src.evaluation.trainee.cascade import CascadeConfig
+from src.export.parquet_export import EvaluationRecord, default_results_root, export_records
 from src.state.session_keys import (
     ACTIVE_CONDITION,
     ACTIVE_LANGUAGE,
     RUBRIC,
     RUBRIC_PATH,
+    SESSION_ID,
     TRAINEE_GRADE,
     TRAINEE_META,
+    TRAINEE_RESULT_KEY,
+    TRAINEE_RUN_SETTINGS,
     TRAINEE_SCORED,
 )
-from src.state.session_store import conversation_ready, get_history
+from src.state.session_store import conversation_ready, get_history, save_trainee_result
 from src.trainee_judge.trainee_judge_groq import GroqJudgeConfig
 
 
@@ -37,7 +42,31 @@ def _safe_float(x: Any, default: float = 0.0) -> float:
         return default
 
 
-def render_trainee_eval_tab(*, trainee_pipeline: Any, legacy_regex_evaluator: Optional[Any] = None) -> None:
+def _live_item_table(rb: Any) -> Tuple[Any, Callable[[str, Any], None]]:
+    """Placeholder checklist filled row by row as judge items arrive (before scoring)."""
+    placeholder = st.empty()
+    index = getattr(rb, "item_index", None) or {str(it.get("id")): it for it in rb.get("items", [])}
+    rows: dict = {}
+
+    def on_item(item_id: str, result: Any) -> None:
+        rows[item_id] = {
+            "id": item_id,
+            "desc": (index.get(item_id) or {}).get("desc", ""),
+            "achieved": bool((result or {}).get("achieved")),
+            "confidence": round(_safe_float((result or {}).get("confidence"), 0.0), 3),
+            "evidence_turns": ",".join(str(x) for x in (result or {}).get("evidence_turns") or []),
+            "rationale": (result or {}).get("rationale", ""),
+        }
+        with placeholder.container():
+            st.caption(f"Judging… {len(rows)}/{len(index)} items received (final scoring when the judge finishes).")
+            st.dataframe(list(rows.values()), use_container_width=True)
+
+    return placeholder, on_item
+
+
+def render_trainee_eval_tab(
+    *, trainee_pipeline: Any, legacy_regex_evaluator: Optional[Any] = None, speculative: Optional[Any] = None
+) -> None:
     st.subheader("Trainee evaluation (LLM judge + deterministic scorer)")
     st.caption("Evaluates the trainee using the full conversation + an examiner-editable rubric JSON.")
 
@@ -93,7 +122,7 @@ def render_trainee_eval_tab(*, trainee_pipeline: Any, legacy_regex_evaluator: Op
 
     # -------- Judge settings --------
     st.markdown("### Judge settings")
-    col_j1, col_j2, col_j3, col_j4 = st.columns(4)
+    col_j1, col_j2, col_j3, col_j4, col_j5 = st.columns(5)
 
     with col_j1:
         model = st.selectbox("Judge model", ["openai/gpt-oss-120b", "openai/gpt-oss-20b"], index=0)
@@ -103,6 +132,28 @@ def render_trainee_eval_tab(*, trainee_pipeline: Any, legacy_regex_evaluator: Op
         seed = st.number_input("Seed (best effort)", min_value=0, max_value=10_000_000, value=42, step=1)
     with col_j4:
         reasoning_effort = st.selectbox("Reasoning effort", ["none", "low", "medium", "high"], index=2)
+    with col_j5:
+        use_cache = st.checkbox("Use judge cache", value=True, help="Untick to force a fresh judge call.")
+        incremental = st.checkbox(
+            "Incremental", value=False, help="Judge only turns added since the last evaluation and items not yet achieved."
+        )
+        shard_size = st.number_input(
+            "Items per shard", min_value=0, max_value=50, value=0, step=1,
+            help="0 = one judge call for all items; otherwise items are judged in parallel shards of this size.",
+        )
+        ensemble_size = st.number_input(
+            "Ensemble samples", min_value=1, max_value=9, value=1, step=1,
+            help="Up to N judge samples, majority vote per item; stops early once every item is decided.",
+        )
+        use_cascade = st.checkbox(
+            "Cascade", value=False, help="Regex pre-screen, then gpt-oss-20b, escalating only uncertain items to gpt-oss-120b."
+        )
+        stream_items = st.checkbox(
+            "Stream items", value=True, help="Show each checklist item as soon as the judge has produced it."
+        )
+        compact = st.checkbox(
+            "Compact transcript", value=False, help="Send turns as `T3 trainee: ...` lines instead of JSON objects (fewer input tokens)."
+        )
 
     config = GroqJudgeConfig(
         model=model,
@@ -112,28 +163,108 @@ def render_trainee_eval_tab(*, trainee_pipeline: Any, legacy_regex_evaluator: Op
         reasoning_format="hidden",
         max_completion_tokens=1400,
         strict_schema=bool(strict_schema),
+        use_cache=bool(use_cache),
+        incremental=bool(incremental),
+        shard_size=int(shard_size) or None,
+        transcript_format="compact" if compact else "json",
+        ensemble_size=int(ensemble_size),
+        ensemble_temperature=0.7 if int(ensemble_size) > 1 else None,
     )
+    cascade = CascadeConfig() if use_cascade else None
+    # The chat tab pre-evaluates each new exchange in the background with these settings.
+    st.session_state[TRAINEE_RUN_SETTINGS] = {"judge_config": config, "cascade": cascade}
+    run_kwargs = {
+        "language": st.session_state.get(ACTIVE_LANGUAGE, "English"),
+        "condition": st.session_state.get(ACTIVE_CONDITION, ""),
+        "rubric": rb,
+        "judge_config": config,
+        "cascade": cascade,
+    }
+    use_speculative = speculative is not None and config.use_cache
+
+    if use_speculative:
+        pre = speculative.trainee_result(get_history(), **run_kwargs)
+        if pre is not None and st.session_state.get(TRAINEE_RESULT_KEY) != pre[1]["key"]:
+            result, info = pre
+            save_trainee_result(grade=result.judge_grade, meta={**(result.judge_meta or {}), "speculative": info}, scored=result.scored)
+            st.session_state[TRAINEE_RESULT_KEY] = info["key"]
+            st.info(
+                "Showing the background pre-evaluation of the current transcript "
+                f"(ready {info['ready_after_exchange_s']}s after the last exchange)."
+            )
 
     run_col1, run_col2 = st.columns([1, 2])
     with run_col1:
         if st.button("Run trainee evaluation (LLM judge)"):
             try:
-                result = trainee_pipeline.run(
-                    get_history(),
-                    language=st.session_state.get(ACTIVE_LANGUAGE, "English"),
-                    condition=st.session_state.get(ACTIVE_CONDITION, ""),
-                    rubric=rb,
-                    judge_config=config,
-                )
-                st.session_state[TRAINEE_GRADE] = result.judge_grade
-                st.session_state[TRAINEE_META] = result.judge_meta
-                st.session_state[TRAINEE_SCORED] = result.scored
-                st.success("Trainee evaluation completed.")
+                # A background pre-evaluation of this exact transcript/settings (finished or in flight) wins.
+                pre = speculative.trainee_result(get_history(), **run_kwargs, wait_s=120.0) if use_speculative else None
+                if pre is not None:
+                    result, info = pre
+                    judge_meta = {**(result.judge_meta or {}), "speculative": info}
+                else:
+                    live, on_item = _live_item_table(rb) if stream_items else (None, None)
+                    result = trainee_pipeline.run(get_history(), **run_kwargs, on_item=on_item)
+                    if live is not None:
+                        live.empty()  # the scored checklist below replaces the live one
+                    judge_meta = result.judge_meta or {}
+                save_trainee_result(grade=result.judge_grade, meta=judge_meta, scored=result.scored)
+                st.session_state[TRAINEE_RESULT_KEY] = speculative.trainee_key(get_history(), **run_kwargs) if speculative else None
+                if judge_meta.get("speculative"):
+                    st.success(
+                        "Trainee evaluation completed (precomputed in the background, "
+                        f"{judge_meta['speculative']['run_s']}s judge time saved)."
+                    )
+                elif (judge_meta.get("cache") or {}).get("hit"):
+                    st.success("Trainee evaluation completed (served from judge cache).")
+                elif (judge_meta.get("incremental") or {}).get("mode") in ("delta", "carried", "unchanged"):
+                    inc = judge_meta["incremental"]
+                    st.success(
+                        f"Trainee evaluation completed incrementally ({inc['mode']}; "
+                        f"{len(inc.get('open_items', []))} open items, turns {inc.get('judged_turns') or '-'})."
+                    )
+                elif judge_meta.get("cascade"):
+                    share = judge_meta["cascade"]["resolved_share"]
+                    st.success(
+                        "Trainee evaluation completed (cascade: "
+                        + ", ".join(f"{k} {round(100 * v)}%" for k, v in share.items() if v)
+                        + f"; {judge_meta['cascade'].get('total_tokens') or 0} tokens)."
+                    )
+                elif judge_meta.get("ensemble"):
+                    ens = judge_meta["ensemble"]
+                    st.success(
+                        f"Trainee evaluation completed ({ens['completed']} judge samples, mean item agreement "
+                        f"{round(100 * ens['mean_agreement'])}%; early stopping saved {ens['calls_saved']} calls)."
+                    )
+                elif (judge_meta.get("stream") or {}).get("ttfi_s") is not None:
+                    sm = judge_meta["stream"]
+                    st.success(f"Trainee evaluation completed (first item after {sm['ttfi_s']}s, all in {sm['total_s']}s).")
+                elif judge_meta.get("sharded"):
+                    sh = judge_meta["sharded"]
+                    st.success(
+                        f"Trainee evaluation completed ({sh['shards']} shards in {sh['wall_s']}s wall-clock, "
+                        f"{sh['sum_shard_s']}s summed; {len(sh.get('failed_shards') or [])} failed)."
+                    )
+                else:
+                    st.success("Trainee evaluation completed.")
             except Exception as e:
                 st.error(f"Trainee evaluation failed: {e}")
 
     with run_col2:
-        st.caption("If strict schema fails on a model, uncheck **Strict JSON Schema** (fallback uses JSON object mode).")
+        st.caption("Models that reject strict schema are remembered and sent JSON object mode directly; uncheck **Strict JSON Schema** to force it.")
+        report = getattr(trainee_pipeline.judge_fn, "report", None)
+        if callable(report):
+            total = report().get("total", {})
+            st.caption(
+                f"Judge cache: {total.get('hits', 0)} hits / {total.get('misses', 0)} misses "
+                f"(hit rate {round(100 * float(total.get('hit_rate', 0.0)), 1)}%)"
+            )
+        if speculative is not None and speculative.enabled:
+            spec = speculative.report()
+            st.caption(
+                f"Background pre-evaluation: {spec['completed']} completed, {spec['in_flight']} running, "
+                f"{spec['debounced']} debounced, {spec['hits']} used."
+            )
 
     scored = st.session_state.get(TRAINEE_SCORED)
     if not scored:
@@ -191,6 +322,18 @@ def render_trainee_eval_tab(*, trainee_pipeline: Any, legacy_regex_evaluator: Op
             file_name="trainee_scored.json",
             mime="application/json",
         )
+        if st.button("Append to results dataset (Parquet)"):
+            record = EvaluationRecord(
+                conversation=get_history(),
+                condition=st.session_state.get(ACTIVE_CONDITION, ""),
+                language=st.session_state.get(ACTIVE_LANGUAGE, "English"),
+                session_id=st.session_state.get(SESSION_ID, ""),
+                scored=scored,
+                judge_grade=grade,
+                judge_meta=meta,
+            )
+            written = export_records([record], default_results_root())
+            st.success(f"Exported to {default_results_root()}: {written}")
 
     if legacy_regex_evaluator is not None:
         with st.expander("Legacy (regex) evaluation baseline", expanded=False):
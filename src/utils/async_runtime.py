@@ -0,0 +1,133 @@
+"""src.utils.async_runtime
+
+A single process-wide asyncio event loop running in a daemon thread.
+
+Why:
+- Streamlit reruns the script in fresh threads without a running loop, and
+  `asyncio.run()` per call would throw away pooled connections every time.
+- Async HTTP clients (httpx) bind their connection pool to one loop; keeping that
+  loop alive for the whole process lets every session share the same pool.
+
+Sync callers use `run_sync(coro)` / `iterate_sync(agen)`; async callers on a
+*different* loop use `await run_on_shared_loop(coro)` / `iterate_on_shared_loop(agen)`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import queue
+import threading
+from typing import Any, AsyncIterator, Callable, Coroutine, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+_END = object()
+
+_lock = threading.Lock()
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_thread: Optional[threading.Thread] = None
+
+
+def _run_forever(loop: asyncio.AbstractEventLoop) -> None:
+    asyncio.set_event_loop(loop)
+    loop.run_forever()
+
+
+def shared_loop() -> asyncio.AbstractEventLoop:
+    """Return the process-wide background loop, starting it on first use."""
+    global _loop, _thread
+    with _lock:
+        if _loop is None or _loop.is_closed() or _thread is None or not _thread.is_alive():
+            _loop = asyncio.new_event_loop()
+            _thread = threading.Thread(target=_run_forever, args=(_loop,), name="shared-async-loop", daemon=True)
+            _thread.start()
+        return _loop
+
+
+def run_sync(coro: Coroutine[Any, Any, T], *, timeout: Optional[float] = None) -> T:
+    """Run `coro` on the shared loop and block the calling thread for the result."""
+    loop = shared_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coro.close()
+        raise RuntimeError("run_sync() called from the shared loop itself; await the coroutine instead.")
+    fut = asyncio.run_coroutine_threadsafe(coro, loop)
+    try:
+        return fut.result(timeout=timeout)
+    except BaseException:
+        fut.cancel()
+        raise
+
+
+async def run_on_shared_loop(coro: Coroutine[Any, Any, T]) -> T:
+    """Await `coro` on the shared loop from any loop (no-op hop if already there)."""
+    loop = shared_loop()
+    if asyncio.get_running_loop() is loop:
+        return await coro
+    fut = asyncio.run_coroutine_threadsafe(coro, loop)
+    try:
+        return await asyncio.wrap_future(fut)
+    except asyncio.CancelledError:
+        fut.cancel()
+        raise
+
+
+class _Raised:
+    __slots__ = ("exc",)
+
+    def __init__(self, exc: BaseException) -> None:
+        self.exc = exc
+
+
+async def _pump(agen: AsyncIterator[T], put: Callable[[Any], None]) -> None:
+    try:
+        async for item in agen:
+            put(item)
+    except BaseException as e:  # propagate to the consumer, including cancellation
+        put(_Raised(e))
+    finally:
+        put(_END)
+
+
+def iterate_sync(agen: AsyncIterator[T]) -> Iterator[T]:
+    """Consume an async iterator (driven on the shared loop) from a blocking thread."""
+    q: "queue.Queue[Any]" = queue.Queue()
+    fut = asyncio.run_coroutine_threadsafe(_pump(agen, q.put), shared_loop())
+    try:
+        while True:
+            item = q.get()
+            if item is _END:
+                return
+            if isinstance(item, _Raised):
+                raise item.exc
+            yield item
+    finally:
+        fut.cancel()
+
+
+async def iterate_on_shared_loop(agen: AsyncIterator[T]) -> AsyncIterator[T]:
+    """Consume an async iterator driven on the shared loop from any other loop."""
+    loop = shared_loop()
+    caller = asyncio.get_running_loop()
+    if caller is loop:
+        async for item in agen:
+            yield item
+        return
+
+    q: "asyncio.Queue[Any]" = asyncio.Queue()
+    fut = asyncio.run_coroutine_threadsafe(
+        _pump(agen, lambda x: caller.call_soon_threadsafe(q.put_nowait, x)), loop
+    )
+    try:
+        while True:
+            item = await q.get()
+            if item is _END:
+                return
+            if isinstance(item, _Raised):
+                raise item.exc
+            yield item
+    finally:
+        fut.cancel()
@@ -0,0 +1,238 @@
+"""src.utils.cache
+
+Small pluggable key/value caches for JSON-serializable values.
+
+- `LRUTTLCache`: in-process, bounded by entry count, optional TTL.
+- `SQLiteCache`: on-disk tier (WAL mode), bounded by entry count, optional TTL,
+  least-recently-used eviction. Safe to share across threads and processes.
+- `TieredCache`: memory in front of disk; disk hits are promoted.
+
+All caches expose `get(key) -> Optional[value]`, `set(key, value)`, `clear()` and
+`stats` (hit/miss/eviction counters).
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional, Protocol, Tuple
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    sets: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        n = self.hits + self.misses
+        return (self.hits / n) if n else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        d = asdict(self)
+        d["hit_rate"] = round(self.hit_rate, 4)
+        return d
+
+
+class Cache(Protocol):
+    stats: CacheStats
+
+    def get(self, key: str) -> Optional[Any]:
+        ...
+
+    def set(self, key: str, value: Any) -> None:
+        ...
+
+    def clear(self) -> None:
+        ...
+
+
+class LRUTTLCache:
+    def __init__(self, *, max_entries: int = 1024, ttl_s: Optional[float] = None) -> None:
+        if max_entries <= 0:
+            raise ValueError("max_entries must be > 0")
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.stats = CacheStats()
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            stored_at, value = entry
+            if self.ttl_s is not None and time.time() - stored_at > self.ttl_s:
+                del self._data[key]
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.stats.hits += 1
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.time(), value)
+            self._data.move_to_end(key)
+            self.stats.sets += 1
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.stats.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class SQLiteCache:
+    def __init__(
+        self,
+        path: str | Path,
+        *,
+        max_entries: int = 10_000,
+        ttl_s: Optional[float] = None,
+        table: str = "cache",
+    ) -> None:
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name: {table!r}")
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.table = table
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_accessed ON {table}(accessed_at)")
+        self._conn.commit()
+        self._count = self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def __len__(self) -> int:
+        return self._count
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(f"SELECT value, stored_at FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats.misses += 1
+                return None
+            value, stored_at = row
+            if self.ttl_s is not None and now - stored_at > self.ttl_s:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self._conn.commit()
+                self._count = max(0, self._count - 1)
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return None
+            self._conn.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.stats.hits += 1
+        return json.loads(value)
+
+    def set(self, key: str, value: Any) -> None:
+        now = time.time()
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            existed = self._conn.execute(f"SELECT 1 FROM {self.table} WHERE key = ?", (key,)).fetchone() is not None
+            self._conn.execute(
+                f"INSERT INTO {self.table}(key, value, stored_at, accessed_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, stored_at = excluded.stored_at, "
+                "accessed_at = excluded.accessed_at",
+                (key, payload, now, now),
+            )
+            if not existed:
+                self._count += 1
+            self.stats.sets += 1
+            if self._count > self.max_entries:
+                self._evict_locked(self._count - self.max_entries)
+            self._conn.commit()
+
+    def _evict_locked(self, n: int) -> None:
+        cur = self._conn.execute(
+            f"DELETE FROM {self.table} WHERE key IN "
+            f"(SELECT key FROM {self.table} ORDER BY accessed_at ASC LIMIT ?)",
+            (n,),
+        )
+        removed = cur.rowcount if cur.rowcount is not None and cur.rowcount >= 0 else n
+        self._count = max(0, self._count - removed)
+        self.stats.evictions += removed
+
+    def purge_expired(self) -> int:
+        if self.ttl_s is None:
+            return 0
+        with self._lock:
+            cur = self._conn.execute(f"DELETE FROM {self.table} WHERE stored_at < ?", (time.time() - self.ttl_s,))
+            self._conn.commit()
+            removed = max(0, cur.rowcount or 0)
+            self._count = max(0, self._count - removed)
+            self.stats.expirations += removed
+            return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._conn.commit()
+            self._count = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class TieredCache:
+    """Memory tier in front of a disk tier. `stats` counts end-to-end hits/misses."""
+
+    def __init__(self, memory: Cache, disk: Optional[Cache] = None) -> None:
+        self.memory = memory
+        self.disk = disk
+        self.stats = CacheStats()
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        if value is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self.stats.sets += 1
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def tier_stats(self) -> Dict[str, Any]:
+        out = {"total": self.stats.as_dict(), "memory": self.memory.stats.as_dict()}
+        if self.disk is not None:
+            out["disk"] = self.disk.stats.as_dict()
+        return out
@@ -0,0 +1,22 @@
+"""src.utils.hashing
+
+Canonical JSON + content hashes used for cache keys and audit fingerprints.
+
+Same canonicalization idea as `rubric_fingerprint`: sorted keys, UTF-8, no
+whitespace variance, so logically equal payloads hash equally.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Any
+
+
+def canonical_json(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def canonical_hash(obj: Any) -> str:
+    """SHA-256 hex digest of `canonical_json(obj)`."""
+    return hashlib.sha256(canonical_json(obj).encode("utf-8")).hexdigest()
@@ -44,3 +44,10 @@ def resolve_rubric_path(rubric_path: Optional[str] = None) -> Path:
         return p
 
     return project_root() / p
+
+
+def cache_dir() -> Path:
+    """Local on-disk caches (SQLite tiers etc.). Created on demand."""
+    p = project_root() / ".cache"
+    p.mkdir(parents=True, exist_ok=True)
+    return p
@@ -0,0 +1,579 @@
+"""src.utils.rate_limit
+
+Shared rate limiter for every LLM provider call in the app (patient simulator,
+trainee judge, DeepEval).
+
+Per (provider, model) it enforces:
+  - requests/minute and tokens/minute budgets (token buckets),
+  - an adaptive concurrency limit (AIMD: +1/limit per success, halved on 429),
+  - a cool-down honoring `retry-after` / `retry-after-ms` on 429 responses.
+
+Buckets live in-process by default. Set RATE_LIMIT_DB=<path> to share them across
+processes (e.g. several Streamlit workers) through a local SQLite file.
+
+Usage:
+
+    limiter = get_rate_limiter("groq", model)
+    resp = limiter.call(lambda: client.chat.completions.create(...), estimated_tokens=n, usage_tokens=total_usage_tokens)
+    resp = await limiter.acall(lambda: aclient.chat.completions.create(...), estimated_tokens=n)
+    for chunk in limiter.call_stream(lambda: client.chat.completions.create(..., stream=True), estimated_tokens=n): ...
+
+Streamed responses (`call_stream` / `acall_stream`) hold their concurrency slot until
+the stream is exhausted or closed, and reconcile the token estimate with the usage
+reported on the final chunk.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import inspect
+import random
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass, replace
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Generic, Iterable, Iterator, List, Optional, Protocol, Tuple, TypeVar
+
+from src.utils.env import get_env
+from src.utils.logger import get_logger
+
+T = TypeVar("T")
+
+logger = get_logger(__name__)
+
+_POLL_S = 0.05
+
+
+@dataclass(frozen=True)
+class RateLimitConfig:
+    rpm: Optional[float] = 600.0
+    tpm: Optional[float] = 250_000.0
+    max_concurrency: int = 16
+    min_concurrency: int = 1
+    max_retries: int = 4             # retries after a 429
+    base_backoff_s: float = 1.0      # used when the server sends no retry-after
+    max_backoff_s: float = 60.0
+
+
+# ----------------------------
+# Token bucket stores
+# ----------------------------
+# A take request: (bucket key, amount, refill rate per second, capacity)
+Take = Tuple[str, float, float, float]
+
+
+class BucketStore(Protocol):
+    def take(self, requests: List[Take]) -> float:
+        """Atomically take from all buckets; return 0.0 on success, else seconds to wait (nothing taken)."""
+        ...
+
+    def adjust(self, key: str, delta: float, *, rate_per_s: float, capacity: float) -> None:
+        """Add (or, if negative, remove) tokens after the fact, e.g. to reconcile actual usage."""
+        ...
+
+
+def _refill(tokens: float, updated_at: float, now: float, rate_per_s: float, capacity: float) -> float:
+    return min(capacity, tokens + max(0.0, now - updated_at) * rate_per_s)
+
+
+def _plan(states: List[Tuple[float, float]], requests: List[Take], now: float) -> Tuple[float, List[float]]:
+    """Given current (tokens, updated_at) per request, return (wait_s, new token levels)."""
+    wait = 0.0
+    new_levels: List[float] = []
+    for (tokens, updated_at), (_, amount, rate, cap) in zip(states, requests):
+        level = _refill(tokens, updated_at, now, rate, cap)
+        need = min(amount, cap)  # a single oversized request must still be admissible
+        if level < need:
+            wait = max(wait, (need - level) / rate if rate > 0 else _POLL_S)
+        new_levels.append(level - need)
+    return wait, new_levels
+
+
+class InMemoryBucketStore:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    def take(self, requests: List[Take]) -> float:
+        now = time.monotonic()
+        with self._lock:
+            states = [self._buckets.get(k, (cap, now)) for k, _, _, cap in requests]
+            wait, levels = _plan(states, requests, now)
+            if wait > 0:
+                return wait
+            for (k, _, _, _), level in zip(requests, levels):
+                self._buckets[k] = (level, now)
+            return 0.0
+
+    def adjust(self, key: str, delta: float, *, rate_per_s: float, capacity: float) -> None:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            self._buckets[key] = (min(capacity, _refill(tokens, updated_at, now, rate_per_s, capacity) + delta), now)
+
+
+class SQLiteBucketStore:
+    """Cross-process buckets. Uses wall-clock time and BEGIN IMMEDIATE for atomicity."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)")
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=30.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _read(self, conn: sqlite3.Connection, key: str, cap: float, now: float) -> Tuple[float, float]:
+        row = conn.execute("SELECT tokens, updated_at FROM buckets WHERE key = ?", (key,)).fetchone()
+        return (row[0], row[1]) if row else (cap, now)
+
+    def take(self, requests: List[Take]) -> float:
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            states = [self._read(conn, k, cap, now) for k, _, _, cap in requests]
+            wait, levels = _plan(states, requests, now)
+            if wait <= 0:
+                for (k, _, _, _), level in zip(requests, levels):
+                    conn.execute(
+                        "INSERT INTO buckets(key, tokens, updated_at) VALUES (?, ?, ?) "
+                        "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at",
+                        (k, level, now),
+                    )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def adjust(self, key: str, delta: float, *, rate_per_s: float, capacity: float) -> None:
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            tokens, updated_at = self._read(conn, key, capacity, now)
+            level = min(capacity, _refill(tokens, updated_at, now, rate_per_s, capacity) + delta)
+            conn.execute(
+                "INSERT INTO buckets(key, tokens, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at",
+                (key, level, now),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+
+# ----------------------------
+# 429 detection
+# ----------------------------
+def is_rate_limit_error(exc: BaseException) -> bool:
+    """Works for groq/openai SDK errors (status_code) and raw httpx errors (response.status_code)."""
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status == 429 or exc.__class__.__name__ == "RateLimitError"
+
+
+def retry_after_s(exc: BaseException) -> Optional[float]:
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        ms = headers.get("retry-after-ms")
+        if ms is not None:
+            return float(ms) / 1000.0
+        s = headers.get("retry-after")
+        if s is not None:
+            return float(s)
+    except (TypeError, ValueError):
+        pass  # HTTP-date form or garbage: fall back to exponential backoff
+    return None
+
+
+def total_usage_tokens(resp: Any) -> Optional[int]:
+    usage = getattr(resp, "usage", None)
+    total = getattr(usage, "total_tokens", None)
+    return int(total) if total is not None else None
+
+
+def chunk_usage_tokens(chunk: Any) -> Optional[int]:
+    """Usage on a stream chunk: `x_groq.usage` (Groq) or `usage` (OpenAI-style), usually the last one."""
+    x_groq = getattr(chunk, "x_groq", None)
+    return total_usage_tokens(x_groq) if x_groq is not None and getattr(x_groq, "usage", None) else total_usage_tokens(chunk)
+
+
+# ----------------------------
+# Per-model limiter
+# ----------------------------
+@dataclass
+class LimiterStats:
+    requests: int = 0
+    successes: int = 0
+    failures: int = 0
+    rate_limited: int = 0
+    retries: int = 0
+    waited_s: float = 0.0
+    concurrency_limit: float = 0.0
+    in_flight: int = 0
+
+
+class ModelLimiter:
+    def __init__(self, key: str, config: RateLimitConfig, store: BucketStore) -> None:
+        self.key = key
+        self.config = config
+        self._store = store
+        self._lock = threading.Lock()
+        self._limit = float(config.max_concurrency)
+        self._in_flight = 0
+        self._blocked_until = 0.0
+        self.stats = LimiterStats(concurrency_limit=self._limit)
+
+    # --- admission ---
+    def _takes(self, tokens: float) -> List[Take]:
+        out: List[Take] = []
+        if self.config.rpm:
+            out.append((f"{self.key}:req", 1.0, self.config.rpm / 60.0, float(self.config.rpm)))
+        if self.config.tpm and tokens > 0:
+            out.append((f"{self.key}:tok", float(tokens), self.config.tpm / 60.0, float(self.config.tpm)))
+        return out
+
+    def _try_enter(self, tokens: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            if self._blocked_until > now:
+                return self._blocked_until - now
+            if self._in_flight >= max(self.config.min_concurrency, int(self._limit)):
+                return _POLL_S
+            takes = self._takes(tokens)
+            wait = self._store.take(takes) if takes else 0.0
+            if wait > 0:
+                return wait
+            self._in_flight += 1
+            self.stats.in_flight = self._in_flight
+            self.stats.requests += 1
+            return 0.0
+
+    def _acquire(self, tokens: float) -> None:
+        t0 = time.monotonic()
+        while True:
+            wait = self._try_enter(tokens)
+            if wait <= 0:
+                break
+            time.sleep(min(wait, 1.0))
+        self.stats.waited_s += time.monotonic() - t0
+
+    async def _aacquire(self, tokens: float) -> None:
+        t0 = time.monotonic()
+        while True:
+            wait = self._try_enter(tokens)
+            if wait <= 0:
+                break
+            await asyncio.sleep(min(wait, 1.0))
+        self.stats.waited_s += time.monotonic() - t0
+
+    # --- feedback ---
+    def _release(self, *, ok: bool, exc: Optional[BaseException] = None, attempt: int = 0) -> Optional[float]:
+        """Return the cool-down applied when `exc` is a 429, else None."""
+        with self._lock:
+            self._in_flight = max(0, self._in_flight - 1)
+            self.stats.in_flight = self._in_flight
+            cooldown: Optional[float] = None
+            if ok:
+                self.stats.successes += 1
+                self._limit = min(float(self.config.max_concurrency), self._limit + 1.0 / max(1.0, self._limit))
+            elif exc is not None and is_rate_limit_error(exc):
+                self.stats.rate_limited += 1
+                self._limit = max(float(self.config.min_concurrency), self._limit / 2.0)
+                cooldown = retry_after_s(exc)
+                if cooldown is None:
+                    cooldown = min(self.config.max_backoff_s, self.config.base_backoff_s * (2 ** attempt))
+                    cooldown *= 0.5 + random.random()  # jitter so a whole class doesn't retry in lockstep
+                self._blocked_until = max(self._blocked_until, time.monotonic() + cooldown)
+            else:
+                self.stats.failures += 1
+            self.stats.concurrency_limit = round(self._limit, 2)
+            return cooldown
+
+    def _reconcile(self, estimated: float, actual: Optional[int]) -> None:
+        if actual is None or not self.config.tpm:
+            return
+        delta = float(estimated) - float(actual)  # positive: refund; negative: extra debt
+        if delta:
+            self._store.adjust(f"{self.key}:tok", delta, rate_per_s=self.config.tpm / 60.0, capacity=float(self.config.tpm))
+
+    # --- public API ---
+    @contextlib.contextmanager
+    def slot(self, *, estimated_tokens: int = 0) -> Iterator[None]:
+        """Hold one admission slot for a block (no automatic retry)."""
+        self._acquire(estimated_tokens)
+        try:
+            yield
+        except BaseException as e:
+            self._release(ok=False, exc=e)
+            raise
+        self._release(ok=True)
+
+    def call(
+        self,
+        fn: Callable[[], T],
+        *,
+        estimated_tokens: int = 0,
+        usage_tokens: Optional[Callable[[T], Optional[int]]] = total_usage_tokens,
+    ) -> T:
+        for attempt in range(self.config.max_retries + 1):
+            self._acquire(estimated_tokens)
+            try:
+                result = fn()
+            except Exception as e:
+                cooldown = self._release(ok=False, exc=e, attempt=attempt)
+                if cooldown is not None and attempt < self.config.max_retries:
+                    self.stats.retries += 1
+                    logger.warning("rate limited on %s; retrying in %.2fs (attempt %d)", self.key, cooldown, attempt + 1)
+                    continue
+                raise
+            self._release(ok=True)
+            self._reconcile(estimated_tokens, usage_tokens(result) if usage_tokens else None)
+            return result
+        raise AssertionError("unreachable")
+
+    async def acall(
+        self,
+        fn: Callable[[], Awaitable[T]],
+        *,
+        estimated_tokens: int = 0,
+        usage_tokens: Optional[Callable[[T], Optional[int]]] = total_usage_tokens,
+    ) -> T:
+        for attempt in range(self.config.max_retries + 1):
+            await self._aacquire(estimated_tokens)
+            try:
+                result = await fn()
+            except Exception as e:
+                cooldown = self._release(ok=False, exc=e, attempt=attempt)
+                if cooldown is not None and attempt < self.config.max_retries:
+                    self.stats.retries += 1
+                    logger.warning("rate limited on %s; retrying in %.2fs (attempt %d)", self.key, cooldown, attempt + 1)
+                    continue
+                raise
+            except asyncio.CancelledError:
+                self._release(ok=False)
+                raise
+            self._release(ok=True)
+            self._reconcile(estimated_tokens, usage_tokens(result) if usage_tokens else None)
+            return result
+        raise AssertionError("unreachable")
+
+    def call_stream(
+        self,
+        fn: Callable[[], Iterable[T]],
+        *,
+        estimated_tokens: int = 0,
+        usage_tokens: Optional[Callable[[T], Optional[int]]] = chunk_usage_tokens,
+    ) -> "HeldStream[T]":
+        """Open a stream like `call` (429s on open are retried); the slot is held until the stream ends."""
+        for attempt in range(self.config.max_retries + 1):
+            self._acquire(estimated_tokens)
+            try:
+                stream = fn()
+            except Exception as e:
+                cooldown = self._release(ok=False, exc=e, attempt=attempt)
+                if cooldown is not None and attempt < self.config.max_retries:
+                    self.stats.retries += 1
+                    logger.warning("rate limited on %s; retrying in %.2fs (attempt %d)", self.key, cooldown, attempt + 1)
+                    continue
+                raise
+            return HeldStream(self, stream, estimated_tokens, usage_tokens)
+        raise AssertionError("unreachable")
+
+    async def acall_stream(
+        self,
+        fn: Callable[[], Awaitable[Any]],
+        *,
+        estimated_tokens: int = 0,
+        usage_tokens: Optional[Callable[[Any], Optional[int]]] = chunk_usage_tokens,
+    ) -> "AsyncHeldStream[Any]":
+        for attempt in range(self.config.max_retries + 1):
+            await self._aacquire(estimated_tokens)
+            try:
+                stream = await fn()
+            except Exception as e:
+                cooldown = self._release(ok=False, exc=e, attempt=attempt)
+                if cooldown is not None and attempt < self.config.max_retries:
+                    self.stats.retries += 1
+                    logger.warning("rate limited on %s; retrying in %.2fs (attempt %d)", self.key, cooldown, attempt + 1)
+                    continue
+                raise
+            except asyncio.CancelledError:
+                self._release(ok=False)
+                raise
+            return AsyncHeldStream(self, stream, estimated_tokens, usage_tokens)
+        raise AssertionError("unreachable")
+
+
+class HeldStream(Generic[T]):
+    """A sync stream that keeps its limiter slot until exhausted, failed or closed."""
+
+    def __init__(
+        self, limiter: "ModelLimiter", stream: Iterable[T], estimated_tokens: int, usage_tokens: Optional[Callable[[T], Optional[int]]]
+    ) -> None:
+        self._limiter = limiter
+        self._released = False
+        self._estimated = estimated_tokens
+        self._usage_tokens = usage_tokens
+        self._actual: Optional[int] = None
+        self.stream = stream
+        self._it = iter(stream)
+
+    def _finish(self, exc: Optional[BaseException] = None, *, aborted: bool = False) -> None:
+        if self._released:
+            return
+        self._released = True
+        if aborted:  # closed/cancelled before the end: free the slot, no AIMD credit
+            self._limiter._release(ok=False)
+            return
+        self._limiter._release(ok=exc is None, exc=exc)
+        if exc is None:
+            self._limiter._reconcile(self._estimated, self._actual)
+
+    def __iter__(self) -> "HeldStream[T]":
+        return self
+
+    def __next__(self) -> T:
+        try:
+            chunk = next(self._it)
+        except StopIteration:
+            self._finish()
+            raise
+        except Exception as e:
+            self._finish(e)
+            raise
+        if self._usage_tokens is not None:
+            self._actual = self._usage_tokens(chunk) or self._actual
+        return chunk
+
+    def close(self) -> None:
+        """Stop early: drop the connection and free the slot."""
+        close = getattr(self.stream, "close", None)
+        try:
+            if callable(close):
+                close()
+        finally:
+            self._finish(aborted=True)
+
+    def __del__(self) -> None:  # an abandoned stream must not leak its slot
+        self._finish(aborted=True)
+
+
+class AsyncHeldStream(Generic[T]):
+    """Async counterpart of `HeldStream`."""
+
+    def __init__(
+        self, limiter: "ModelLimiter", stream: Any, estimated_tokens: int, usage_tokens: Optional[Callable[[T], Optional[int]]]
+    ) -> None:
+        self._limiter = limiter
+        self._released = False
+        self._estimated = estimated_tokens
+        self._usage_tokens = usage_tokens
+        self._actual: Optional[int] = None
+        self.stream = stream
+        self._it = stream.__aiter__()
+
+    _finish = HeldStream._finish
+
+    def __aiter__(self) -> "AsyncHeldStream[T]":
+        return self
+
+    async def __anext__(self) -> T:
+        try:
+            chunk = await self._it.__anext__()
+        except StopAsyncIteration:
+            self._finish()
+            raise
+        except asyncio.CancelledError:
+            self._finish(aborted=True)
+            raise
+        except Exception as e:
+            self._finish(e)
+            raise
+        if self._usage_tokens is not None:
+            self._actual = self._usage_tokens(chunk) or self._actual
+        return chunk
+
+    async def aclose(self) -> None:
+        close = getattr(self.stream, "close", None) or getattr(self.stream, "aclose", None)
+        try:
+            if callable(close):
+                result = close()
+                if inspect.isawaitable(result):
+                    await result
+        finally:
+            self._finish(aborted=True)
+
+    def __del__(self) -> None:
+        self._finish(aborted=True)
+
+
+# ----------------------------
+# Process-wide registry
+# ----------------------------
+_lock = threading.Lock()
+_limiters: Dict[str, ModelLimiter] = {}
+_overrides: Dict[Tuple[str, Optional[str]], RateLimitConfig] = {}
+_store: Optional[BucketStore] = None
+
+
+def _default_store() -> BucketStore:
+    global _store
+    if _store is None:
+        db = get_env("RATE_LIMIT_DB")
+        _store = SQLiteBucketStore(db) if db else InMemoryBucketStore()
+    return _store
+
+
+def _env_config(provider: str) -> RateLimitConfig:
+    """RATE_LIMIT_<PROVIDER>_RPM / _TPM / _CONCURRENCY override the defaults."""
+    cfg = RateLimitConfig()
+    prefix = f"RATE_LIMIT_{provider.upper()}_"
+    rpm, tpm, conc = get_env(prefix + "RPM"), get_env(prefix + "TPM"), get_env(prefix + "CONCURRENCY")
+    if rpm:
+        cfg = replace(cfg, rpm=float(rpm))
+    if tpm:
+        cfg = replace(cfg, tpm=float(tpm))
+    if conc:
+        cfg = replace(cfg, max_concurrency=int(conc))
+    return cfg
+
+
+def configure_rate_limit(provider: str, config: RateLimitConfig, *, model: Optional[str] = None) -> None:
+    """Set budgets for a provider (all models) or one model. Applies to limiters created afterwards."""
+    with _lock:
+        _overrides[(provider, model)] = config
+        key = f"{provider}/{model}" if model else None
+        for k in list(_limiters):
+            if k == key or (model is None and k.startswith(provider + "/")):
+                del _limiters[k]
+
+
+def get_rate_limiter(provider: str, model: Optional[str]) -> ModelLimiter:
+    key = f"{provider}/{model or '*'}"
+    with _lock:
+        lim = _limiters.get(key)
+        if lim is None:
+            cfg = _overrides.get((provider, model)) or _overrides.get((provider, None)) or _env_config(provider)
+            lim = ModelLimiter(key, cfg, _default_store())
+            _limiters[key] = lim
+        return lim
+
+
+def rate_limit_stats() -> Dict[str, Dict[str, Any]]:
+    with _lock:
+        return {k: asdict(v.stats) for k, v in _limiters.items()}
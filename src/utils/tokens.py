@@ -0,0 +1,56 @@
+"""src.utils.tokens
+
+Cheap, dependency-free token estimates.
+
+Good enough for budgeting and reporting (not billing). Latin text averages ~4
+chars/token on GPT-style tokenizers; Arabic and other non-ASCII scripts tokenize
+much more densely, so they are counted at ~2 chars/token.
+
+Also: reported-usage helpers (`usage_counts`, `sum_usage`) for judge calls that
+aggregate several requests.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable
+
+USAGE_FIELDS = ("prompt_tokens", "completion_tokens", "total_tokens")
+
+# Per-message framing overhead (role markers etc.) in chat formats.
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    ascii_chars = sum(1 for c in text if ord(c) < 128)
+    other_chars = len(text) - ascii_chars
+    return max(1, (ascii_chars + 3) // 4 + (other_chars + 1) // 2)
+
+
+def estimate_messages_tokens(messages: Iterable[Dict[str, str]]) -> int:
+    return sum(MESSAGE_OVERHEAD_TOKENS + estimate_tokens(m.get("content", "") or "") for m in messages or [])
+
+
+def estimate_request_tokens(messages: Iterable[Dict[str, str]], max_completion_tokens: int, *, expected_completion: int = 512) -> int:
+    """Token reservation for rate limiting: prompt estimate + expected (not maximum) completion."""
+    return estimate_messages_tokens(messages) + min(int(max_completion_tokens or 0), expected_completion)
+
+
+def usage_counts(usage: Any) -> Dict[str, int]:
+    """Token counts from an API usage object or its dict form; missing fields are omitted."""
+    out: Dict[str, int] = {}
+    for name in USAGE_FIELDS:
+        v = usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+        if isinstance(v, (int, float)):
+            out[name] = int(v)
+    return out
+
+
+def sum_usage(usages: Iterable[Any]) -> Dict[str, int]:
+    """Field-wise sum of several usages (objects, dicts or `usage_counts` results)."""
+    out: Dict[str, int] = {}
+    for u in usages:
+        for name, v in usage_counts(u).items():
+            out[name] = out.get(name, 0) + v
+    return out